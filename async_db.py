@@ -0,0 +1,603 @@
+import asyncio
+import time
+import psycopg
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from psycopg.pq import TransactionStatus
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from dotenv import load_dotenv
+from dbcommon import BaseDatabase, DimensionCache, EstimatedTotals, SLOW_QUERY_EXPLAIN, partition_settings
+from replicas import ReadSession, current_session, parse_lsn
+from importer import IMPORT_BATCH_SIZE, ImportBatches, ImportReport
+from queries import (
+    DELETE_JOB, BATCH_DELETE_JOB, STATS_SNAPSHOT, DATA_VERSION, REPLICA_STATUS, CURRENT_WAL_LSN,
+    job_insert_values, build_job_insert, build_jobs_query, paginate_jobs, build_jobs_count_query,
+    build_jobs_estimate_query, build_jobs_export_query, build_job_facets_query, build_job_facets, jobs_total, build_job_by_id_query,
+    job_update_fields, build_job_update, build_job_stats, CREATE_IMPORT_STAGING, COPY_IMPORT_STAGING,
+    IMPORT_RESOLVE_DIMENSIONS, IMPORT_MERGE_JOBS, SUGGESTION_TERMS, ENSURE_JOB_PARTITIONS, SET_LOCK_TIMEOUT,
+    LOCK_JOB_PARTITIONS
+)
+
+load_dotenv()
+
+# Async counterpart of db.py for the FastAPI handlers. The pool needs a running
+# event loop, so it is opened by the application lifespan rather than at import.
+
+_current_connection = ContextVar('current_async_connection', default=None)
+_current_request = ContextVar('current_request_scope', default=None)
+
+class _RequestScope:
+    """Connections shared by one request, one per pool, checked out on first use"""
+    def __init__(self):
+        self.conns = {}
+        self.lock = asyncio.Lock()
+
+class AsyncDatabase(BaseDatabase):
+    def __init__(self, prepare=None, primary=None, replicas=None, **pool_settings):
+        super().__init__(prepare, primary, replicas, **pool_settings)
+        self._connecting = None
+        self._background = set()
+        self._replica_checks = None
+
+    def _new_pool(self, conninfo, name):
+        return AsyncConnectionPool(conninfo, open=False, **self._pool_args(name))
+
+    async def connect(self):
+        """Open the primary and replica pools, warming them up in parallel"""
+        await asyncio.gather(self._connect_primary(), self._connect_replicas())
+
+    async def _connect_primary(self):
+        """Open the primary pool, retrying with exponential backoff while the database is unreachable"""
+        for attempt in range(1, self.connect_settings['retries'] + 1):
+            pool = self._new_pool(self.conninfo, "jobs-async")
+            try:
+                await pool.open(wait=True, timeout=self.connect_settings['timeout'])  # closes the pool on timeout
+                break
+            except PoolTimeout as e:
+                await asyncio.sleep(self._connect_failed(e, attempt))
+        self._connected(pool, "Async database")
+
+    async def _connect_replicas(self):
+        if not self.replicas:
+            return
+        # Replicas start evicted and join once a health check passes, so a
+        # missing replica never blocks startup
+        for replica in self.replicas:
+            replica.pool = self._new_pool(replica.conninfo, f"jobs-async-{replica.name}")
+            await replica.pool.open(wait=False)
+        await self.check_replicas()
+        self._replica_checks = asyncio.get_running_loop().create_task(self._check_replicas_forever())
+        print(f"Read replicas: {', '.join(r.name + ('' if r.healthy else ' (evicted)') for r in self.replicas)}")
+
+    def start(self):
+        """Connect in the background, so the app can start serving (and report not ready) meanwhile.
+
+        Queries wait for the connection; if every attempt failed, the next
+        query starts connecting again.
+        """
+        if self._connecting is None or (self._connecting.done() and self.pool is None):
+            self._connecting = asyncio.get_running_loop().create_task(self.connect())
+            # A failure is reported by connect() and re-raised to whoever awaits the task
+            self._connecting.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._connecting
+
+    async def _ensure_connected(self):
+        if self.pool is None:
+            await asyncio.shield(self.start())
+
+    def ready(self):
+        """Whether the primary pool is open; replicas join as their health checks pass"""
+        return self.pool is not None
+
+    async def ping(self, timeout=2.0):
+        """Run SELECT 1 on the primary, waiting at most timeout seconds for a connection"""
+        async with self.pool.connection(timeout=timeout) as conn:
+            await conn.execute("SELECT 1")
+
+    async def close(self):
+        for task in (self._connecting, self._reconnecting):
+            if task and not task.done():
+                task.cancel()
+        if self._replica_checks:
+            self._replica_checks.cancel()
+        for replica in self.replicas:
+            if replica.pool:
+                await replica.pool.close()
+                replica.pool = None
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+            print("Async database connection pool closed")
+
+    async def check_replicas(self):
+        """Run REPLICA_STATUS on every replica and evict or readmit them"""
+        async def check(replica):
+            try:
+                async with replica.pool.connection(timeout=self.replica_settings['check_timeout']) as conn:
+                    cur = await conn.execute(REPLICA_STATUS, prepare=False)
+                    self.replicas.record_check(replica, await cur.fetchone())
+            except Exception as e:
+                self.replicas.record_failure(replica, e)
+        await asyncio.gather(*(check(replica) for replica in self.replicas))
+
+    async def _check_replicas_forever(self):
+        while True:
+            await asyncio.sleep(self.replica_settings['check_interval'])
+            await self.check_replicas()
+
+    @asynccontextmanager
+    async def read_session(self, lsn_token=None):
+        """Read-your-writes scope for one request: reads honour the client's LSN token, and
+        after a write the primary's WAL position is left in the session's written_lsn"""
+        session = ReadSession(parse_lsn(lsn_token))
+        token = current_session.set(session)
+        try:
+            yield session
+        finally:
+            current_session.reset(token)
+            if session.wrote and self.replicas:
+                try:
+                    async with self.pool.connection() as conn:
+                        cur = await conn.execute(CURRENT_WAL_LSN)
+                        session.written_lsn = (await cur.fetchone())['lsn']
+                except psycopg.Error as e:
+                    print(f"Error reading the primary's WAL position: {e}")
+
+    @asynccontextmanager
+    async def connection(self, fresh=False, read_only=False):
+        """Check out a connection for the current scope, reusing an enclosing one unless fresh.
+
+        With read_only the connection may come from a replica; the enclosed
+        execute_* calls must then only read.
+        """
+        async with self._connection(fresh, self._read_replica() if read_only else None) as conn:
+            yield conn
+
+    @asynccontextmanager
+    async def _connection(self, fresh=False, replica=None, timeout=None):
+        conn = _current_connection.get()
+        if conn is not None and not fresh:
+            yield conn
+            return
+        if replica is None:
+            self.breaker.before_call()  # before connecting, so a database that is down fails fast
+        await self._ensure_connected()
+        pool = replica.pool if replica else self.pool
+        try:
+            scope = _current_request.get()
+            if scope is not None and not fresh:
+                async with scope.lock:
+                    conn = scope.conns.get(pool)
+                    if conn is not None and conn.broken:
+                        # Lost since the request's last query; the pool discards it and opens another
+                        del scope.conns[pool]
+                        await pool.putconn(conn)
+                        conn = None
+                    if conn is None:
+                        started = time.perf_counter()
+                        conn = scope.conns[pool] = await pool.getconn(timeout)
+                        self._observe_pool_wait(started)
+                yield conn
+            else:
+                started = time.perf_counter()
+                async with pool.connection(timeout) as conn:
+                    self._observe_pool_wait(started)
+                    token = _current_connection.set(conn)
+                    try:
+                        yield conn
+                    finally:
+                        _current_connection.reset(token)
+        except Exception as e:
+            if (replica is None and self._record_outcome(e, pool)
+                    and (self._reconnecting is None or self._reconnecting.done())):
+                self._reconnecting = asyncio.get_running_loop().create_task(self._reconnect())
+            raise
+        else:
+            if replica is None:
+                self.breaker.record_success()
+
+    async def _reconnect(self):
+        """While the breaker is open, try a new pool every cooldown and swap it in once the primary answers.
+
+        psycopg_pool reconnects by itself, but its backoff doubles without a
+        cap, so after a long outage it may take minutes to notice the
+        database is back.
+        """
+        while True:
+            await asyncio.sleep(self.breaker.cooldown)
+            if self.breaker.state == "closed":
+                return  # the pool recovered by itself
+            pool = self._new_pool(self.conninfo, "jobs-async")
+            try:
+                await pool.open(wait=True, timeout=self.connect_settings['timeout'])
+            except PoolTimeout:
+                continue
+            await self._reconnected(pool).close()  # connections still checked out are closed as they come back
+            return
+
+    def in_transaction(self):
+        """Whether the current scope's connection is inside a transaction block"""
+        scope = _current_request.get()
+        conn = _current_connection.get() or (scope.conns.get(self.pool) if scope else None)
+        return conn is not None and conn.info.transaction_status != TransactionStatus.IDLE
+
+    @asynccontextmanager
+    async def request_scope(self):
+        """Share one connection per pool across a request's queries, checked out only if it runs any"""
+        scope = _RequestScope()
+        token = _current_request.set(scope)
+        try:
+            yield
+        finally:
+            _current_request.reset(token)
+            for pool, conn in scope.conns.items():
+                await pool.putconn(conn)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Run the enclosed execute_* calls in a single transaction"""
+        self.mark_written()
+        async with self.connection() as conn:
+            async with conn.transaction():
+                yield conn
+
+    def _explain_later(self, query, params, query_id):
+        task = asyncio.get_running_loop().create_task(self._explain(query, params, query_id))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _explain(self, query, params, query_id):
+        try:
+            async with self.pool.connection() as conn:
+                cur = await conn.execute(SLOW_QUERY_EXPLAIN + query, params or (), prepare=False)
+                plan = await cur.fetchall()
+            self._log_plan(query_id, plan)
+        except Exception as e:
+            print(f"Error explaining slow query {query_id}: {e}")
+
+    async def stream_query(self, query, params=None, chunk_size=2000, name='stream'):
+        """Yield the query's rows in lists of up to chunk_size from a named server-side cursor.
+
+        Holds its own pooled connection and transaction until the generator
+        is exhausted or closed, so it can outlive the request scope, e.g.
+        inside a StreamingResponse.
+        """
+        replica = self._read_replica()
+        try:
+            if replica is None:
+                self.breaker.before_call()
+            await self._ensure_connected()
+            started = time.perf_counter()
+            async with (replica.pool if replica else self.pool).connection() as conn:
+                self._observe_pool_wait(started)
+                async with conn.transaction():
+                    async with conn.cursor(name=name) as cur:
+                        with self._timed(query, params):
+                            await cur.execute(query, params or ())
+                        while rows := await cur.fetchmany(chunk_size):
+                            yield rows
+        except Exception as e:
+            print(f"Error streaming query: {e}")
+            raise
+
+    async def execute_query(self, query, params=None, prepare=None):
+        """Rows of a statement; plain reads outside a transaction go to a replica when there is one,
+        and are run again if the connection is lost"""
+        read_only = self._is_read(query)
+        try:
+            if read_only and self._can_retry():
+                return await self._read(query, params, prepare)
+            return await self._fetch_all(query, params, prepare)
+        except Exception as e:
+            print(f"Error executing query: {e}")
+            raise
+
+    def _can_retry(self):
+        """Whether a read may run on another connection: none is bound, and the request's isn't in a transaction"""
+        if _current_connection.get() is not None:
+            return False
+        scope = _current_request.get()
+        conn = scope.conns.get(self.pool) if scope else None
+        return conn is None or conn.broken or conn.info.transaction_status == TransactionStatus.IDLE
+
+    async def _read(self, query, params, prepare):
+        """Run a read on a replica, or the primary, retrying lost connections with jittered backoff until the deadline"""
+        deadline = time.monotonic() + self.retry_settings['deadline']
+        replica = self._read_replica()
+        retries, timeout = 0, None
+        while True:
+            try:
+                rows = await self._fetch_all(query, params, prepare, replica, timeout)
+                self._read_succeeded(retries)
+                return rows
+            except psycopg.OperationalError as e:
+                replica, retries, timeout, delay = self._read_failed(e, replica, retries, deadline)
+                if delay:
+                    await asyncio.sleep(delay)
+
+    async def _fetch_all(self, query, params, prepare, replica=None, timeout=None):
+        async with self._connection(replica=replica, timeout=timeout) as conn:
+            async with conn.cursor() as cur:
+                with self._timed(query, params) as timer:
+                    await cur.execute(query, params or (), prepare=self._prepare(prepare))
+                    rows = await cur.fetchall()
+                    timer.rows = len(rows)
+                return rows
+
+    async def execute_update(self, query, params=None, prepare=None):
+        self.mark_written()
+        try:
+            async with self.connection() as conn:
+                async with conn.cursor() as cur:
+                    with self._timed(query, params) as timer:
+                        await cur.execute(query, params or (), prepare=self._prepare(prepare))
+                        timer.rows = cur.rowcount
+            return True
+        except Exception as e:
+            print(f"Error executing update: {e}")
+            raise
+
+    async def execute_insert(self, query, params=None, prepare=None):
+        self.mark_written()
+        try:
+            async with self.connection() as conn:
+                async with conn.cursor() as cur:
+                    with self._timed(query, params) as timer:
+                        await cur.execute(query, params or (), prepare=self._prepare(prepare))
+                        result = await cur.fetchone()
+                        timer.rows = cur.rowcount
+                    if result is None:  # Handle ON CONFLICT DO NOTHING
+                        return None
+                    return {"id": result['id']}
+        except Exception as e:
+            print(f"Error executing insert: {e}")
+            raise
+
+db = AsyncDatabase()
+
+_estimated_totals = EstimatedTotals()
+_dimensions = DimensionCache()
+
+async def _retry_on_stale_dimension(write):
+    """Run write(); if a cached dimension id no longer names the same row, drop the cache and retry once"""
+    try:
+        return await write()
+    except psycopg.errors.ForeignKeyViolation:
+        _dimensions.clear()
+        if db.in_transaction():
+            raise  # the transaction is aborted; the caller's retry will look the ids up again
+        return await write()
+
+async def create_job(job_data):
+    """Create a new job; returns it joined like get_job_by_id, in one statement"""
+    job_data = {'category': 'General', **job_data}
+
+    async def insert():
+        upserts, cached = _dimensions.resolve(job_data)
+        rows = await db.execute_query(*build_job_insert(job_insert_values(job_data), upserts, cached))
+        _dimensions.remember(job_data, rows[0])
+        return rows[0]
+    return await _retry_on_stale_dimension(insert)
+
+async def get_jobs_page(page=1, limit=10, search=None, cursor=None, filters=None):
+    """Get a page of jobs plus the cursors of the neighbouring pages"""
+    # Full-text searches stay unprepared: a generic plan can't account for the search terms
+    query, params = build_jobs_query(page=page, limit=limit, search=search, cursor=cursor, filters=filters)
+    rows = await db.execute_query(query, params, prepare=not search)
+    return paginate_jobs(rows, limit, page=page, cursor=cursor)
+
+async def stream_jobs(search=None, chunk_size=2000, filters=None):
+    """Yield every job matching the listing filter in chunks, without loading them all"""
+    query, params = build_jobs_export_query(search=search, filters=filters)
+    async for rows in db.stream_query(query, params, chunk_size=chunk_size, name='jobs_export'):
+        yield rows
+
+async def get_jobs(page=1, limit=10, search=None, cursor=None, filters=None):
+    """Get jobs with pagination, search and filters"""
+    return (await get_jobs_page(page=page, limit=limit, search=search, cursor=cursor, filters=filters))['jobs']
+
+async def count_jobs(search=None, filters=None):
+    """Total for the listing filter: exact up to JOBS_COUNT_EXACT_LIMIT matches, estimated above"""
+    total = _estimated_totals.get(search, filters)
+    if total is not None:
+        return total
+    cap = _estimated_totals.settings['exact_limit']
+    # Own connection, so the count can run alongside the page query of the same request
+    async with db.connection(fresh=True, read_only=True):
+        count_rows = await db.execute_query(*build_jobs_count_query(search=search, cap=cap, filters=filters), prepare=not search)
+        estimate_rows = None
+        if count_rows[0]['count'] > cap:
+            estimate_rows = await db.execute_query(*build_jobs_estimate_query(search=search, filters=filters))
+    total = jobs_total(count_rows, cap, estimate_rows)
+    _estimated_totals.remember(search, filters, total)
+    return total
+
+async def get_job_facets(search=None, filters=None):
+    """Facet counts and the exact total for the listing filter, in one query"""
+    # Own connection, so the facets can run alongside the page query of the same request
+    async with db.connection(fresh=True, read_only=True):
+        rows = await db.execute_query(*build_job_facets_query(search=search, filters=filters))
+    return build_job_facets(rows)
+
+async def get_job_by_id(job_id):
+    """Get a single job by ID"""
+    result = await db.execute_query(*build_job_by_id_query(job_id), prepare=True)
+    return result[0] if result else None
+
+async def update_job(job_id, job_data):
+    """Update a job; returns it joined like get_job_by_id, or None if there is no such active job"""
+    async def update():
+        upserts, cached = _dimensions.resolve(job_data)
+        update_fields = job_update_fields(job_data)
+        if not update_fields and not upserts and not cached:
+            return await get_job_by_id(job_id)
+        rows = await db.execute_query(*build_job_update(job_id, update_fields, upserts, cached))
+        if not rows:
+            return None
+        _dimensions.remember(job_data, rows[0])
+        return rows[0]
+    return await _retry_on_stale_dimension(update)
+
+async def delete_job(job_id):
+    """Soft delete a job"""
+    return await db.execute_update(DELETE_JOB, (job_id,))
+
+def _batch_statement(operation):
+    """Statement and params for one create/update/delete batch operation"""
+    job_id, job_data = operation.get('id'), operation.get('data') or {}
+    if operation['op'] == 'create':
+        upserts, cached = _dimensions.resolve(job_data)
+        return build_job_insert(job_insert_values(job_data), upserts, cached)
+    if operation['op'] == 'update':
+        upserts, cached = _dimensions.resolve(job_data)
+        update_fields = job_update_fields(job_data)
+        if not update_fields and not upserts and not cached:
+            return build_job_by_id_query(job_id)
+        return build_job_update(job_id, update_fields, upserts, cached)
+    return BATCH_DELETE_JOB, (job_id,)
+
+def _batch_result(operation, row):
+    if row is None:
+        return {"status": "not_found"}
+    if operation['op'] == 'delete':
+        return {"status": "deleted"}
+    _dimensions.remember(operation.get('data') or {}, row)
+    return {"status": "created" if operation['op'] == 'create' else "updated", "job": row}
+
+async def run_job_batch(operations, atomic=True):
+    """Run create/update/delete operations pipelined over one connection.
+
+    operations are dicts with 'op', plus 'id' for update/delete and 'data'
+    as for create_job/update_job. All statements of an attempt are sent in
+    one pipeline inside one transaction, so a batch costs one round trip.
+    With atomic=True a failing operation rolls the whole batch back; with
+    atomic=False it is reported and the batch re-run without it, so each
+    failure costs one more round trip. Returns one result dict per operation.
+    The batch manages its own transaction, so don't call it inside db.transaction().
+    """
+    results = [None] * len(operations)
+    pending = []
+    for index, operation in enumerate(operations):
+        if operation['op'] == 'create':
+            operation = {**operation, 'data': {'category': 'General', **(operation.get('data') or {})}}
+        try:
+            pending.append((index, operation, _batch_statement(operation)))
+        except (KeyError, ValueError) as e:
+            results[index] = {"status": "error", "error": f"Invalid operation: {e}"}
+    if atomic and any(results):
+        return [result or {"status": "not_applied"} for result in results]
+
+    db.mark_written()
+    retried_stale_ids = False
+    while pending:
+        cursors = []
+        try:
+            async with db.connection() as conn:
+                if conn.info.transaction_status != TransactionStatus.IDLE:
+                    raise RuntimeError("run_job_batch manages its own transaction")
+                try:
+                    # BEGIN/COMMIT go in the pipeline too (conn.transaction() would
+                    # sync around them), so the batch is sent with a single Sync
+                    async with conn.pipeline():
+                        await conn.execute("BEGIN")
+                        for _, _, statement in pending:
+                            cursor = conn.cursor()
+                            await cursor.execute(*statement)
+                            cursors.append(cursor)
+                        await conn.execute("COMMIT")
+                except psycopg.Error:
+                    await conn.rollback()
+                    raise
+                for (index, operation, _), cursor in zip(pending, cursors):
+                    results[index] = _batch_result(operation, await cursor.fetchone())
+            return results
+        except psycopg.Error as e:
+            print(f"Error running job batch: {e}")
+            if isinstance(e, psycopg.errors.ForeignKeyViolation) and not retried_stale_ids:
+                # A cached dimension id went stale; look the ids up again and retry
+                _dimensions.clear()
+                retried_stale_ids = True
+                pending = [(index, operation, _batch_statement(operation)) for index, operation, _ in pending]
+                continue
+            # The failing statement is the first one without a result
+            failed = next((n for n, cursor in enumerate(cursors) if cursor.pgresult is None), None)
+            if failed is None or not isinstance(e, psycopg.DatabaseError) or isinstance(e, psycopg.OperationalError):
+                raise
+            results[pending[failed][0]] = {"status": "error", "error": str(e).strip()}
+            if atomic:
+                return [result or {"status": "not_applied"} for result in results]
+            pending = pending[:failed] + pending[failed + 1:]
+    return results
+
+async def get_job_stats():
+    """Get job statistics from the precomputed job_stats counters"""
+    return build_job_stats(await db.execute_query(STATS_SNAPSHOT))
+
+async def get_data_version():
+    """Current version and modification time of the job data, bumped by every job write"""
+    rows = await db.execute_query(DATA_VERSION)
+    return rows[0] if rows else None
+
+async def get_suggestion_terms(after_id=0):
+    """Suggestion terms and counts for active jobs with id > after_id, plus the id they cover up to"""
+    rows = await db.execute_query(SUGGESTION_TERMS, (after_id, after_id))
+    last_id = next(row['count'] for row in rows if row['type'] == 'last_id')
+    return [row for row in rows if row['type'] != 'last_id'], last_id
+
+async def import_jobs(records, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Bulk load (line_no, record) pairs from importer.aparse_records.
+
+    Valid rows are COPYed into a staging table and merged into jobs
+    batch_size at a time, each batch in its own transaction so the
+    job_stats and data_versions rows it updates are not locked for the
+    whole import. Invalid rows are recorded in the returned ImportReport.
+    Any other failure stops the import: the batches before it stay
+    committed, and the report counts them and carries the error. progress,
+    if given, is called with the report after each batch.
+    """
+    report = ImportReport()
+    batches = ImportBatches(report, batch_size)
+    try:
+        async for line_no, record in records:
+            batch = batches.add(line_no, record)
+            if batch:
+                report.imported += await _load_import_batch(batch, batches.new_months(batch))
+                if progress:
+                    progress(report)
+        batch = batches.rest()
+        if batch:
+            report.imported += await _load_import_batch(batch, batches.new_months(batch))
+            if progress:
+                progress(report)
+    except Exception as e:
+        print(f"Error importing jobs after {report.imported} rows: {e}")
+        report.error = str(e)
+    return report
+
+async def _load_import_batch(batch, new_months):
+    """COPY one batch into staging and merge it into jobs in one transaction; returns the rows inserted.
+
+    The partitions for new_months, posted_at months of no earlier batch, are created first.
+    """
+    if new_months:
+        await ensure_job_partitions(months=new_months)
+    async with db.transaction() as conn:
+        await db.execute_update(CREATE_IMPORT_STAGING)
+        async with conn.cursor() as cur:
+            async with cur.copy(COPY_IMPORT_STAGING) as copy:
+                for row in batch:
+                    await copy.write_row(row)
+            for statement in IMPORT_RESOLVE_DIMENSIONS:
+                await cur.execute(statement)
+            await cur.execute(IMPORT_MERGE_JOBS)
+            return cur.rowcount
+
+async def ensure_job_partitions(months_ahead=None, months=()):
+    """Create the monthly jobs partitions for `months` (dates), the next months_ahead
+    months and any month with rows waiting in jobs_default; returns the months created"""
+    lock_timeout, params = partition_settings(months_ahead, months)
+    async with db.transaction():
+        await db.execute_query(SET_LOCK_TIMEOUT, (lock_timeout,))
+        await db.execute_query(LOCK_JOB_PARTITIONS)
+        rows = await db.execute_query(ENSURE_JOB_PARTITIONS, params)
+    return [row['month'] for row in rows if row['created']]
@@ -0,0 +1,193 @@
+"""Load test of the API against a local Postgres: throughput and p50/p95/p99
+latency per endpoint, as JSON.
+
+    python benchmarks/load_bench.py [--seed-jobs 100000] [--concurrency 32]
+        [--duration 30] [--url http://127.0.0.1:8000] [--output run.json]
+
+--seed-jobs first loads that many synthetic jobs, as `manage.py seed --jobs`
+does, so point DATABASE_* at a throwaway database. Without --url the app runs
+in-process over ASGI, which measures the app and the database without a
+network hop; with it, requests go to a running server (e.g. `python
+manage.py start`). The mix includes creates and updates, so a
+run leaves extra jobs behind. Needs httpx, from requirements-dev.txt.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+SEARCH_TERMS = ["python", "data analyst", "nairobi", "sales", "senior engineer", "remote", "nurse", "figma"]
+
+# (endpoint, weight): roughly a read-heavy job board
+MIX = [
+    ("list", 30), ("list_deep", 5), ("list_cursor", 10), ("list_filtered", 8), ("search", 15),
+    ("detail", 20), ("stats", 5), ("create", 4), ("update", 3),
+]
+
+def seed(count, companies, seed_value):
+    from db import db, seed_jobs
+    started = time.perf_counter()
+    loaded = seed_jobs(count, companies=companies, seed=seed_value)
+    db.close()
+    return {"jobs": loaded, "seconds": round(time.perf_counter() - started, 3)}
+
+def job_body(rng):
+    return {
+        "title": f"Benchmark Engineer {rng.randint(1, 10 ** 6)}",
+        "company": f"Benchmark Co {rng.randint(1, 20)}",
+        "location": rng.choice(["Nairobi, Kenya", "Mombasa, Kenya", "Remote"]),
+        "description": "Synthetic job created by the load benchmark.",
+        "requirements": "None",
+        "tags": "Python, PostgreSQL",
+        "category": "Engineering",
+    }
+
+class Workload:
+    """Request generators per endpoint; ids come from the first listing pages"""
+
+    def __init__(self, client, rng):
+        self.client = client
+        self.rng = rng
+        self.job_ids = []
+        self.created_ids = []
+        self.cursors = []
+
+    async def prepare(self):
+        for page in range(1, 6):
+            response = await self.client.get("/api/jobs/", params={"page": page, "limit": 20})
+            response.raise_for_status()
+            body = response.json()
+            self.job_ids.extend(int(job["id"]) for job in body["results"])
+            if body["next_cursor"]:
+                self.cursors.append(body["next_cursor"])
+        if not self.job_ids:
+            sys.exit("No jobs to benchmark against; run with --seed-jobs N")
+
+    def request(self, endpoint):
+        rng = self.rng
+        if endpoint == "list":
+            return self.client.get("/api/jobs/", params={"limit": 20})
+        if endpoint == "list_deep":
+            return self.client.get("/api/jobs/", params={"limit": 20, "page": rng.randint(10, 200)})
+        if endpoint == "list_cursor":
+            return self.client.get("/api/jobs/", params={"limit": 20, "cursor": rng.choice(self.cursors)})
+        if endpoint == "list_filtered":
+            return self.client.get("/api/jobs/", params={"limit": 20, "category": "Engineering", "tag": "Python",
+                                                         "facets": "true"})
+        if endpoint == "search":
+            return self.client.get("/api/jobs/", params={"limit": 20, "search": rng.choice(SEARCH_TERMS)})
+        if endpoint == "detail":
+            return self.client.get(f"/api/jobs/{rng.choice(self.job_ids)}")
+        if endpoint == "stats":
+            return self.client.get("/api/stats/")
+        if endpoint == "create":
+            return self.client.post("/api/jobs/", json=job_body(rng))
+        job_id = rng.choice(self.created_ids or self.job_ids)
+        return self.client.put(f"/api/jobs/{job_id}", json={"title": f"Benchmark Update {rng.randint(1, 10 ** 6)}"})
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def summarize(samples, errors, seconds):
+    samples = sorted(samples)
+    if not samples:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / seconds, 1),
+        "mean_ms": round(sum(samples) / len(samples), 3),
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+async def drive(client, args):
+    rng = random.Random(args.seed)
+    workload = Workload(client, rng)
+    await workload.prepare()
+    endpoints = [name for name, _ in MIX if name not in args.skip]
+    weights = [weight for name, weight in MIX if name not in args.skip]
+    samples = {name: [] for name in endpoints}
+    errors = {name: 0 for name in endpoints}
+
+    async def worker(deadline):
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(endpoints, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await workload.request(endpoint)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                response, failed = None, True
+            elapsed = (time.perf_counter() - start) * 1000
+            if failed:
+                errors[endpoint] += 1
+                continue
+            samples[endpoint].append(elapsed)
+            if endpoint == "create" and response is not None:
+                workload.created_ids.append(int(response.json()["id"]))
+
+    if args.warmup:
+        await asyncio.gather(*(worker(time.perf_counter() + args.warmup) for _ in range(args.concurrency)))
+        samples = {name: [] for name in endpoints}
+        errors = {name: 0 for name in endpoints}
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(started + args.duration) for _ in range(args.concurrency)))
+    seconds = time.perf_counter() - started
+
+    report = {name: summarize(samples[name], errors[name], seconds) for name in endpoints}
+    report["all"] = summarize([s for name in endpoints for s in samples[name]], sum(errors.values()), seconds)
+    return report
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+            return await drive(client, args)
+    from server import app, lifespan
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+            return await drive(client, args)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed-jobs', type=int, default=0, help="load this many synthetic jobs first")
+    parser.add_argument('--companies', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42, help="seed for the dataset and the request mix")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30, help="seconds of measured load")
+    parser.add_argument('--warmup', type=float, default=3, help="seconds of unmeasured load first")
+    parser.add_argument('--url', help="base URL of a running server; default runs the app in-process")
+    parser.add_argument('--skip', action='append', default=[], choices=[name for name, _ in MIX],
+                        help="leave an endpoint out of the mix (repeatable)")
+    parser.add_argument('--output', help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "started_at": datetime.now().isoformat(timespec='seconds'),
+        "config": {"concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup,
+                   "target": args.url or "in-process", "seed": args.seed, "skip": args.skip},
+    }
+    if args.seed_jobs:
+        report["seeded"] = seed(args.seed_jobs, args.companies, args.seed)
+    report["endpoints"] = asyncio.run(run(args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+if __name__ == "__main__":
+    main()
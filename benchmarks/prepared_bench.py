@@ -0,0 +1,69 @@
+"""Latency of the hot read queries with and without server-side prepared
+statements, per query shape, against the configured database.
+
+    python benchmarks/prepared_bench.py [--iterations 200] [--search python]
+
+Each shape runs unprepared first, then in the app's configured mode, over
+the same pooled connection, so the difference is the parse/plan work
+prepared statements save. Search shapes are never prepared by the app
+(generic plans suit them badly), so they double as a baseline.
+Results are printed as JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import db, get_jobs_page, get_job_by_id
+
+def shapes(search):
+    first = get_jobs_page(limit=20)
+    job_id = first['jobs'][0]['id'] if first['jobs'] else 1
+    searched = get_jobs_page(limit=20, search=search)
+    return {
+        "listing": lambda: get_jobs_page(limit=20),
+        "listing_offset": lambda: get_jobs_page(page=3, limit=20),
+        "listing_cursor": lambda: get_jobs_page(limit=20, cursor=first['next_cursor']),
+        "search": lambda: get_jobs_page(limit=20, search=search),
+        "search_cursor": lambda: get_jobs_page(limit=20, search=search, cursor=searched['next_cursor']),
+        "detail": lambda: get_job_by_id(job_id),
+    }
+
+def timings_ms(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean": round(statistics.fmean(samples), 3),
+        "p50": round(samples[len(samples) // 2], 3),
+        "p95": round(samples[int(len(samples) * 0.95) - 1], 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--search', default='python')
+    args = parser.parse_args()
+
+    report = {}
+    with db.connection():
+        for name, fn in shapes(args.search).items():
+            report[name] = {}
+            for prepared in (False, True):
+                db.prepare = prepared
+                fn()  # warm up; prepares the statement in prepared mode
+                report[name]["prepared" if prepared else "unprepared"] = timings_ms(fn, args.iterations)
+            saved = report[name]["unprepared"]["mean"] - report[name]["prepared"]["mean"]
+            report[name]["saved_ms"] = round(saved, 3)
+    db.close()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Per-row cost of serializing a job listing: the Pydantic path (format_job,
+then FastAPI's jsonable_encoder and JSONResponse) against the fast path
+(job_payload encoded by FastJSONResponse). Needs no database.
+
+    python benchmarks/serialize_bench.py [--rows 100] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from serialize import FastJSONResponse, job_payload, orjson
+from server import format_job
+
+def sample_row(i):
+    return {
+        'id': i, 'title': f"Senior Python Developer {i}", 'company': "Tech Innovations Ltd",
+        'job_type': 'full-time', 'description': "We are looking for an experienced Python developer... " * 8,
+        'requirements': "5+ years of Python experience, Django framework knowledge",
+        'salary_min': Decimal('80000.00'), 'salary_max': Decimal('120000.00'), 'salary_currency': 'KSh',
+        'skills_required': ["Python", "Django", "PostgreSQL", "REST API"],
+        'company_id': 1, 'category_id': 1, 'location_id': 1,
+        'application_email': 'hr@techinnovations.co.ke', 'application_url': '',
+        'posted_at': datetime(2024, 5, 1, 9, 30), 'is_active': True,
+        'category': 'Engineering', 'city': 'Nairobi', 'country': 'Kenya', 'remote': False,
+    }
+
+def pydantic_path(rows):
+    content = {"results": [format_job(row) for row in rows], "total": len(rows)}
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+def fast_path(rows):
+    return FastJSONResponse({"results": [job_payload(row) for row in rows], "total": len(rows)}).body
+
+def per_row_us(fn, rows, repeat):
+    fn(rows)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(rows)
+    return (time.perf_counter() - start) / (repeat * len(rows)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    rows = [sample_row(i) for i in range(args.rows)]
+    if json.loads(pydantic_path(rows)) != json.loads(fast_path(rows)):
+        sys.exit("Output differs between the Pydantic and fast paths")
+
+    slow = per_row_us(pydantic_path, rows, args.repeat)
+    fast = per_row_us(fast_path, rows, args.repeat)
+    print(json.dumps({
+        "rows": args.rows,
+        "encoder": "orjson" if orjson else "json",
+        "pydantic_us_per_row": round(slow, 2),
+        "fast_us_per_row": round(fast, 2),
+        "speedup": round(slow / fast, 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+from psycopg.conninfo import make_conninfo
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def get_conninfo():
+    """Connection string of the primary: DATABASE_PRIMARY_DSN, or built from the DATABASE_* settings"""
+    if os.getenv('DATABASE_PRIMARY_DSN'):
+        return os.getenv('DATABASE_PRIMARY_DSN')
+    return make_conninfo(
+        dbname=os.getenv('DATABASE_NAME', 'neondb'),
+        user=os.getenv('DATABASE_USER', 'neondb_owner'),
+        password=os.getenv('DATABASE_PASSWORD', 'npg_hCANMIw4u1Db'),
+        host=os.getenv('DATABASE_HOST', 'ep-red-night-aeq96bnr.c-2.us-east-2.aws.neon.tech'),
+        sslmode=os.getenv('DATABASE_SSLMODE', 'require')
+    )
+
+def get_replica_conninfos():
+    """Connection strings of the read replicas, from the comma separated DATABASE_REPLICA_DSNS"""
+    return [dsn.strip() for dsn in os.getenv('DATABASE_REPLICA_DSNS', '').split(',') if dsn.strip()]
+
+def get_replica_settings():
+    """Replica health checking and read-your-writes settings"""
+    return {
+        "max_lag_seconds": float(os.getenv('DATABASE_REPLICA_MAX_LAG', 5)),
+        "check_interval": float(os.getenv('DATABASE_REPLICA_CHECK_INTERVAL', 2)),
+        "check_timeout": float(os.getenv('DATABASE_REPLICA_CHECK_TIMEOUT', 2)),
+        # How long a client that wrote keeps sending its LSN token back (cookie lifetime)
+        "read_your_writes_seconds": float(os.getenv('DATABASE_READ_YOUR_WRITES_SECONDS', 10)),
+    }
+
+def get_pool_settings():
+    """Read pool sizing and recycling settings from the environment"""
+    min_size = int(os.getenv('DATABASE_POOL_MIN_SIZE', 1))
+    return {
+        "min_size": min_size,
+        "max_size": int(os.getenv('DATABASE_POOL_MAX_SIZE', 10)),
+        "timeout": float(os.getenv('DATABASE_POOL_TIMEOUT', 30)),
+        "max_idle": float(os.getenv('DATABASE_POOL_MAX_IDLE', 300)),
+        "max_lifetime": float(os.getenv('DATABASE_POOL_MAX_LIFETIME', 3600)),
+        # Background workers opening connections, so the min_size first ones are opened in parallel
+        "num_workers": int(os.getenv('DATABASE_POOL_WORKERS', min(max(3, min_size), 10))),
+    }
+
+def get_connect_settings():
+    """How long to wait for the database when the pools are first opened, and how often to retry"""
+    return {
+        "timeout": float(os.getenv('DATABASE_CONNECT_TIMEOUT', 10)),   # per attempt
+        "retries": int(os.getenv('DATABASE_CONNECT_RETRIES', 5)),
+        "backoff": float(os.getenv('DATABASE_CONNECT_BACKOFF', 0.5)),  # doubled after each failed attempt
+        "backoff_max": float(os.getenv('DATABASE_CONNECT_BACKOFF_MAX', 8)),
+    }
+
+def connect_backoff(settings, attempt):
+    """Seconds to wait before retrying after failed attempt number `attempt` (1-based)"""
+    return min(settings['backoff'] * 2 ** (attempt - 1), settings['backoff_max'])
+
+def get_retry_settings():
+    """Retrying reads after a lost connection, and the circuit breaker that stops trying while the database is down"""
+    return {
+        "retries": int(os.getenv('DATABASE_READ_RETRIES', 2)),
+        "backoff": float(os.getenv('DATABASE_RETRY_BACKOFF', 0.05)),     # jittered, doubled per retry
+        "backoff_max": float(os.getenv('DATABASE_RETRY_BACKOFF_MAX', 1)),
+        "deadline": float(os.getenv('DATABASE_RETRY_DEADLINE', 5)),      # for a read, all attempts included
+        "breaker_threshold": int(os.getenv('DATABASE_BREAKER_THRESHOLD', 5)),
+        "breaker_cooldown": float(os.getenv('DATABASE_BREAKER_COOLDOWN', 5)),
+    }
+
+def get_server_settings():
+    """Settings of the multi-process production server (manage.py start --production)"""
+    return {
+        "host": os.getenv('HOST', '0.0.0.0'),
+        "port": int(os.getenv('PORT', 8000)),
+        "workers": int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1)),
+        # Import the app once in the supervisor before starting, so a broken deploy fails there instead of in
+        # every worker; workers are spawned and import it again, nothing is shared
+        "check_import": os.getenv('SERVER_CHECK_IMPORT', 'true').lower() == 'true',
+        "loop": os.getenv('SERVER_LOOP', 'auto'),    # auto, asyncio or uvloop
+        "http": os.getenv('SERVER_HTTP', 'auto'),    # auto, h11 or httptools
+        "keep_alive": int(os.getenv('SERVER_KEEP_ALIVE', 5)),
+        "backlog": int(os.getenv('SERVER_BACKLOG', 2048)),
+        "graceful_timeout": int(os.getenv('SERVER_GRACEFUL_TIMEOUT', 30)),
+        # Connections left free for migrations, psql sessions and other clients
+        "reserved_connections": int(os.getenv('DATABASE_RESERVED_CONNECTIONS', 5)),
+    }
+
+def get_prepare_setting():
+    """Whether the hot read queries run as server-side prepared statements (DATABASE_PREPARED_STATEMENTS).
+
+    Set it to false to execute everything unprepared, e.g. to measure the
+    planning cost prepared statements save.
+    """
+    return os.getenv('DATABASE_PREPARED_STATEMENTS', 'true').lower() == 'true'
+
+def summarize_pool_stats(stats):
+    """Pool usage from psycopg_pool's get_stats(): connections in use, waiting clients and wait time"""
+    size = stats.get('pool_size', 0)
+    available = stats.get('pool_available', 0)
+    requests = stats.get('requests_num', 0)
+    wait_ms = stats.get('requests_wait_ms', 0)
+    return {
+        "min_size": stats.get('pool_min', 0),
+        "max_size": stats.get('pool_max', 0),
+        "size": size,
+        "in_use": size - available,
+        "available": available,
+        "waiting": stats.get('requests_waiting', 0),
+        "requests": requests,
+        "requests_queued": stats.get('requests_queued', 0),
+        "wait_ms_total": wait_ms,
+        "wait_ms_avg": round(wait_ms / requests, 2) if requests else 0,
+        "timeouts": stats.get('requests_errors', 0),
+        "connections_opened": stats.get('connections_num', 0),
+        "connection_errors": stats.get('connections_errors', 0),
+        "connections_lost": stats.get('connections_lost', 0),
+    }
+
+def get_count_settings():
+    """Listing total settings: exact COUNT cutoff and how long a total is cached"""
+    return {
+        "exact_limit": int(os.getenv('JOBS_COUNT_EXACT_LIMIT', 10000)),
+        "cache_seconds": float(os.getenv('JOBS_COUNT_CACHE_SECONDS', 30)),
+    }
+
+def get_metrics_settings():
+    """Instrumentation settings: metrics on/off and the slow-query log threshold and EXPLAIN policy.
+
+    SLOW_QUERY_MS=0 turns the slow-query log off. Slow read-only statements
+    are re-run under EXPLAIN (ANALYZE, BUFFERS) at most once per fingerprint
+    every SLOW_QUERY_EXPLAIN_INTERVAL seconds. With METRICS_MULTIPROC_DIR,
+    each worker saves its metrics there every METRICS_FLUSH_SECONDS and
+    /api/metrics reports those of all workers.
+    """
+    return {
+        "enabled": os.getenv('METRICS_ENABLED', 'true').lower() == 'true',
+        "slow_query_ms": float(os.getenv('SLOW_QUERY_MS', 500)),
+        "slow_query_explain": os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true',
+        "explain_interval": float(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', 300)),
+        "multiproc_dir": os.getenv('METRICS_MULTIPROC_DIR') or None,
+        "flush_seconds": float(os.getenv('METRICS_FLUSH_SECONDS', 5)),
+    }
+
+def get_archive_settings():
+    """`manage.py archive` settings: how long jobs stay in jobs, and how far ahead partitions are created"""
+    return {
+        "retention_days": int(os.getenv('JOBS_RETENTION_DAYS', 180)),
+        "months_ahead": int(os.getenv('JOBS_PARTITION_MONTHS_AHEAD', 3)),
+        # Detaching or attaching a partition briefly locks jobs; give up rather than queue behind long queries
+        "lock_timeout": os.getenv('JOBS_ARCHIVE_LOCK_TIMEOUT', '5s'),
+    }
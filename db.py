@@ -1,320 +1,519 @@
+import json
 import os
+import threading
+import time
 import psycopg
-from psycopg.rows import dict_row
-import json
-from datetime import datetime
+from psycopg.pq import TransactionStatus
+from psycopg_pool import ConnectionPool, PoolTimeout
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from config import get_archive_settings
+from dbcommon import BaseDatabase, DimensionCache, EstimatedTotals, SLOW_QUERY_EXPLAIN, partition_settings
+from replicas import ReadSession, current_session, parse_lsn
+from importer import IMPORT_BATCH_SIZE, ImportBatches, ImportReport
+from migrate import apply_migrations
+from queries import (
+    DELETE_JOB, STATS_SNAPSHOT, REPLICA_STATUS, CURRENT_WAL_LSN,
+    job_insert_values, build_job_insert, build_jobs_query, paginate_jobs, build_jobs_count_query,
+    build_jobs_estimate_query, jobs_total, build_job_by_id_query,
+    job_update_fields, build_job_update, build_job_stats, CREATE_IMPORT_STAGING, COPY_IMPORT_STAGING,
+    IMPORT_RESOLVE_DIMENSIONS, IMPORT_MERGE_JOBS, COPY_SEED_JOBS,
+    UPSERT_COMPANY, UPSERT_CATEGORY, UPSERT_LOCATION, parse_location, category_slug,
+    JOB_PARTITIONS, ARCHIVE_CUTOFF, ENSURE_JOB_PARTITIONS, SET_LOCK_TIMEOUT, LOCK_JOB_PARTITIONS, TABLE_EXISTS, BUMP_JOBS_DATA_VERSION,
+    build_partition_counts, build_archived_stats_update, build_partition_archive
+)
+from synthetic import CATEGORIES, CITIES, company_names, job_location, synthetic_jobs
 
 load_dotenv()
 
-class Database:
-    def __init__(self):
-        self.conn = None
-        self.connect()
+# Connection checked out for the current request/task, if any
+_current_connection = ContextVar('current_connection', default=None)
+
+class Database(BaseDatabase):
+    def __init__(self, prepare=None, primary=None, replicas=None, **pool_settings):
+        super().__init__(prepare, primary, replicas, **pool_settings)
+        self._stopping = threading.Event()  # set by close(), for the background threads
+        self._connect_lock = threading.Lock()
+        # One at a time, on their own pooled connection, off the thread that ran the slow query
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+        # Nothing connects until the first query, so importing this module is free
     
+    def _new_pool(self, conninfo, name):
+        return ConnectionPool(conninfo, open=True, **self._pool_args(name))
+
     def connect(self):
+        """Open the pools, retrying with exponential backoff while the database is unreachable"""
+        self._stopping.clear()
+        for attempt in range(1, self.connect_settings['retries'] + 1):
+            pool = self._new_pool(self.conninfo, "jobs")
+            try:
+                pool.wait(timeout=self.connect_settings['timeout'])  # closes the pool on timeout
+                break
+            except PoolTimeout as e:
+                time.sleep(self._connect_failed(e, attempt))
+        self._connected(pool)
+        if self.replicas:
+            # Replicas start evicted and join once a health check passes, so a
+            # missing replica never blocks startup
+            for replica in self.replicas:
+                replica.pool = self._new_pool(replica.conninfo, f"jobs-{replica.name}")
+            self.check_replicas()
+            threading.Thread(target=self._check_replicas_forever, name="replica-checks", daemon=True).start()
+            print(f"Read replicas: {', '.join(r.name + ('' if r.healthy else ' (evicted)') for r in self.replicas)}")
+    
+    def _ensure_connected(self):
+        if self.pool is None:
+            with self._connect_lock:
+                if self.pool is None:
+                    self.connect()
+    
+    def close(self):
+        """Close the pools; the next query connects again"""
+        self._stopping.set()
+        for replica in self.replicas:
+            if replica.pool:
+                replica.pool.close()
+                replica.pool = None
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+            print("Database connection pool closed")
+
+    def check_replicas(self):
+        """Run REPLICA_STATUS on every replica and evict or readmit them"""
+        for replica in self.replicas:
+            try:
+                with replica.pool.connection(timeout=self.replica_settings['check_timeout']) as conn:
+                    self.replicas.record_check(replica, conn.execute(REPLICA_STATUS, prepare=False).fetchone())
+            except Exception as e:
+                self.replicas.record_failure(replica, e)
+
+    def _check_replicas_forever(self):
+        while not self._stopping.wait(self.replica_settings['check_interval']):
+            self.check_replicas()
+
+    @contextmanager
+    def read_session(self, lsn_token=None):
+        """Read-your-writes scope: reads honour the client's LSN token, and
+        after a write the primary's WAL position is left in the session's written_lsn"""
+        session = ReadSession(parse_lsn(lsn_token))
+        token = current_session.set(session)
+        try:
+            yield session
+        finally:
+            current_session.reset(token)
+            if session.wrote and self.replicas:
+                try:
+                    with self.pool.connection() as conn:
+                        session.written_lsn = conn.execute(CURRENT_WAL_LSN).fetchone()['lsn']
+                except psycopg.Error as e:
+                    print(f"Error reading the primary's WAL position: {e}")
+    
+    @contextmanager
+    def connection(self, fresh=False, read_only=False):
+        """Check out a connection for the current scope, reusing an enclosing one unless fresh.
+
+        With read_only the connection may come from a replica; the enclosed
+        execute_* calls must then only read.
+        """
+        with self._connection(fresh, self._read_replica() if read_only else None) as conn:
+            yield conn
+
+    @contextmanager
+    def _connection(self, fresh=False, replica=None, timeout=None):
+        conn = _current_connection.get()
+        if conn is not None and not fresh:
+            yield conn
+            return
+        if replica is None:
+            self.breaker.before_call()  # before connecting, so a database that is down fails fast
+        self._ensure_connected()
+        pool = replica.pool if replica else self.pool
         try:
-            dbname = os.getenv('DATABASE_NAME', 'neondb')
-            user = os.getenv('DATABASE_USER', 'neondb_owner')
-            password = os.getenv('DATABASE_PASSWORD', 'npg_hCANMIw4u1Db')
-            host = os.getenv('DATABASE_HOST', 'ep-red-night-aeq96bnr.c-2.us-east-2.aws.neon.tech')
-            
-            self.conn = psycopg.connect(
-                dbname=dbname,
-                user=user,
-                password=password,
-                host=host,
-                sslmode="require",
-                row_factory=dict_row
-            )
-            print("Database connection established")
+            started = time.perf_counter()
+            with pool.connection(timeout) as conn:
+                self._observe_pool_wait(started)
+                token = _current_connection.set(conn)
+                try:
+                    yield conn
+                finally:
+                    _current_connection.reset(token)
         except Exception as e:
-            print(f"Error connecting to database: {e}")
+            if replica is None and self._record_outcome(e, pool):
+                with self._connect_lock:
+                    if self._reconnecting is None or not self._reconnecting.is_alive():
+                        self._reconnecting = threading.Thread(target=self._reconnect, name="db-reconnect", daemon=True)
+                        self._reconnecting.start()
             raise
+        else:
+            if replica is None:
+                self.breaker.record_success()
+
+    def _reconnect(self):
+        """While the breaker is open, try a new pool every cooldown and swap it in once the primary answers.
+
+        psycopg_pool reconnects by itself, but its backoff doubles without a
+        cap, so after a long outage it may take minutes to notice the
+        database is back.
+        """
+        while not self._stopping.wait(self.breaker.cooldown):
+            if self.breaker.state == "closed":
+                return  # the pool recovered by itself
+            pool = self._new_pool(self.conninfo, "jobs")
+            try:
+                pool.wait(timeout=self.connect_settings['timeout'])
+            except PoolTimeout:
+                continue
+            self._reconnected(pool).close()  # connections still checked out are closed as they come back
+            return
     
-    def close(self):
-        if self.conn:
-            self.conn.close()
-            print("Database connection closed")
+    def in_transaction(self):
+        """Whether the current scope's connection is inside a transaction block"""
+        conn = _current_connection.get()
+        return conn is not None and conn.info.transaction_status != TransactionStatus.IDLE
     
-    def execute_query(self, query, params=None):
+    @contextmanager
+    def transaction(self):
+        """Run the enclosed execute_* calls in a single transaction"""
+        self.mark_written()
+        with self.connection() as conn:
+            with conn.transaction():
+                yield conn
+
+    def _explain_later(self, query, params, query_id):
+        self._explainer.submit(self._explain, query, params, query_id)
+
+    def _explain(self, query, params, query_id):
         try:
-            with self.conn.cursor() as cur:
-                cur.execute(query, params or ())
-                return cur.fetchall()
+            with self.pool.connection() as conn:
+                self._log_plan(query_id, conn.execute(SLOW_QUERY_EXPLAIN + query, params or (), prepare=False).fetchall())
+        except Exception as e:
+            print(f"Error explaining slow query {query_id}: {e}")
+
+    def execute_query(self, query, params=None, prepare=None):
+        """Rows of a statement; plain reads outside a transaction go to a replica when there is one,
+        and are run again if the connection is lost"""
+        read_only = self._is_read(query)
+        try:
+            if read_only and _current_connection.get() is None:
+                return self._read(query, params, prepare)
+            return self._fetch_all(query, params, prepare)
         except Exception as e:
             print(f"Error executing query: {e}")
-            self.conn.rollback()
             raise
+
+    def _read(self, query, params, prepare):
+        """Run a read on a replica, or the primary, retrying lost connections with jittered backoff until the deadline"""
+        deadline = time.monotonic() + self.retry_settings['deadline']
+        replica = self._read_replica()
+        retries, timeout = 0, None
+        while True:
+            try:
+                rows = self._fetch_all(query, params, prepare, replica, timeout)
+                self._read_succeeded(retries)
+                return rows
+            except psycopg.OperationalError as e:
+                replica, retries, timeout, delay = self._read_failed(e, replica, retries, deadline)
+                time.sleep(delay)
+
+    def _fetch_all(self, query, params, prepare, replica=None, timeout=None):
+        with self._connection(replica=replica, timeout=timeout) as conn:
+            with conn.cursor() as cur, self._timed(query, params) as timer:
+                cur.execute(query, params or (), prepare=self._prepare(prepare))
+                rows = cur.fetchall()
+                timer.rows = len(rows)
+                return rows
     
-    def execute_update(self, query, params=None):
+    def execute_update(self, query, params=None, prepare=None):
+        self.mark_written()
         try:
-            with self.conn.cursor() as cur:
-                cur.execute(query, params or ())
-            self.conn.commit()
+            with self.connection() as conn:
+                with conn.cursor() as cur, self._timed(query, params) as timer:
+                    cur.execute(query, params or (), prepare=self._prepare(prepare))
+                    timer.rows = cur.rowcount
             return True
         except Exception as e:
             print(f"Error executing update: {e}")
-            self.conn.rollback()
             raise
     
-    def execute_insert(self, query, params=None):
+    def execute_insert(self, query, params=None, prepare=None):
+        self.mark_written()
         try:
-            with self.conn.cursor() as cur:
-                cur.execute(query, params or ())
-                result = cur.fetchone()
-                if result is None:  # Handle ON CONFLICT DO NOTHING
-                    return None
-                inserted_id = result['id']
-            self.conn.commit()
-            return {"id": inserted_id}
+            with self.connection() as conn:
+                with conn.cursor() as cur, self._timed(query, params) as timer:
+                    cur.execute(query, params or (), prepare=self._prepare(prepare))
+                    result = cur.fetchone()
+                    timer.rows = cur.rowcount
+                    if result is None:  # Handle ON CONFLICT DO NOTHING
+                        return None
+                    return {"id": result['id']}
         except Exception as e:
             print(f"Error executing insert: {e}")
-            self.conn.rollback()
             raise
 
 db = Database()
 
+_estimated_totals = EstimatedTotals()
+_dimensions = DimensionCache()
+
 def create_tables():
-    """Create all necessary tables"""
+    """Create all necessary tables by applying any pending migrations"""
     try:
-        db.execute_update("""
-        CREATE TABLE IF NOT EXISTS companies (
-            id SERIAL PRIMARY KEY,
-            name VARCHAR(255) UNIQUE NOT NULL,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        db.execute_update("""
-        CREATE TABLE IF NOT EXISTS job_categories (
-            id SERIAL PRIMARY KEY,
-            name VARCHAR(100) UNIQUE NOT NULL,
-            slug VARCHAR(100) UNIQUE NOT NULL
-        )
-        """)
-        
-        db.execute_update("""
-        CREATE TABLE IF NOT EXISTS job_locations (
-            id SERIAL PRIMARY KEY,
-            city VARCHAR(100) NOT NULL,
-            country VARCHAR(100) NOT NULL,
-            remote BOOLEAN DEFAULT FALSE,
-            UNIQUE (city, country)
-        )
-        """)
-        
-        db.execute_update("""
-        CREATE TABLE IF NOT EXISTS jobs (
-            id SERIAL PRIMARY KEY,
-            title VARCHAR(255) NOT NULL,
-            description TEXT NOT NULL,
-            requirements TEXT,
-            job_type VARCHAR(50) DEFAULT 'full-time',
-            salary_min DECIMAL(10, 2),
-            salary_max DECIMAL(10, 2),
-            salary_currency VARCHAR(10) DEFAULT 'KSh',
-            skills_required JSONB,
-            company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
-            category_id INTEGER REFERENCES job_categories(id) ON DELETE SET NULL,
-            location_id INTEGER REFERENCES job_locations(id) ON DELETE SET NULL,
-            application_email VARCHAR(255),
-            application_url VARCHAR(500),
-            posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT TRUE
-        )
-        """)
-        
-        db.execute_update("""
-        CREATE TABLE IF NOT EXISTS job_applications (
-            id SERIAL PRIMARY KEY,
-            job_id INTEGER REFERENCES jobs(id) ON DELETE CASCADE,
-            applicant_name VARCHAR(255) NOT NULL,
-            applicant_email VARCHAR(255) NOT NULL,
-            resume_url TEXT,
-            cover_letter TEXT,
-            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        print("All tables created successfully")
+        applied = apply_migrations(db)
+        print(f"Applied {len(applied)} migration(s)" if applied else "Database schema is up to date")
+        created = ensure_job_partitions()
+        if created:
+            print(f"Created jobs partitions for {', '.join(month.strftime('%Y-%m') for month in created)}")
     except Exception as e:
         print(f"Error creating tables: {e}")
         raise
 
-def parse_location(location_str):
-    """Parse location string to city, country, remote"""
-    parts = [p.strip() for p in location_str.split(',') if p.strip()]
-    if not parts:
-        return "Remote", "Kenya", True
-    city = parts[0]
-    country = parts[1] if len(parts) > 1 else "Kenya"
-    remote = city.lower() == 'remote'
-    return city, country, remote
-
-def get_or_create_company(company_name):
-    """Get or create a company"""
-    result = db.execute_query("SELECT id FROM companies WHERE name = %s", (company_name,))
-    if result:
-        return result[0]['id']
-    return db.execute_insert("INSERT INTO companies (name) VALUES (%s) RETURNING id", (company_name,))['id']
-
-def get_or_create_location(location_str):
-    """Get or create a location"""
-    city, country, remote = parse_location(location_str)
-    result = db.execute_query("SELECT id FROM job_locations WHERE city = %s AND country = %s", (city, country))
-    if result:
-        return result[0]['id']
-    return db.execute_insert(
-        "INSERT INTO job_locations (city, country, remote) VALUES (%s, %s, %s) RETURNING id",
-        (city, country, remote)
-    )['id']
-
-def get_or_create_category(category_name='General'):
-    """Get or create a category"""
-    slug = category_name.lower().replace(' ', '-')
-    result = db.execute_query("SELECT id FROM job_categories WHERE name = %s", (category_name,))
-    if result:
-        return result[0]['id']
-    return db.execute_insert(
-        "INSERT INTO job_categories (name, slug) VALUES (%s, %s) RETURNING id",
-        (category_name, slug)
-    )['id']
+def clear_dimension_cache():
+    """Forget cached company/location/category ids, e.g. after the tables are dropped"""
+    _dimensions.clear()
+
+def _retry_on_stale_dimension(write):
+    """Run write(); if a cached dimension id no longer names the same row, drop the cache and retry once"""
+    try:
+        return write()
+    except psycopg.errors.ForeignKeyViolation:
+        _dimensions.clear()
+        if db.in_transaction():
+            raise  # the transaction is aborted; the caller's retry will look the ids up again
+        return write()
 
 def create_job(job_data):
-    """Create a new job"""
-    company_id = get_or_create_company(job_data['company'])
-    location_id = get_or_create_location(job_data['location'])
-    category_id = get_or_create_category(job_data.get('category', 'General'))
-    
-    tags_str = job_data.get('tags', '')
-    tags_list = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-    
-    query = """
-    INSERT INTO jobs (
-        title, description, requirements, job_type, salary_min, salary_max, 
-        salary_currency, skills_required, company_id, category_id, location_id,
-        application_email, application_url, posted_at
-    )
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    RETURNING id
-    """
-    params = (
-        job_data['title'],
-        job_data['description'],
-        job_data['requirements'],
-        job_data.get('type', 'full-time'),
-        job_data.get('salary_min'),
-        job_data.get('salary_max'),
-        job_data.get('salary_currency', 'KSh'),
-        json.dumps(tags_list),
-        company_id,
-        category_id,
-        location_id,
-        job_data.get('application_email', ''),
-        job_data.get('application_url', ''),
-        datetime.now()
-    )
-    return db.execute_insert(query, params)
-
-def get_jobs(page=1, limit=10, search=None):
-    """Get jobs with pagination and search"""
-    offset = (page - 1) * limit
-    query = """
-    SELECT j.*, c.name as company, cat.name as category, l.city, l.country, l.remote
-    FROM jobs j
-    JOIN companies c ON j.company_id = c.id
-    LEFT JOIN job_categories cat ON j.category_id = cat.id
-    LEFT JOIN job_locations l ON j.location_id = l.id
-    WHERE j.is_active = TRUE
-    """
-    params = []
-    if search:
-        query += " AND (j.title ILIKE %s OR j.description ILIKE %s)"
-        params.extend([f"%{search}%", f"%{search}%"])
-    query += " ORDER BY j.posted_at DESC LIMIT %s OFFSET %s"
-    params.extend([limit, offset])
-    return db.execute_query(query, tuple(params))
+    """Create a new job; returns it joined like get_job_by_id, in one statement"""
+    job_data = {'category': 'General', **job_data}
+
+    def insert():
+        upserts, cached = _dimensions.resolve(job_data)
+        rows = db.execute_query(*build_job_insert(job_insert_values(job_data), upserts, cached))
+        _dimensions.remember(job_data, rows[0])
+        return rows[0]
+    return _retry_on_stale_dimension(insert)
+
+def get_jobs_page(page=1, limit=10, search=None, cursor=None, filters=None):
+    """Get a page of jobs plus the cursors of the neighbouring pages"""
+    # Full-text searches stay unprepared: a generic plan can't account for the search terms
+    query, params = build_jobs_query(page=page, limit=limit, search=search, cursor=cursor, filters=filters)
+    rows = db.execute_query(query, params, prepare=not search)
+    return paginate_jobs(rows, limit, page=page, cursor=cursor)
+
+def get_jobs(page=1, limit=10, search=None, cursor=None, filters=None):
+    """Get jobs with pagination, search and filters"""
+    return get_jobs_page(page=page, limit=limit, search=search, cursor=cursor, filters=filters)['jobs']
+
+def count_jobs(search=None, filters=None):
+    """Total for the listing filter: exact up to JOBS_COUNT_EXACT_LIMIT matches, estimated above"""
+    total = _estimated_totals.get(search, filters)
+    if total is not None:
+        return total
+    cap = _estimated_totals.settings['exact_limit']
+    count_rows = db.execute_query(*build_jobs_count_query(search=search, cap=cap, filters=filters), prepare=not search)
+    estimate_rows = None
+    if count_rows[0]['count'] > cap:
+        estimate_rows = db.execute_query(*build_jobs_estimate_query(search=search, filters=filters))
+    total = jobs_total(count_rows, cap, estimate_rows)
+    _estimated_totals.remember(search, filters, total)
+    return total
 
 def get_job_by_id(job_id):
     """Get a single job by ID"""
-    query = """
-    SELECT j.*, c.name as company, cat.name as category, l.city, l.country, l.remote
-    FROM jobs j
-    JOIN companies c ON j.company_id = c.id
-    LEFT JOIN job_categories cat ON j.category_id = cat.id
-    LEFT JOIN job_locations l ON j.location_id = l.id
-    WHERE j.id = %s AND j.is_active = TRUE
-    """
-    result = db.execute_query(query, (job_id,))
+    result = db.execute_query(*build_job_by_id_query(job_id), prepare=True)
     return result[0] if result else None
 
 def update_job(job_id, job_data):
-    """Update a job"""
-    if not get_job_by_id(job_id):
-        return False
-    
-    update_fields = {}
-    for key in ['title', 'description', 'requirements', 'job_type', 'salary_min', 'salary_max', 
-                'salary_currency', 'application_email', 'application_url']:
-        if key in job_data:
-            update_fields[key] = job_data[key]
-    
-    if 'type' in job_data:
-        update_fields['job_type'] = job_data['type']
-    
-    if 'tags' in job_data:
-        tags_str = job_data['tags']
-        tags_list = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-        update_fields['skills_required'] = json.dumps(tags_list)
-    
-    if 'company' in job_data:
-        update_fields['company_id'] = get_or_create_company(job_data['company'])
-    
-    if 'location' in job_data:
-        update_fields['location_id'] = get_or_create_location(job_data['location'])
-    
-    if 'category' in job_data:
-        update_fields['category_id'] = get_or_create_category(job_data['category'])
-    
-    if not update_fields:
-        return True
-    
-    set_clause = ', '.join(f"{k} = %s" for k in update_fields)
-    params = list(update_fields.values()) + [job_id]
-    query = f"UPDATE jobs SET {set_clause} WHERE id = %s"
-    db.execute_update(query, tuple(params))
-    return True
+    """Update a job; returns it joined like get_job_by_id, or None if there is no such active job"""
+    def update():
+        upserts, cached = _dimensions.resolve(job_data)
+        update_fields = job_update_fields(job_data)
+        if not update_fields and not upserts and not cached:
+            return get_job_by_id(job_id)
+        rows = db.execute_query(*build_job_update(job_id, update_fields, upserts, cached))
+        if not rows:
+            return None
+        _dimensions.remember(job_data, rows[0])
+        return rows[0]
+    return _retry_on_stale_dimension(update)
 
 def delete_job(job_id):
     """Soft delete a job"""
-    query = "UPDATE jobs SET is_active = FALSE WHERE id = %s"
-    return db.execute_update(query, (job_id,))
+    return db.execute_update(DELETE_JOB, (job_id,))
 
 def get_job_stats():
-    """Get job statistics"""
-    stats = {}
-    total = db.execute_query("SELECT COUNT(*) as count FROM jobs")
-    stats["total_jobs"] = total[0]['count'] if total else 0
-    
-    active = db.execute_query("SELECT COUNT(*) as count FROM jobs WHERE is_active = TRUE")
-    stats["active_jobs"] = active[0]['count'] if active else 0
-    
-    categories = db.execute_query("""
-    SELECT cat.name, COUNT(j.id) as count 
-    FROM job_categories cat
-    LEFT JOIN jobs j ON cat.id = j.category_id AND j.is_active = TRUE
-    GROUP BY cat.name
-    """)
-    stats["categories"] = {cat['name']: cat['count'] for cat in categories}
-    
-    locations = db.execute_query("""
-    SELECT CONCAT(l.city, ', ', l.country) as loc, COUNT(j.id) as count 
-    FROM job_locations l
-    LEFT JOIN jobs j ON l.id = j.location_id AND j.is_active = TRUE
-    GROUP BY loc
-    """)
-    stats["locations"] = {loc['loc']: loc['count'] for loc in locations}
-    
-    return stats
\ No newline at end of file
+    """Get job statistics from the precomputed job_stats counters"""
+    return build_job_stats(db.execute_query(STATS_SNAPSHOT))
+
+def import_jobs(records, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Bulk load (line_no, record) pairs from importer.parse_records.
+
+    Valid rows are COPYed into a staging table and merged into jobs
+    batch_size at a time, each batch in its own transaction so the
+    job_stats and data_versions rows it updates are not locked for the
+    whole import. Invalid rows are recorded in the returned ImportReport.
+    Any other failure stops the import: the batches before it stay
+    committed, and the report counts them and carries the error. progress,
+    if given, is called with the report after each batch.
+    """
+    report = ImportReport()
+    batches = ImportBatches(report, batch_size)
+    try:
+        for line_no, record in records:
+            batch = batches.add(line_no, record)
+            if batch:
+                report.imported += _load_import_batch(batch, batches.new_months(batch))
+                if progress:
+                    progress(report)
+        batch = batches.rest()
+        if batch:
+            report.imported += _load_import_batch(batch, batches.new_months(batch))
+            if progress:
+                progress(report)
+    except Exception as e:
+        print(f"Error importing jobs after {report.imported} rows: {e}")
+        report.error = str(e)
+    return report
+
+def _load_import_batch(batch, new_months):
+    """COPY one batch into staging and merge it into jobs in one transaction; returns the rows inserted.
+
+    The partitions for new_months, posted_at months of no earlier batch, are created first.
+    """
+    if new_months:
+        ensure_job_partitions(months=new_months)
+    with db.transaction() as conn:
+        db.execute_update(CREATE_IMPORT_STAGING)
+        with conn.cursor() as cur:
+            with cur.copy(COPY_IMPORT_STAGING) as copy:
+                for row in batch:
+                    copy.write_row(row)
+            for statement in IMPORT_RESOLVE_DIMENSIONS:
+                cur.execute(statement)
+            cur.execute(IMPORT_MERGE_JOBS)
+            return cur.rowcount
+
+SEED_BATCH_SIZE = 10000
+SEED_DAYS = 365
+SEED_WORKERS = int(os.getenv('SEED_WORKERS', min(4, os.cpu_count() or 1)))
+
+def _month_starts(first, last):
+    """The first day of every month from first's to last's"""
+    month, months = first.date().replace(day=1), []
+    while month <= last.date():
+        months.append(month)
+        month = (month + timedelta(days=32)).replace(day=1)
+    return months
+
+def seed_jobs(count, companies=500, seed=42, batch_size=SEED_BATCH_SIZE, workers=SEED_WORKERS, progress=None,
+              now=None):
+    """Load count synthetic jobs from synthetic.synthetic_jobs; returns the number loaded.
+
+    The companies, categories and locations they use are upserted first, so
+    jobs are COPYed straight into the table, skipping the validation and
+    staging merge of import_jobs. Batches of batch_size are COPYed and
+    committed on up to `workers` pooled connections at once, as most of the
+    cost is the per-row search_vector trigger on the server. Jobs are spread
+    over the year up to now (default: the current time), whose monthly
+    partitions are created first; the data is the same for a given seed and
+    now, and with more than one worker only the order of the ids varies. progress, if given, is called with the number of jobs
+    loaded so far after each batch.
+    """
+    now = now or datetime.now().replace(microsecond=0)  # one anchor for every batch
+    ensure_job_partitions(months=_month_starts(now - timedelta(days=SEED_DAYS), now))
+    with db.transaction() as conn:
+        with conn.cursor() as cur:
+            def upsert_all(query, params_seq):
+                cur.executemany(query, params_seq, returning=True)
+                rows = []
+                while True:
+                    rows.extend(cur.fetchall())
+                    if not cur.nextset():
+                        return rows
+
+            company_ids = {row['name']: row['id'] for row in upsert_all(
+                UPSERT_COMPANY, [(name,) for name in company_names(companies, seed)])}
+            category_ids = {row['name']: row['id'] for row in upsert_all(
+                UPSERT_CATEGORY, [(name, category_slug(name)) for name in CATEGORIES])}
+            locations = {job_location(city): parse_location(job_location(city)) for city, _ in CITIES}
+            location_ids = {(row['city'], row['country']): row['id'] for row in upsert_all(
+                UPSERT_LOCATION, list(locations.values()))}
+    location_ids = {location: location_ids[key[:2]] for location, key in locations.items()}
+
+    def load_batch(start):
+        jobs = synthetic_jobs(count, companies=companies, seed=seed, days=SEED_DAYS, now=now, start=start, stop=start + batch_size)
+        with db.transaction() as conn:
+            with conn.cursor() as cur:
+                # Losing the last batches in a crash is fine for synthetic data
+                cur.execute("SET LOCAL synchronous_commit = off")
+                with cur.copy(COPY_SEED_JOBS) as copy:
+                    for job in jobs:
+                        copy.write_row((
+                            job['title'], job['description'], job['requirements'], job['type'],
+                            job['salary_min'], job['salary_max'], job['salary_currency'], json.dumps(job['tags']),
+                            company_ids[job['company']], category_ids[job['category']],
+                            location_ids[job['location']], job['application_email'], '', job['posted_at'],
+                        ))
+        return min(batch_size, count - start)
+
+    loaded = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for rows in executor.map(load_batch, range(0, count, batch_size)):
+            loaded += rows
+            if progress:
+                progress(loaded)
+    return loaded
+
+def ensure_job_partitions(months_ahead=None, months=()):
+    """Create the monthly jobs partitions for `months` (dates), the next months_ahead
+    months and any month with rows waiting in jobs_default; returns the months created"""
+    lock_timeout, params = partition_settings(months_ahead, months)
+    with db.transaction():
+        db.execute_query(SET_LOCK_TIMEOUT, (lock_timeout,))
+        db.execute_query(LOCK_JOB_PARTITIONS)
+        rows = db.execute_query(ENSURE_JOB_PARTITIONS, params)
+    return [row['month'] for row in rows if row['created']]
+
+def archive_jobs(retention_days=None, detach=False, months_ahead=None):
+    """Move the months of jobs posted before the retention window out of jobs; returns one entry per month.
+
+    Only whole months go: those ending before the start of the month that is
+    retention_days ago. Each month's partition is detached from jobs in a
+    short transaction of its own, as that locks jobs, then taken off the
+    job_stats counters and attached to jobs_archive (as jobs_archive_pYYYY_MM)
+    in a second one; with detach it is left as a plain jobs_detached_pYYYY_MM
+    table to be dumped or dropped. A month detached by a run that stopped
+    before finishing is finished by the next one.
+    """
+    settings = get_archive_settings()
+    retention_days = settings['retention_days'] if retention_days is None else retention_days
+    ensure_job_partitions(months_ahead)  # also moves jobs_default rows into their month's partition
+    archived = []
+    with db.connection():
+        cutoff = db.execute_query(ARCHIVE_CUTOFF, (retention_days,))[0]['cutoff']
+        for partition in db.execute_query(JOB_PARTITIONS):
+            if partition['attached']:
+                if partition['month'] >= cutoff:
+                    continue
+                with db.transaction():
+                    db.execute_query(SET_LOCK_TIMEOUT, (settings['lock_timeout'],))
+                    db.execute_update(f"ALTER TABLE jobs DETACH PARTITION {partition['name']}")
+                    db.execute_update(BUMP_JOBS_DATA_VERSION)
+            archived.append(_finish_archive(partition, detach))
+    return archived
+
+def _finish_archive(partition, detach):
+    """Take a detached jobs partition off the counters and move it to the archive"""
+    name, month = partition['name'], partition['month']
+    target = ('jobs_detached_' if detach else 'jobs_archive_') + name[len('jobs_'):]
+    with db.transaction():
+        counts = db.execute_query(build_partition_counts(name))[0]
+        db.execute_update(build_archived_stats_update(name))
+        exists = db.execute_query(TABLE_EXISTS, (target,))[0]['exists']
+        for statement in build_partition_archive(name, target, month, exists, attach=not detach):
+            db.execute_update(statement)
+        db.execute_update(BUMP_JOBS_DATA_VERSION)
+    return {"month": month.strftime('%Y-%m'), "jobs": counts['jobs'], "active": counts['active'], "table": target}
@@ -0,0 +1,226 @@
+import os
+import time
+from psycopg.rows import dict_row
+from psycopg_pool import PoolTimeout
+from config import (
+    get_conninfo, get_replica_conninfos, get_replica_settings, get_pool_settings, get_connect_settings,
+    connect_backoff, get_retry_settings, get_count_settings, get_prepare_setting, get_metrics_settings,
+    summarize_pool_stats, get_archive_settings
+)
+from cache import LRUCache
+from metrics import QueryTimer, fingerprint, is_read_only, metrics
+from replicas import ReplicaSet, current_session
+from resilience import CircuitBreaker, DatabaseUnavailable, is_connection_error, retry_delay
+from queries import job_dimension_keys, jobs_filter_key
+
+# What db.Database and async_db.AsyncDatabase have in common apart from the
+# I/O: settings, replica choice, circuit breaker bookkeeping, read retry
+# decisions, the slow-query log and the caches of the data functions. The two
+# classes only open pools, check out connections and run statements.
+
+SLOW_QUERY_EXPLAIN = "EXPLAIN (ANALYZE, BUFFERS) "
+
+class BaseDatabase:
+    def __init__(self, prepare=None, primary=None, replicas=None, **pool_settings):
+        self.pool = None
+        self.conninfo = primary or get_conninfo()
+        self.replica_settings = get_replica_settings()
+        self.replicas = ReplicaSet(get_replica_conninfos() if replicas is None else replicas,
+                                   self.replica_settings['max_lag_seconds'])
+        self.settings = {**get_pool_settings(), **pool_settings}
+        self.connect_settings = get_connect_settings()
+        self.retry_settings = get_retry_settings()
+        self.breaker = CircuitBreaker(self.retry_settings['breaker_threshold'], self.retry_settings['breaker_cooldown'])
+        self.connect_error = None
+        self._reconnecting = None
+        self._connection_errors = 0
+        self.prepare = get_prepare_setting() if prepare is None else prepare
+        self.metrics = get_metrics_settings()
+        # fingerprint -> True while a slow query's plan was logged recently
+        self._explained = LRUCache(maxsize=1024, ttl=self.metrics['explain_interval'])
+
+    def _pool_args(self, name):
+        """Keyword arguments for a ConnectionPool or AsyncConnectionPool"""
+        return {
+            "kwargs": {"autocommit": True, "row_factory": dict_row, "prepare_threshold": 5 if self.prepare else None},
+            "name": name,
+            **self.settings,
+        }
+
+    def _connect_failed(self, error, attempt):
+        """Seconds to wait before the next attempt to open the primary pool.
+
+        After the last one the circuit breaker opens, so until its cooldown is
+        over queries fail with DatabaseUnavailable instead of all trying again.
+        """
+        settings = self.connect_settings
+        self.connect_error = str(error)
+        if attempt == settings['retries']:
+            print(f"Error connecting to database: {error}")
+            self.breaker.trip()
+            raise DatabaseUnavailable(self.breaker.cooldown) from error
+        delay = connect_backoff(settings, attempt)
+        print(f"Database not ready (attempt {attempt}/{settings['retries']}), retrying in {delay:.1f}s")
+        return delay
+
+    def _connected(self, pool, label="Database"):
+        self.pool, self.connect_error = pool, None
+        print(f"{label} connection pool established (min={self.settings['min_size']}, max={self.settings['max_size']})")
+
+    def mark_written(self):
+        """Note that the current session wrote, so its later reads go to the primary"""
+        session = current_session.get()
+        if session is not None:
+            session.wrote = True
+
+    def _read_replica(self):
+        """Replica for a read outside any bound connection, or None to use the primary"""
+        if not self.replicas:
+            return None
+        session = current_session.get()
+        if session is None:
+            return self.replicas.choose()
+        if session.wrote:
+            return None
+        if not session.chosen:
+            session.replica, session.chosen = self.replicas.choose(session.min_lsn), True
+        elif session.replica is not None and not session.replica.healthy:
+            session.replica = None
+        return session.replica
+
+    def _is_read(self, query):
+        """Whether query only reads; a write is noted for read-your-writes"""
+        read_only = is_read_only(fingerprint(query)[1])
+        if not read_only:
+            self.mark_written()
+        return read_only
+
+    def _record_outcome(self, error, pool):
+        """Feed the circuit breaker with the error of a call on the primary; returns whether to start reconnecting"""
+        if isinstance(error, PoolTimeout):
+            # An outage if the pool failed to connect meanwhile, rather than just being busy
+            errors = pool.get_stats().get('connections_errors', 0)
+            if errors > self._connection_errors or self.breaker.state != "closed":
+                self.breaker.record_failure()
+            self._connection_errors = errors
+        elif is_connection_error(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()  # the database answered, even if the statement failed
+        return self.breaker.state != "closed"
+
+    def _reconnected(self, pool):
+        """Swap in a pool the reconnect loop opened; returns the old one, to be closed"""
+        old, self.pool = self.pool, pool
+        self._connection_errors = 0
+        self.breaker.record_success()
+        if self.metrics['enabled']:
+            metrics.observe_reconnect()
+        print("Reconnected to the database")
+        return old
+
+    def _read_failed(self, error, replica, retries, deadline):
+        """What to do after a read failed: (replica, retries, pool checkout timeout, delay) for the next
+        attempt, or re-raise error if the read should not be run again"""
+        if replica is not None:
+            # Read from the primary instead, as do the session's later reads; a replica that went away is evicted
+            if is_connection_error(error):
+                self.replicas.record_failure(replica, error)
+            session = current_session.get()
+            if session is not None and session.replica is replica:
+                session.replica = None
+            return None, retries, None, 0
+        settings = self.retry_settings
+        if not is_connection_error(error) or retries >= settings['retries']:
+            raise error
+        retries += 1
+        delay = retry_delay(settings, retries)
+        timeout = deadline - time.monotonic() - delay  # for the pool checkout of the next attempt
+        if timeout <= 0:
+            raise error
+        print(f"Connection lost ({str(error).strip()}), retrying read in {delay * 1000:.0f} ms")
+        if self.metrics['enabled']:
+            metrics.observe_read_retry()
+        return None, retries, timeout, delay
+
+    def _read_succeeded(self, retries):
+        if retries and self.metrics['enabled']:
+            metrics.observe_read_retry(recovered=True)
+
+    def pool_stats(self):
+        """Pool usage: connections in use, waiting clients and checkout wait time"""
+        return summarize_pool_stats(self.pool.get_stats() if self.pool else {})
+
+    def _observe_pool_wait(self, started):
+        if self.metrics['enabled']:
+            metrics.observe_pool_wait(time.perf_counter() - started)
+
+    def _prepare(self, prepare):
+        """psycopg's prepare flag: True prepares now, None after prepare_threshold runs, False never"""
+        return prepare if self.prepare else False
+
+    def _timed(self, query, params):
+        """QueryTimer for one statement, feeding the metrics and the slow-query log"""
+        slow_ms = self.metrics['slow_query_ms']
+        return QueryTimer(query, enabled=self.metrics['enabled'], slow_seconds=slow_ms / 1000 if slow_ms else None,
+                          on_slow=lambda *slow: self._log_slow_query(query, params, *slow))
+
+    def _log_slow_query(self, query, params, query_id, normalized, seconds, rows):
+        print(f"Slow query {query_id} ({seconds * 1000:.1f} ms, {rows} rows): {normalized}")
+        if (not self.metrics['slow_query_explain'] or not is_read_only(normalized)
+                or normalized.upper().startswith('EXPLAIN') or self._explained.get(query_id)):
+            return
+        self._explained.set(query_id, True)
+        # In the background, so the request that ran the slow query isn't held up further
+        self._explain_later(query, params, query_id)
+
+    @staticmethod
+    def _log_plan(query_id, plan):
+        print(f"Plan of slow query {query_id}:\n" + '\n'.join(row['QUERY PLAN'] for row in plan))
+
+class DimensionCache:
+    """name -> id for companies, locations and categories, so a job write can skip their upserts"""
+
+    def __init__(self, maxsize=int(os.getenv('DIMENSION_CACHE_SIZE', 10000))):
+        self._ids = LRUCache(maxsize=maxsize)
+
+    def resolve(self, job_data):
+        """Upsert params for the company/location/category in job_data that aren't cached, and
+        (id, *names) for those that are, which the write checks against the tables"""
+        upserts, cached = {}, {}
+        for column, key, params in job_dimension_keys(job_data):
+            id = self._ids.get(key)
+            if id is None:
+                upserts[column] = params
+            else:
+                cached[column] = (id, *key[1:])
+        return upserts, cached
+
+    def remember(self, job_data, job):
+        """Cache the dimension ids a write resolved"""
+        for column, key, _ in job_dimension_keys(job_data):
+            self._ids.set(key, job[column])
+
+    def clear(self):
+        self._ids.clear()
+
+class EstimatedTotals:
+    """Listing totals too large to count exactly, cached for JOBS_COUNT_CACHE_SECONDS"""
+
+    def __init__(self):
+        self.settings = get_count_settings()
+        self._totals = LRUCache(maxsize=256, ttl=self.settings['cache_seconds'])
+
+    def get(self, search=None, filters=None):
+        return self._totals.get(jobs_filter_key(search, filters))
+
+    def remember(self, search, filters, total):
+        # Only the large, approximate totals are cached; small exact ones are cheap to recount
+        if not total['exact']:
+            self._totals.set(jobs_filter_key(search, filters), total)
+
+def partition_settings(months_ahead=None, months=()):
+    """(lock timeout, ENSURE_JOB_PARTITIONS params) for ensure_job_partitions"""
+    settings = get_archive_settings()
+    months_ahead = settings['months_ahead'] if months_ahead is None else months_ahead
+    return settings['lock_timeout'], (sorted(months), months_ahead)
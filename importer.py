@@ -0,0 +1,229 @@
+import codecs
+import csv
+import json
+from datetime import datetime, timezone
+from queries import parse_location, parse_tags, category_slug
+
+# Parsing and validation for bulk job imports. Records are read one at a time
+# so an import runs in constant memory whatever the size of the feed; the
+# loading itself (COPY into a staging table, then one merge per batch) lives
+# in import_jobs in db.py and async_db.py.
+
+IMPORT_FORMATS = ('ndjson', 'csv')
+IMPORT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+# Column limits from the schema, checked up front so one bad row can't fail a COPY batch
+FIELD_LIMITS = {
+    'title': 255, 'company': 255, 'job_type': 50, 'salary_currency': 10, 'category': 100,
+    'application_email': 255, 'application_url': 500,
+}
+REQUIRED_FIELDS = ('title', 'company', 'location', 'description')
+MAX_SALARY = 10 ** 8  # DECIMAL(10, 2)
+
+def import_format(filename, default='ndjson'):
+    """Guess the feed format from a file name"""
+    return 'csv' if filename.lower().endswith('.csv') else default
+
+class CsvRecordAssembler:
+    """Turns CSV lines into dict records, joining quoted fields that span lines"""
+
+    def __init__(self):
+        self.header = None
+        self.pending = []
+        self.quotes = 0
+
+    def feed(self, line):
+        """Add one line; returns a record once a complete row has been read, else None"""
+        self.pending.append(line)
+        self.quotes += line.count('"')
+        if self.quotes % 2:
+            return None
+        text = ''.join(self.pending)
+        self.pending, self.quotes = [], 0
+        values = next(csv.reader([text]), [])
+        if not values:
+            return None
+        if self.header is None:
+            self.header = [name.strip() for name in values]
+            return None
+        if len(values) != len(self.header):
+            raise ValueError(f"Expected {len(self.header)} columns, got {len(values)}")
+        return dict(zip(self.header, values))
+
+def parse_records(lines, fmt):
+    """(line_no, record or ValueError) for each record in an iterable of text lines"""
+    assembler = CsvRecordAssembler() if fmt == 'csv' else None
+    for line_no, line in enumerate(lines, start=1):
+        try:
+            record = assembler.feed(line) if assembler else parse_ndjson_line(line)
+        except ValueError as e:
+            record = e
+        if record is not None:
+            yield line_no, record
+
+async def aparse_records(lines, fmt):
+    """Async counterpart of parse_records for an async iterable of text lines"""
+    assembler = CsvRecordAssembler() if fmt == 'csv' else None
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        try:
+            record = assembler.feed(line) if assembler else parse_ndjson_line(line)
+        except ValueError as e:
+            record = e
+        if record is not None:
+            yield line_no, record
+
+async def aiter_lines(chunks):
+    """Split an async stream of UTF-8 byte chunks into lines, keeping line endings"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            yield line + '\n'
+    buffer += decoder.decode(b'', final=True)
+    if buffer:
+        yield buffer
+
+def parse_ndjson_line(line):
+    if not line.strip():
+        return None
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("Expected a JSON object")
+    return record
+
+def _salary(value):
+    if value in (None, ''):
+        return None
+    amount = float(str(value).replace('KSh', '').replace(',', '').strip())
+    if not 0 <= amount < MAX_SALARY:
+        raise ValueError(f"Salary out of range: {value}")
+    return amount
+
+def staging_row(line_no, record):
+    """Validate a record and turn it into a row for the import staging table.
+
+    Accepts the same fields as POST /api/jobs/, with tags as a list or a comma
+    separated string and an optional ISO posted_at, stored in UTC if it has an
+    offset. Raises ValueError with a message suitable for the per-row error
+    report.
+    """
+    if isinstance(record, Exception):
+        raise ValueError(f"Unreadable record: {record}")
+    missing = [f for f in REQUIRED_FIELDS if not str(record.get(f) or '').strip()]
+    if missing:
+        raise ValueError(f"Missing required field(s): {', '.join(missing)}")
+    # The values actually stored, where a field has an alias
+    fields = {
+        **record,
+        'job_type': record.get('type') or record.get('job_type') or 'full-time',
+        'application_url': record.get('application_url') or record.get('application_link'),
+    }
+    for field, limit in FIELD_LIMITS.items():
+        if len(str(fields.get(field) or '')) > limit:
+            raise ValueError(f"{field} is longer than {limit} characters")
+
+    salary_min, salary_max = _salary(record.get('salary_min')), _salary(record.get('salary_max'))
+    if record.get('salary') and salary_min is None and salary_max is None:
+        parts = str(record['salary']).split('-')
+        salary_min, salary_max = _salary(parts[0]), _salary(parts[-1])
+    if salary_min is not None and salary_max is not None and salary_max < salary_min:
+        raise ValueError("salary_max must be greater than or equal to salary_min")
+
+    tags = record.get('tags') or []
+    tags = [str(t).strip() for t in tags if str(t).strip()] if isinstance(tags, list) else parse_tags(str(tags))
+
+    city, country, remote = parse_location(str(record['location']))
+    if len(city) > 100 or len(country) > 100:
+        raise ValueError("location is longer than 100 characters")
+    category = str(record.get('category') or 'General').strip()
+    posted_at = record.get('posted_at')
+    posted_at = datetime.fromisoformat(posted_at) if posted_at else None
+    if posted_at is not None and posted_at.tzinfo is not None:
+        posted_at = posted_at.astimezone(timezone.utc).replace(tzinfo=None)  # posted_at is a TIMESTAMP column
+
+    return (
+        line_no,
+        str(record['title']).strip(),
+        str(record['description']),
+        str(record.get('requirements') or ''),
+        str(fields['job_type']),
+        salary_min,
+        salary_max,
+        str(record.get('salary_currency') or 'KSh'),
+        json.dumps(tags),
+        str(record['company']).strip(),
+        city,
+        country,
+        remote,
+        category,
+        category_slug(category),
+        str(record.get('application_email') or ''),
+        str(fields['application_url'] or ''),
+        posted_at,
+    )
+
+def staging_months(rows):
+    """The first day of each month of posted_at in a batch of staging_row tuples"""
+    return {row[-1].date().replace(day=1) for row in rows if row[-1] is not None}
+
+class ImportBatches:
+    """Groups records into batches of valid staging rows, recording the invalid ones in report"""
+
+    def __init__(self, report, batch_size=IMPORT_BATCH_SIZE):
+        self.report = report
+        self.batch_size = batch_size
+        self.batch = []
+        self.months = set()  # posted_at months whose partitions earlier batches made sure of
+
+    def add(self, line_no, record):
+        """Stage one record; returns a full batch to load, or None"""
+        try:
+            self.batch.append(staging_row(line_no, record))
+        except (ValueError, TypeError) as e:
+            self.report.add_error(line_no, str(e))
+        if len(self.batch) >= self.batch_size:
+            return self.rest()
+        return None
+
+    def rest(self):
+        """The last, partial batch, or None"""
+        batch, self.batch = self.batch, []
+        return batch or None
+
+    def new_months(self, batch):
+        """posted_at months of batch not seen in an earlier one, whose partitions may be missing"""
+        months = staging_months(batch) - self.months
+        self.months |= months
+        return months
+
+class ImportReport:
+    """Running totals for an import plus the first MAX_REPORTED_ERRORS row errors"""
+
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.error = None  # what stopped the import, if it didn't finish
+        self.started = datetime.now()
+
+    def add_error(self, line_no, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def as_dict(self):
+        seconds = (datetime.now() - self.started).total_seconds()
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "error": self.error,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.imported / seconds) if seconds else None,
+        }
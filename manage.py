@@ -1,10 +1,20 @@
+import importlib.util
 import os
 import sys
+import tempfile
+import time
 import psycopg
 from dotenv import load_dotenv
 
 # Import database functions
-from db import create_tables, db, create_job, get_or_create_company, get_or_create_location, get_or_create_category
+from config import get_archive_settings, get_pool_settings, get_server_settings
+from db import (
+    create_tables, db, create_job, clear_dimension_cache, import_jobs, seed_jobs, archive_jobs, SEED_WORKERS
+)
+from importer import IMPORT_FORMATS, import_format, parse_records
+from metrics import clear_snapshots
+from migrate import migration_status
+from queries import CONNECTION_LIMITS, LEFTOVER_JOB_TABLES
 
 load_dotenv()
 
@@ -41,6 +51,11 @@ def create_database():
         print(f"Error creating database: {e}")
         sys.exit(1)
 
+def show_migrations():
+    """List migrations and whether they have been applied"""
+    for version, name, applied in migration_status(db):
+        print(f"  [{'x' if applied else ' '}] {version}_{name}")
+
 def run_migrations():
     """Run database migrations"""
     print("Running database migrations...")
@@ -56,113 +71,180 @@ def seed_data():
     print("Seeding database with initial data...")
     
     try:
-        db.conn.autocommit = False
+        with db.transaction():
+            companies = [
+                {"name": "Tech Innovations Ltd", "description": "Leading tech company in Kenya"},
+                {"name": "Digital Solutions Africa", "description": "Providing digital solutions across Africa"},
+                {"name": "Kenya Software Developers", "description": "Top software development company"}
+            ]
         
-        companies = [
-            {"name": "Tech Innovations Ltd", "description": "Leading tech company in Kenya"},
-            {"name": "Digital Solutions Africa", "description": "Providing digital solutions across Africa"},
-            {"name": "Kenya Software Developers", "description": "Top software development company"}
-        ]
+            for company in companies:
+                result = db.execute_query("SELECT id FROM companies WHERE name = %s", (company["name"],))
+                if not result:
+                    db.execute_insert(
+                        "INSERT INTO companies (name, description) VALUES (%s, %s) RETURNING id",
+                        (company["name"], company["description"])
+                    )
+                    print(f"Added company: {company['name']}")
+                else:
+                    print(f"Company already exists: {company['name']}")
         
-        for company in companies:
-            result = db.execute_query("SELECT id FROM companies WHERE name = %s", (company["name"],))
-            if not result:
-                db.execute_insert(
-                    "INSERT INTO companies (name, description) VALUES (%s, %s) RETURNING id",
-                    (company["name"], company["description"])
-                )
-                print(f"Added company: {company['name']}")
-            else:
-                print(f"Company already exists: {company['name']}")
+            categories = [
+                {"name": "Engineering", "slug": "engineering"},
+                {"name": "Design", "slug": "design"},
+                {"name": "Marketing", "slug": "marketing"},
+                {"name": "Sales", "slug": "sales"}
+            ]
         
-        categories = [
-            {"name": "Engineering", "slug": "engineering"},
-            {"name": "Design", "slug": "design"},
-            {"name": "Marketing", "slug": "marketing"},
-            {"name": "Sales", "slug": "sales"}
-        ]
+            for category in categories:
+                result = db.execute_query("SELECT id FROM job_categories WHERE name = %s", (category["name"],))
+                if not result:
+                    db.execute_insert(
+                        "INSERT INTO job_categories (name, slug) VALUES (%s, %s) RETURNING id",
+                        (category["name"], category["slug"])
+                    )
+                    print(f"Added category: {category['name']}")
+                else:
+                    print(f"Category already exists: {category['name']}")
         
-        for category in categories:
-            result = db.execute_query("SELECT id FROM job_categories WHERE name = %s", (category["name"],))
-            if not result:
-                db.execute_insert(
-                    "INSERT INTO job_categories (name, slug) VALUES (%s, %s) RETURNING id",
-                    (category["name"], category["slug"])
-                )
-                print(f"Added category: {category['name']}")
-            else:
-                print(f"Category already exists: {category['name']}")
-        
-        locations = [
-            {"city": "Nairobi", "country": "Kenya", "remote": False},
-            {"city": "Mombasa", "country": "Kenya", "remote": False},
-            {"city": "Kisumu", "country": "Kenya", "remote": False},
-            {"city": "Remote", "country": "Kenya", "remote": True}
-        ]
+            locations = [
+                {"city": "Nairobi", "country": "Kenya", "remote": False},
+                {"city": "Mombasa", "country": "Kenya", "remote": False},
+                {"city": "Kisumu", "country": "Kenya", "remote": False},
+                {"city": "Remote", "country": "Kenya", "remote": True}
+            ]
         
-        for location in locations:
-            result = db.execute_query(
-                "SELECT id FROM job_locations WHERE city = %s AND country = %s",
-                (location["city"], location["country"])
-            )
-            if not result:
-                db.execute_insert(
-                    "INSERT INTO job_locations (city, country, remote) VALUES (%s, %s, %s) RETURNING id",
-                    (location["city"], location["country"], location["remote"])
+            for location in locations:
+                result = db.execute_query(
+                    "SELECT id FROM job_locations WHERE city = %s AND country = %s",
+                    (location["city"], location["country"])
                 )
-                print(f"Added location: {location['city']}, {location['country']}")
-            else:
-                print(f"Location already exists: {location['city']}, {location['country']}")
+                if not result:
+                    db.execute_insert(
+                        "INSERT INTO job_locations (city, country, remote) VALUES (%s, %s, %s) RETURNING id",
+                        (location["city"], location["country"], location["remote"])
+                    )
+                    print(f"Added location: {location['city']}, {location['country']}")
+                else:
+                    print(f"Location already exists: {location['city']}, {location['country']}")
         
-        sample_jobs = [
-            {
-                "title": "Senior Python Developer",
-                "company": "Tech Innovations Ltd",
-                "location": "Nairobi, Kenya",
-                "type": "full-time",
-                "description": "We are looking for an experienced Python developer...",
-                "requirements": "5+ years of Python experience, Django framework knowledge",
-                "salary_min": 80000,
-                "salary_max": 120000,
-                "salary_currency": "KSh",
-                "tags": "Python, Django, PostgreSQL, REST API",
-                "application_email": "hr@techinnovations.co.ke",
-                "application_url": "",
-                "category": "Engineering"
-            },
-            {
-                "title": "UI/UX Designer",
-                "company": "Digital Solutions Africa",
-                "location": "Remote, Kenya",
-                "type": "full-time",
-                "description": "Join our design team to create amazing user experiences...",
-                "requirements": "3+ years of design experience, proficiency in Figma",
-                "salary_min": 60000,
-                "salary_max": 90000,
-                "salary_currency": "KSh",
-                "tags": "UI, UX, Figma, Design Thinking",
-                "application_email": "",
-                "application_url": "https://apply.example.com/ux-designer",
-                "category": "Design"
-            }
-        ]
+            sample_jobs = [
+                {
+                    "title": "Senior Python Developer",
+                    "company": "Tech Innovations Ltd",
+                    "location": "Nairobi, Kenya",
+                    "type": "full-time",
+                    "description": "We are looking for an experienced Python developer...",
+                    "requirements": "5+ years of Python experience, Django framework knowledge",
+                    "salary_min": 80000,
+                    "salary_max": 120000,
+                    "salary_currency": "KSh",
+                    "tags": "Python, Django, PostgreSQL, REST API",
+                    "application_email": "hr@techinnovations.co.ke",
+                    "application_url": "",
+                    "category": "Engineering"
+                },
+                {
+                    "title": "UI/UX Designer",
+                    "company": "Digital Solutions Africa",
+                    "location": "Remote, Kenya",
+                    "type": "full-time",
+                    "description": "Join our design team to create amazing user experiences...",
+                    "requirements": "3+ years of design experience, proficiency in Figma",
+                    "salary_min": 60000,
+                    "salary_max": 90000,
+                    "salary_currency": "KSh",
+                    "tags": "UI, UX, Figma, Design Thinking",
+                    "application_email": "",
+                    "application_url": "https://apply.example.com/ux-designer",
+                    "category": "Design"
+                }
+            ]
         
-        for job in sample_jobs:
-            try:
-                result = create_job(job)
-                print(f"Added job: {job['title']} (ID: {result['id']})")
-            except Exception as e:
-                print(f"Error adding job {job['title']}: {e}")
+            for job in sample_jobs:
+                try:
+                    with db.transaction():  # savepoint, so one bad job doesn't abort the rest
+                        result = create_job(job)
+                    print(f"Added job: {job['title']} (ID: {result['id']})")
+                except Exception as e:
+                    print(f"Error adding job {job['title']}: {e}")
         
-        db.conn.commit()
         print("Database seeding completed successfully")
         
     except Exception as e:
-        db.conn.rollback()
         print(f"Error seeding database: {e}")
         sys.exit(1)
-    finally:
-        db.conn.autocommit = True
+
+def seed_synthetic(jobs, companies=500, seed=42, workers=SEED_WORKERS):
+    """Load a deterministic synthetic dataset of `jobs` jobs for capacity testing or staging"""
+    print(f"Seeding {jobs} synthetic jobs across {companies} companies (seed {seed}, {workers} workers)...")
+    started = time.perf_counter()
+
+    def progress(loaded):
+        seconds = time.perf_counter() - started
+        print(f"  {loaded}/{jobs} jobs, {loaded / seconds:,.0f} rows/s")
+
+    try:
+        loaded = seed_jobs(jobs, companies=companies, seed=seed, workers=workers, progress=progress)
+    except Exception as e:
+        print(f"Error seeding database: {e}")
+        sys.exit(1)
+    print(f"Seeded {loaded} jobs in {time.perf_counter() - started:.1f}s")
+
+def option(name, default, args=None):
+    """Integer value of a --name option from the command line, or default"""
+    args = sys.argv[2:] if args is None else args
+    if f"--{name}" not in args[:-1]:
+        return default
+    try:
+        return int(args[args.index(f"--{name}") + 1])
+    except ValueError:
+        print(f"--{name} expects a number")
+        sys.exit(1)
+
+def import_file(path, fmt=None):
+    """Bulk import jobs from an NDJSON or CSV file"""
+    fmt = fmt or import_format(path)
+    if fmt not in IMPORT_FORMATS:
+        print(f"Unknown format: {fmt} (expected one of: {', '.join(IMPORT_FORMATS)})")
+        sys.exit(1)
+    print(f"Importing {fmt} jobs from {path}...")
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            report = import_jobs(
+                parse_records(f, fmt),
+                progress=lambda r: print(f"  {r.imported} imported, {r.failed} failed")
+            )
+    except OSError as e:
+        print(f"Error importing jobs: {e}")
+        sys.exit(1)
+
+    summary = report.as_dict()
+    for error in summary["errors"][:20]:
+        print(f"  line {error['line']}: {error['error']}")
+    if summary["failed"] > 20:
+        print(f"  ... and {summary['failed'] - 20} more errors")
+    print(f"Imported {summary['imported']} jobs ({summary['failed']} failed) "
+          f"in {summary['seconds']}s, {summary['rows_per_second']} rows/s")
+    if summary["error"]:
+        print(f"Import stopped early; the {summary['imported']} jobs above were committed")
+        sys.exit(1)
+
+def archive(retention_days=None, detach=False):
+    """Move months of jobs older than the retention window out of the jobs table"""
+    retention_days = get_archive_settings()['retention_days'] if retention_days is None else retention_days
+    print(f"Archiving jobs posted before the month {retention_days} days ago"
+          + (" (detaching them)" if detach else "") + "...")
+    started = time.perf_counter()
+    try:
+        archived = archive_jobs(retention_days, detach=detach)
+    except Exception as e:
+        print(f"Error archiving jobs: {e}")
+        sys.exit(1)
+    for month in archived:
+        print(f"  {month['month']}: {month['jobs']} jobs ({month['active']} active) -> {month['table']}")
+    print(f"Archived {len(archived)} month(s), {sum(m['jobs'] for m in archived)} jobs "
+          f"in {time.perf_counter() - started:.1f}s")
 
 def reset_database():
     """Reset the database by dropping all tables and recreating them"""
@@ -170,17 +252,23 @@ def reset_database():
     
     try:
         tables = [
+            "schema_migrations",
+            "data_versions",
+            "job_stats",
             "job_applications",
             "jobs",
+            "jobs_archive",
             "job_locations",
             "job_categories",
             "companies"
         ]
+        tables += [row['name'] for row in db.execute_query(LEFTOVER_JOB_TABLES)]
         
         for table in tables:
             db.execute_update(f"DROP TABLE IF EXISTS {table} CASCADE")
             print(f"Dropped table: {table}")
         
+        clear_dimension_cache()
         create_tables()
         print("Database reset completed successfully")
         
@@ -202,16 +290,120 @@ def run_server():
         print(f"Error starting server: {e}")
         sys.exit(1)
 
+def server_implementation(kind, requested, fast, fallback):
+    """The uvicorn loop/http implementation to use: the fast one when installed, unless one is requested"""
+    if requested == 'auto':
+        return fast if importlib.util.find_spec(fast) else fallback
+    if requested == fast and not importlib.util.find_spec(fast):
+        print(f"Error: SERVER_{kind.upper()}={fast} but {fast} is not installed. Install with 'pip install {fast}'")
+        sys.exit(1)
+    return requested
+
+def connection_budget(limits, workers, reserved):
+    """Largest pool each worker may have without exceeding the server's max_connections.
+
+    A graceful reload (uvicorn 0.51 and later, see requirements.txt) starts
+    each replacement worker before stopping the one it replaces, one at a
+    time, so room is left for one worker more than configured.
+    """
+    available = limits['max_connections'] - limits['superuser_reserved'] - reserved
+    return available // (workers + 1)
+
+def run_production_server(workers=None):
+    """Run the FastAPI server in several worker processes, sized to the database"""
+    settings = get_server_settings()
+    workers = max(1, workers or settings['workers'])
+    if not importlib.util.find_spec('uvicorn'):
+        print("Error: uvicorn not installed. Install with 'pip install uvicorn'")
+        sys.exit(1)
+    loop = server_implementation('loop', settings['loop'], 'uvloop', 'asyncio')
+    http = server_implementation('http', settings['http'], 'httptools', 'h11')
+
+    # Pools are per worker, so split what the server allows between them
+    try:
+        with db.connection():  # the primary, whose limits the writes share
+            limits = db.execute_query(CONNECTION_LIMITS)[0]
+    except Exception as e:
+        print(f"Error reading the database connection limits: {e}")
+        sys.exit(1)
+    finally:
+        db.close()  # the supervisor itself needs no connections while serving
+    budget = connection_budget(limits, workers, settings['reserved_connections'])
+    if budget < 1:
+        print(f"Error: max_connections={limits['max_connections']} leaves no connections for {workers} workers; "
+              f"run fewer workers or lower DATABASE_RESERVED_CONNECTIONS")
+        sys.exit(1)
+    pool = get_pool_settings()
+    max_size = min(pool['max_size'], budget)
+    min_size = min(pool['min_size'], max_size)
+    # Workers are spawned, not forked, and read their pool settings from the environment
+    os.environ['DATABASE_POOL_MAX_SIZE'] = str(max_size)
+    os.environ['DATABASE_POOL_MIN_SIZE'] = str(min_size)
+    # Each worker counts its own metrics; they save them here so any worker can report them all
+    metrics_dir = os.getenv('METRICS_MULTIPROC_DIR')
+    if workers > 1 and not metrics_dir:
+        metrics_dir = os.environ['METRICS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='jobs-metrics-')
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        clear_snapshots(metrics_dir)
+
+    import_ms = None
+    if settings['check_import']:
+        started = time.perf_counter()
+        try:
+            import server  # noqa: F401
+        except Exception as e:
+            print(f"Error loading the app: {e}")
+            sys.exit(1)
+        import_ms = (time.perf_counter() - started) * 1000
+
+    replicas = len(db.replicas.replicas)
+    print(f"Starting production server on http://{settings['host']}:{settings['port']}")
+    print(f"  workers:     {workers} (CPU count {os.cpu_count()})")
+    print("  app import:  " + (f"checked in {import_ms:.0f} ms" if import_ms is not None else "not checked"))
+    print(f"  loop/http:   {loop} / {http}")
+    print(f"  keep-alive:  {settings['keep_alive']}s, backlog {settings['backlog']}, "
+          f"graceful shutdown {settings['graceful_timeout']}s")
+    print(f"  db pool:     {min_size}-{max_size} connections per worker"
+          + (f" (capped from {pool['max_size']})" if max_size < pool['max_size'] else "")
+          + f", at most {max_size * workers} of max_connections={limits['max_connections']} "
+          f"({limits['superuser_reserved']} superuser + {settings['reserved_connections']} reserved)")
+    if replicas:
+        print(f"  replicas:    {replicas}, each with the same per-worker pool")
+    if metrics_dir:
+        print(f"  metrics:     merged across workers in {metrics_dir}")
+    if workers > 1:
+        print(f"  reload:      kill -HUP {os.getpid()} replaces the workers one at a time")
+    # Hand the process over to uvicorn's own supervisor: spawned workers re-import
+    # __main__, and as manage.py that would open a pool per worker they never use
+    sys.stdout.flush()
+    os.execv(sys.executable, [
+        sys.executable, "-m", "uvicorn", "server:app",
+        "--host", settings['host'],
+        "--port", str(settings['port']),
+        "--workers", str(workers),
+        "--loop", loop,
+        "--http", http,
+        "--timeout-keep-alive", str(settings['keep_alive']),
+        "--backlog", str(settings['backlog']),
+        "--timeout-graceful-shutdown", str(settings['graceful_timeout']),
+    ])
+
 def main():
     """Main command-line interface"""
     if len(sys.argv) < 2:
         print("Usage: python manage.py [command]")
         print("Commands:")
         print("  createdb   - Create the database")
-        print("  migrate    - Run database migrations")
-        print("  seed       - Seed the database with sample data")
+        print("  migrate    - Run database migrations (migrate status to list them)")
+        print("  seed       - Seed the database with sample data, or synthetic jobs with:")
+        print("               seed --jobs N [--companies M] [--seed S] [--workers W]")
+        print("  import     - Bulk import jobs: import <file> [--format ndjson|csv]")
+        print("  archive    - Move months of jobs older than JOBS_RETENTION_DAYS out of jobs:")
+        print("               archive [--retention-days N] [--detach]")
         print("  reset      - Reset the database")
-        print("  start      - Start the FastAPI server")
+        print("  start      - Start the FastAPI server, or in worker processes with:")
+        print("               start --production [--workers N]")
         sys.exit(1)
     
     command = sys.argv[1]
@@ -219,13 +411,32 @@ def main():
     if command == "createdb":
         create_database()
     elif command == "migrate":
-        run_migrations()
+        if sys.argv[2:] == ["status"]:
+            show_migrations()
+        else:
+            run_migrations()
     elif command == "seed":
-        seed_data()
+        jobs = option("jobs", None)
+        if jobs is None:
+            seed_data()
+        else:
+            seed_synthetic(jobs, companies=option("companies", 500), seed=option("seed", 42),
+                           workers=option("workers", SEED_WORKERS))
+    elif command == "import":
+        if len(sys.argv) < 3:
+            print("Usage: python manage.py import <file> [--format ndjson|csv]")
+            sys.exit(1)
+        fmt = sys.argv[sys.argv.index("--format") + 1] if "--format" in sys.argv[3:-1] else None
+        import_file(sys.argv[2], fmt)
+    elif command == "archive":
+        archive(retention_days=option("retention-days", None), detach="--detach" in sys.argv[2:])
     elif command == "reset":
         reset_database()
     elif command == "start":
-        run_server()
+        if "--production" in sys.argv[2:]:
+            run_production_server(workers=option("workers", None))
+        else:
+            run_server()
     else:
         print(f"Unknown command: {command}")
         sys.exit(1)
@@ -0,0 +1,330 @@
+import bisect
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+# In-process metrics for the database layer and the HTTP routes, rendered in
+# the Prometheus text format by /api/metrics. Recording is a dict lookup, a
+# bisect and a few additions under a lock, cheap enough to leave on. With
+# several workers, each saves a snapshot to METRICS_MULTIPROC_DIR and
+# whichever worker answers a scrape merges them all.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_QUERY_LABEL = 500
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\$\d+|%s|%\(\w+\)s|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.I)
+_SPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def fingerprint(query):
+    """(id, normalized SQL) for a statement: literals and parameters become ?, whitespace is collapsed"""
+    if not isinstance(query, str):
+        query = query.as_string(None) if hasattr(query, 'as_string') else str(query)
+    normalized = _SPACE.sub(' ', _COMMENTS.sub(' ', query)).strip()
+    normalized = _LISTS.sub('IN (?)', _LITERALS.sub('?', normalized))
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()[:12], normalized
+
+_WRITES = {'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'TRUNCATE', 'COPY', 'CALL'}
+# Functions a SELECT may call for their side effects: running them again, or
+# on a replica, is not harmless
+_WRITING_FUNCTIONS = {
+    'JOBS_ENSURE_PARTITION', 'SET_CONFIG', 'NEXTVAL', 'SETVAL', 'PG_NOTIFY',
+    'PG_ADVISORY_LOCK', 'PG_ADVISORY_XACT_LOCK', 'PG_ADVISORY_UNLOCK', 'PG_ADVISORY_UNLOCK_ALL',
+    'PG_TRY_ADVISORY_LOCK', 'PG_TRY_ADVISORY_XACT_LOCK', 'PG_CANCEL_BACKEND', 'PG_TERMINATE_BACKEND',
+}
+_NOT_READ_ONLY = _WRITES | _WRITING_FUNCTIONS
+
+_EXPLAIN = re.compile(r"EXPLAIN\s*(?:\(([^)]*)\)|((?:\s*\b(?:ANALYZE|VERBOSE)\b)*))\s*", re.I)
+
+@lru_cache(maxsize=2048)
+def is_read_only(normalized):
+    """Whether a normalized statement only reads, so it may go to a replica or be run again.
+
+    EXPLAIN without ANALYZE only plans its statement, so it counts as a read.
+    """
+    upper = normalized.upper()
+    explain = _EXPLAIN.match(upper)
+    if explain:
+        options = explain.group(1) if explain.group(1) is not None else explain.group(2)
+        if not re.search(r'\bANALYZE\b(?!\s+(?:FALSE|OFF|0)\b)', options):
+            return True
+        upper = upper[explain.end():]
+    return upper.startswith(('SELECT', 'WITH')) and not _NOT_READ_ONLY & set(re.findall(r'[A-Z_]+', upper))
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as Prometheus expects"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {self.count}')
+        labels = f'{{{labels.rstrip(",")}}}' if labels else ''
+        lines.append(f'{name}_sum{labels} {self.sum:.6f}')
+        lines.append(f'{name}_count{labels} {self.count}')
+        return lines
+
+    def state(self):
+        return {"counts": self.counts, "sum": self.sum, "count": self.count}
+
+    def merge(self, state):
+        """Add the state() of a histogram with the same buckets"""
+        self.counts = [a + b for a, b in zip(self.counts, state['counts'])]
+        self.sum += state['sum']
+        self.count += state['count']
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _worker_label(pid):
+    return f'{{worker="{pid}"}}' if pid is not None else ''
+
+class Metrics:
+    """Statement, route and pool-checkout metrics for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queries = {}        # fingerprint id -> [normalized sql, Histogram, rows, errors]
+            self.routes = {}         # (method, route) -> Histogram
+            self.responses = {}      # (method, route, status) -> count
+            self.pool_wait = Histogram()
+            self.read_retries = 0      # reads run again after a lost connection
+            self.reads_recovered = 0   # reads that then succeeded on a retry
+            self.reconnects = 0        # pools replaced after the database came back
+
+    def observe_query(self, query, seconds, rows=0, error=False):
+        """Record one statement; returns its (id, normalized SQL) fingerprint"""
+        query_id, normalized = fingerprint(query)
+        with self._lock:
+            entry = self.queries.get(query_id)
+            if entry is None:
+                entry = self.queries[query_id] = [normalized, Histogram(), 0, 0]
+            entry[1].observe(seconds)
+            entry[2] += rows if rows and rows > 0 else 0
+            entry[3] += error
+        return query_id, normalized
+
+    def observe_request(self, method, route, status, seconds):
+        with self._lock:
+            histogram = self.routes.get((method, route))
+            if histogram is None:
+                histogram = self.routes[(method, route)] = Histogram()
+            histogram.observe(seconds)
+            key = (method, route, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def observe_pool_wait(self, seconds):
+        with self._lock:
+            self.pool_wait.observe(seconds)
+
+    def observe_read_retry(self, recovered=False):
+        """Count a read retried after a lost connection, or one that succeeded on a retry"""
+        with self._lock:
+            if recovered:
+                self.reads_recovered += 1
+            else:
+                self.read_retries += 1
+
+    def observe_reconnect(self):
+        with self._lock:
+            self.reconnects += 1
+
+    def snapshot(self, pool_stats=None, breaker=None):
+        """This process's metrics, plus its pool and circuit breaker stats, as JSON-able data"""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "queries": {query_id: [sql, histogram.state(), rows, errors]
+                            for query_id, (sql, histogram, rows, errors) in self.queries.items()},
+                "routes": [[method, route, histogram.state()] for (method, route), histogram in self.routes.items()],
+                "responses": [[method, route, status, count]
+                              for (method, route, status), count in self.responses.items()],
+                "pool_wait": self.pool_wait.state(),
+                "counters": [self.read_retries, self.reads_recovered, self.reconnects],
+                "pool": pool_stats,
+                "breaker": breaker,
+            }
+
+    def merge(self, snapshot):
+        """Add another process's snapshot() to these metrics"""
+        with self._lock:
+            for query_id, (sql, histogram, rows, errors) in snapshot['queries'].items():
+                entry = self.queries.get(query_id)
+                if entry is None:
+                    entry = self.queries[query_id] = [sql, Histogram(), 0, 0]
+                entry[1].merge(histogram)
+                entry[2] += rows
+                entry[3] += errors
+            for method, route, histogram in snapshot['routes']:
+                self.routes.setdefault((method, route), Histogram()).merge(histogram)
+            for method, route, status, count in snapshot['responses']:
+                key = (method, route, status)
+                self.responses[key] = self.responses.get(key, 0) + count
+            self.pool_wait.merge(snapshot['pool_wait'])
+            read_retries, reads_recovered, reconnects = snapshot['counters']
+            self.read_retries += read_retries
+            self.reads_recovered += reads_recovered
+            self.reconnects += reconnects
+
+    def render(self, pool_stats=None, breaker=None, workers=None):
+        """All metrics in the Prometheus text exposition format.
+
+        workers, snapshots from combine_snapshots, replaces pool_stats and
+        breaker: each running worker's are rendered with a worker label.
+        """
+        if workers is None:
+            workers = [{"pid": None, "pool": pool_stats, "breaker": breaker}]
+        with self._lock:
+            lines = [
+                "# HELP jobs_db_query_duration_seconds Statement execution time by query fingerprint.",
+                "# TYPE jobs_db_query_duration_seconds histogram",
+            ]
+            for query_id, (_, histogram, _, _) in self.queries.items():
+                lines += histogram.render("jobs_db_query_duration_seconds", f'query="{query_id}",')
+            lines += ["# HELP jobs_db_query_rows_total Rows returned or affected by query fingerprint.",
+                      "# TYPE jobs_db_query_rows_total counter"]
+            lines += [f'jobs_db_query_rows_total{{query="{query_id}"}} {rows}'
+                      for query_id, (_, _, rows, _) in self.queries.items()]
+            lines += ["# HELP jobs_db_query_errors_total Failed statements by query fingerprint.",
+                      "# TYPE jobs_db_query_errors_total counter"]
+            lines += [f'jobs_db_query_errors_total{{query="{query_id}"}} {errors}'
+                      for query_id, (_, _, _, errors) in self.queries.items()]
+            lines += ["# HELP jobs_db_query_info Normalized SQL of each query fingerprint.",
+                      "# TYPE jobs_db_query_info gauge"]
+            lines += [f'jobs_db_query_info{{query="{query_id}",sql="{_label(sql[:MAX_QUERY_LABEL])}"}} 1'
+                      for query_id, (sql, _, _, _) in self.queries.items()]
+
+            lines += ["# HELP jobs_http_request_duration_seconds Request latency by route.",
+                      "# TYPE jobs_http_request_duration_seconds histogram"]
+            for (method, route), histogram in self.routes.items():
+                lines += histogram.render("jobs_http_request_duration_seconds",
+                                          f'method="{method}",route="{_label(route)}",')
+            lines += ["# HELP jobs_http_responses_total Responses by route and status code.",
+                      "# TYPE jobs_http_responses_total counter"]
+            lines += [f'jobs_http_responses_total{{method="{method}",route="{_label(route)}",status="{status}"}} {count}'
+                      for (method, route, status), count in self.responses.items()]
+
+            lines += ["# HELP jobs_db_pool_wait_seconds Time spent waiting to check out a pooled connection.",
+                      "# TYPE jobs_db_pool_wait_seconds histogram"]
+            lines += self.pool_wait.render("jobs_db_pool_wait_seconds", "")
+            lines += ["# HELP jobs_db_read_retries_total Reads run again after a lost connection.",
+                      "# TYPE jobs_db_read_retries_total counter",
+                      f"jobs_db_read_retries_total {self.read_retries}",
+                      "# HELP jobs_db_reads_recovered_total Reads that succeeded on a retry.",
+                      "# TYPE jobs_db_reads_recovered_total counter",
+                      f"jobs_db_reads_recovered_total {self.reads_recovered}",
+                      "# HELP jobs_db_reconnects_total Pools reopened after the database was unreachable.",
+                      "# TYPE jobs_db_reconnects_total counter",
+                      f"jobs_db_reconnects_total {self.reconnects}"]
+        pools = [(_worker_label(worker['pid']), worker['pool']) for worker in workers if worker['pool']]
+        if pools:
+            for name in ("size", "in_use", "available", "waiting", "max_size"):
+                lines.append(f"# TYPE jobs_db_pool_{name} gauge")
+                lines += [f"jobs_db_pool_{name}{label} {stats[name]}" for label, stats in pools]
+            for name in ("requests", "timeouts", "connections_opened", "connection_errors", "connections_lost"):
+                lines.append(f"# TYPE jobs_db_pool_{name}_total counter")
+                lines += [f"jobs_db_pool_{name}_total{label} {stats[name]}" for label, stats in pools]
+        breakers = [(_worker_label(worker['pid']), worker['breaker']) for worker in workers if worker['breaker']]
+        if breakers:
+            lines += ["# HELP jobs_db_circuit_open Whether the circuit breaker is failing database calls fast.",
+                      "# TYPE jobs_db_circuit_open gauge"]
+            lines += [f"jobs_db_circuit_open{label} {int(stats['state'] != 'closed')}" for label, stats in breakers]
+            lines.append("# TYPE jobs_db_circuit_opens_total counter")
+            lines += [f"jobs_db_circuit_opens_total{label} {stats['opens']}" for label, stats in breakers]
+            lines.append("# TYPE jobs_db_circuit_rejected_total counter")
+            lines += [f"jobs_db_circuit_rejected_total{label} {stats['rejected']}" for label, stats in breakers]
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+def write_snapshot(directory, snapshot):
+    """Save a snapshot() as <directory>/<pid>.json, replacing the previous one atomically"""
+    path = os.path.join(directory, f"{snapshot['pid']}.json")
+    with open(path + '.tmp', 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(path + '.tmp', path)
+
+def combine_snapshots(directory):
+    """(Metrics summed over the snapshots in directory, snapshots of the workers still running).
+
+    Workers that exited still count towards the sums, so totals don't go
+    down when a worker is replaced; only their pool and breaker stats are dropped.
+    """
+    combined, running = Metrics(), []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        combined.merge(snapshot)
+        if _running(snapshot['pid']):
+            running.append(snapshot)
+    return combined, running
+
+def clear_snapshots(directory):
+    """Remove the snapshots of an earlier run of the server"""
+    for name in os.listdir(directory):
+        if name.endswith(('.json', '.json.tmp')):
+            os.remove(os.path.join(directory, name))
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class QueryTimer:
+    """Times one statement for metrics; set .rows before leaving the block.
+
+    Statements slower than slow_seconds are passed to on_slow(query_id,
+    normalized, seconds, rows) for the slow-query log.
+    """
+    __slots__ = ('query', 'enabled', 'slow_seconds', 'on_slow', 'rows', 'started')
+
+    def __init__(self, query, enabled=True, slow_seconds=None, on_slow=None):
+        self.query = query
+        self.enabled = enabled
+        self.slow_seconds = slow_seconds
+        self.on_slow = on_slow
+        self.rows = 0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.enabled:
+            return False
+        seconds = time.perf_counter() - self.started
+        query_id, normalized = metrics.observe_query(self.query, seconds, self.rows, error=exc_type is not None)
+        if exc_type is None and self.slow_seconds and seconds >= self.slow_seconds and self.on_slow:
+            self.on_slow(query_id, normalized, seconds, self.rows)
+        return False
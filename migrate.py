@@ -0,0 +1,94 @@
+import os
+import re
+import importlib.util
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Held for the duration of a run so two deploys can't migrate at the same time
+MIGRATION_LOCK_ID = 727146
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(20) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+
+def load_migrations():
+    """Migration modules from migrations/, ordered by their NNNN_ version prefix.
+
+    Each module sets `statements`, a list of SQL strings, and `transactional`.
+    Transactional migrations run as one transaction; the others (needed for
+    CREATE INDEX CONCURRENTLY) run statement by statement in autocommit mode
+    and must therefore be safe to re-run.
+    """
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r'^(\d{4})_(\w+)\.py$', filename)
+        if not match:
+            continue
+        version, name = match.groups()
+        spec = importlib.util.spec_from_file_location(f"migrations.m{version}", os.path.join(MIGRATIONS_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append({
+            "version": version,
+            "name": name,
+            "statements": module.statements,
+            "transactional": getattr(module, 'transactional', True),
+        })
+    return migrations
+
+def applied_versions(db):
+    """Versions already recorded in schema_migrations"""
+    db.execute_update(CREATE_MIGRATIONS_TABLE)
+    return {row['version'] for row in db.execute_query("SELECT version FROM schema_migrations")}
+
+def apply_migrations(db):
+    """Apply pending migrations in order; returns the versions applied"""
+    applied = []
+    with db.connection() as conn:
+        db.execute_query("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            done = applied_versions(db)
+            for migration in load_migrations():
+                if migration["version"] in done:
+                    continue
+                print(f"Applying migration {migration['version']}_{migration['name']}...")
+                if migration["transactional"]:
+                    with conn.transaction():
+                        for statement in migration["statements"]:
+                            db.execute_update(statement)
+                        record_migration(db, migration)
+                else:
+                    for statement in migration["statements"]:
+                        db.execute_update(statement)
+                    check_indexes_valid(db)
+                    record_migration(db, migration)
+                applied.append(migration["version"])
+        finally:
+            db.execute_query("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+    return applied
+
+def check_indexes_valid(db):
+    """Fail if a concurrent index build left an invalid index behind.
+
+    IF NOT EXISTS would otherwise skip the broken index on the next run.
+    """
+    invalid = db.execute_query("SELECT indexrelid::regclass::text as name FROM pg_index WHERE NOT indisvalid")
+    if invalid:
+        names = ', '.join(row['name'] for row in invalid)
+        raise RuntimeError(f"Invalid indexes left by a failed build: {names}. "
+                           f"Drop them with DROP INDEX CONCURRENTLY and re-run migrate.")
+
+def record_migration(db, migration):
+    db.execute_update(
+        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+        (migration["version"], migration["name"])
+    )
+
+def migration_status(db):
+    """(version, name, applied) for every known migration"""
+    done = applied_versions(db)
+    return [(m["version"], m["name"], m["version"] in done) for m in load_migrations()]
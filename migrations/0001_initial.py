@@ -0,0 +1,61 @@
+"""Base schema: companies, categories, locations, jobs and applications"""
+
+transactional = True
+
+statements = [
+    """
+    CREATE TABLE IF NOT EXISTS companies (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(255) UNIQUE NOT NULL,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS job_categories (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(100) UNIQUE NOT NULL,
+        slug VARCHAR(100) UNIQUE NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS job_locations (
+        id SERIAL PRIMARY KEY,
+        city VARCHAR(100) NOT NULL,
+        country VARCHAR(100) NOT NULL,
+        remote BOOLEAN DEFAULT FALSE,
+        UNIQUE (city, country)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id SERIAL PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        description TEXT NOT NULL,
+        requirements TEXT,
+        job_type VARCHAR(50) DEFAULT 'full-time',
+        salary_min DECIMAL(10, 2),
+        salary_max DECIMAL(10, 2),
+        salary_currency VARCHAR(10) DEFAULT 'KSh',
+        skills_required JSONB,
+        company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
+        category_id INTEGER REFERENCES job_categories(id) ON DELETE SET NULL,
+        location_id INTEGER REFERENCES job_locations(id) ON DELETE SET NULL,
+        application_email VARCHAR(255),
+        application_url VARCHAR(500),
+        posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_active BOOLEAN DEFAULT TRUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS job_applications (
+        id SERIAL PRIMARY KEY,
+        job_id INTEGER REFERENCES jobs(id) ON DELETE CASCADE,
+        applicant_name VARCHAR(255) NOT NULL,
+        applicant_email VARCHAR(255) NOT NULL,
+        resume_url TEXT,
+        cover_letter TEXT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
@@ -0,0 +1,48 @@
+"""Full-text search: a weighted tsvector over title, company, tags, requirements
+and description, kept current by triggers. The GIN index is built in 0003."""
+
+transactional = True
+
+statements = [
+    "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION jobs_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(
+                (SELECT name FROM companies WHERE id = NEW.company_id), '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(
+                (SELECT string_agg(tag, ' ') FROM jsonb_array_elements_text(
+                    CASE WHEN jsonb_typeof(NEW.skills_required) = 'array'
+                         THEN NEW.skills_required ELSE '[]'::jsonb END) tag), '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(NEW.requirements, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS jobs_search_vector_trigger ON jobs",
+    """
+    CREATE TRIGGER jobs_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description, requirements, skills_required, company_id ON jobs
+    FOR EACH ROW EXECUTE FUNCTION jobs_search_vector_update()
+    """,
+    # A company rename re-indexes its jobs by touching company_id
+    """
+    CREATE OR REPLACE FUNCTION companies_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE jobs SET company_id = company_id WHERE company_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS companies_search_vector_trigger ON companies",
+    """
+    CREATE TRIGGER companies_search_vector_trigger
+    AFTER UPDATE OF name ON companies
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION companies_search_vector_update()
+    """,
+    "UPDATE jobs SET title = title WHERE search_vector IS NULL",
+]
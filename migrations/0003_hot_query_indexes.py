@@ -0,0 +1,32 @@
+"""Indexes for the listing, search, detail and stats queries.
+
+Built with CREATE INDEX CONCURRENTLY so writes keep flowing while they build,
+which is why this migration cannot run inside a transaction. The partial
+indexes only cover active jobs: every hot query filters on is_active = TRUE,
+and a plain index on a boolean would not be selective enough to be used.
+"""
+
+transactional = False
+
+statements = [
+    # Listing: newest first, keyset pagination seeks on (posted_at, id)
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_active_posted_at
+    ON jobs (posted_at DESC, id DESC) WHERE is_active = TRUE
+    """,
+    # Full-text search
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_search_vector ON jobs USING GIN (search_vector)",
+    # Stats per category/location join active jobs on these keys; the partial
+    # indexes let the counts come from index-only scans
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_active_category
+    ON jobs (category_id) WHERE is_active = TRUE
+    """,
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_active_location
+    ON jobs (location_id) WHERE is_active = TRUE
+    """,
+    # Foreign keys: joins to companies and ON DELETE CASCADE from companies/jobs
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_company ON jobs (company_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_applications_job ON job_applications (job_id)",
+]
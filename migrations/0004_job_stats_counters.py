@@ -0,0 +1,97 @@
+"""Precomputed counters for /api/stats/: job_stats holds the total, active,
+per-category and per-location active job counts, kept current by statement
+level triggers on jobs so a stats read never scans the jobs table."""
+
+transactional = True
+
+def _deltas(rows, sign):
+    """Counter changes contributed by a trigger transition table"""
+    return f"""
+        SELECT 'total' AS scope, 0 AS ref_id, {sign} AS delta FROM {rows}
+        UNION ALL SELECT 'active', 0, {sign} FROM {rows} WHERE is_active
+        UNION ALL SELECT 'category', category_id, {sign} FROM {rows} WHERE is_active AND category_id IS NOT NULL
+        UNION ALL SELECT 'location', location_id, {sign} FROM {rows} WHERE is_active AND location_id IS NOT NULL
+    """
+
+def _apply(*sources):
+    # Net deltas only, so an UPDATE that doesn't move a job between counters
+    # writes nothing; rows are locked in key order to avoid deadlocks
+    return f"""
+        INSERT INTO job_stats AS s (scope, ref_id, count, updated_at)
+        SELECT scope, ref_id, SUM(delta), clock_timestamp()
+        FROM ({' UNION ALL '.join(sources)}) d
+        GROUP BY scope, ref_id
+        HAVING SUM(delta) <> 0
+        ORDER BY scope, ref_id
+        ON CONFLICT (scope, ref_id) DO UPDATE
+        SET count = s.count + EXCLUDED.count, updated_at = EXCLUDED.updated_at;
+    """
+
+statements = [
+    """
+    CREATE TABLE IF NOT EXISTS job_stats (
+        scope VARCHAR(20) NOT NULL,
+        ref_id INTEGER NOT NULL DEFAULT 0,
+        count BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (scope, ref_id)
+    )
+    """,
+    # Hold off writers while the counters are backfilled and the triggers go in
+    "LOCK TABLE jobs IN SHARE ROW EXCLUSIVE MODE",
+    "DELETE FROM job_stats",
+    f"""
+    CREATE OR REPLACE FUNCTION jobs_stats_update() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            {_apply(_deltas('new_rows', 1))}
+        ELSIF TG_OP = 'UPDATE' THEN
+            {_apply(_deltas('new_rows', 1), _deltas('old_rows', -1))}
+        ELSE
+            {_apply(_deltas('old_rows', -1))}
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION jobs_stats_truncate() RETURNS trigger AS $$
+    BEGIN
+        UPDATE job_stats SET count = 0, updated_at = clock_timestamp();
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS jobs_stats_insert_trigger ON jobs",
+    "DROP TRIGGER IF EXISTS jobs_stats_update_trigger ON jobs",
+    "DROP TRIGGER IF EXISTS jobs_stats_delete_trigger ON jobs",
+    "DROP TRIGGER IF EXISTS jobs_stats_truncate_trigger ON jobs",
+    """
+    CREATE TRIGGER jobs_stats_insert_trigger AFTER INSERT ON jobs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION jobs_stats_update()
+    """,
+    """
+    CREATE TRIGGER jobs_stats_update_trigger AFTER UPDATE ON jobs
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION jobs_stats_update()
+    """,
+    """
+    CREATE TRIGGER jobs_stats_delete_trigger AFTER DELETE ON jobs
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION jobs_stats_update()
+    """,
+    """
+    CREATE TRIGGER jobs_stats_truncate_trigger AFTER TRUNCATE ON jobs
+    FOR EACH STATEMENT EXECUTE FUNCTION jobs_stats_truncate()
+    """,
+    """
+    INSERT INTO job_stats (scope, ref_id, count)
+    SELECT 'total', 0, COUNT(*) FROM jobs
+    UNION ALL SELECT 'active', 0, COUNT(*) FROM jobs WHERE is_active
+    UNION ALL SELECT 'category', category_id, COUNT(*) FROM jobs
+        WHERE is_active AND category_id IS NOT NULL GROUP BY category_id
+    UNION ALL SELECT 'location', location_id, COUNT(*) FROM jobs
+        WHERE is_active AND location_id IS NOT NULL GROUP BY location_id
+    """,
+]
@@ -0,0 +1,43 @@
+"""Change counter behind the job read ETags: data_versions.version is bumped
+by every statement that writes jobs, or renames or removes a category or
+location shown in job payloads."""
+
+transactional = True
+
+statements = [
+    """
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name VARCHAR(50) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 1,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "INSERT INTO data_versions (name) VALUES ('jobs') ON CONFLICT (name) DO NOTHING",
+    """
+    CREATE OR REPLACE FUNCTION jobs_data_version_bump() RETURNS trigger AS $$
+    BEGIN
+        UPDATE data_versions SET version = version + 1, updated_at = clock_timestamp()
+        WHERE name = 'jobs';
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS jobs_data_version_trigger ON jobs",
+    """
+    CREATE TRIGGER jobs_data_version_trigger
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON jobs
+    FOR EACH STATEMENT EXECUTE FUNCTION jobs_data_version_bump()
+    """,
+    "DROP TRIGGER IF EXISTS job_categories_data_version_trigger ON job_categories",
+    """
+    CREATE TRIGGER job_categories_data_version_trigger
+    AFTER UPDATE OR DELETE ON job_categories
+    FOR EACH STATEMENT EXECUTE FUNCTION jobs_data_version_bump()
+    """,
+    "DROP TRIGGER IF EXISTS job_locations_data_version_trigger ON job_locations",
+    """
+    CREATE TRIGGER job_locations_data_version_trigger
+    AFTER UPDATE OR DELETE ON job_locations
+    FOR EACH STATEMENT EXECUTE FUNCTION jobs_data_version_bump()
+    """,
+]
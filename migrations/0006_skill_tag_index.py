@@ -0,0 +1,12 @@
+"""GIN index for the listing's skill tag filter, a JSONB containment test
+(skills_required @> '["Python"]'). jsonb_path_ops keeps the index small and
+only supports @>, which is the one operator the filter uses."""
+
+transactional = False
+
+statements = [
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_active_skills
+    ON jobs USING GIN (skills_required jsonb_path_ops) WHERE is_active = TRUE
+    """,
+]
@@ -0,0 +1,248 @@
+"""Range-partition jobs by month of posted_at, so old postings can be moved out
+with `manage.py archive` instead of piling up in one heap.
+
+Partitions are named jobs_pYYYY_MM; jobs_default catches rows for months that
+have none yet, and jobs_ensure_partition(month) creates one, taking over any
+such rows. jobs_archive has the same layout and receives archived months.
+
+A primary key on a partitioned table must include the partition key, so it is
+(id, posted_at); ids still come from jobs_id_seq. For the same reason
+job_applications.job_id can no longer reference jobs; 0008 enforces it with
+triggers instead.
+
+Runs online: the partitioned table is built beside jobs as jobs_partitioned,
+with its indexes, and a trigger on jobs mirrors every write into it while the
+existing rows are copied over in batches of BATCH_SIZE, each committed on its
+own. The copy locks the rows of a batch FOR SHARE, so a concurrent update or
+delete of them waits for the batch instead of being lost. Only the swap
+(dropping jobs, renaming jobs_partitioned and recreating the triggers of
+0002, 0004 and 0005) locks jobs exclusively, for as long as that DDL takes;
+it gives up after SWAP_LOCK_TIMEOUT rather than queue writes behind it.
+Every step checks whether jobs is partitioned already, so a failed run can be
+run again; the copy then starts over, skipping rows already copied.
+"""
+
+transactional = False
+
+BATCH_SIZE = 5000
+SWAP_LOCK_TIMEOUT = '10s'
+
+JOB_COLUMNS = """
+    id INTEGER NOT NULL DEFAULT nextval('jobs_id_seq'),
+    title VARCHAR(255) NOT NULL,
+    description TEXT NOT NULL,
+    requirements TEXT,
+    job_type VARCHAR(50) DEFAULT 'full-time',
+    salary_min DECIMAL(10, 2),
+    salary_max DECIMAL(10, 2),
+    salary_currency VARCHAR(10) DEFAULT 'KSh',
+    skills_required JSONB,
+    company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
+    category_id INTEGER REFERENCES job_categories(id) ON DELETE SET NULL,
+    location_id INTEGER REFERENCES job_locations(id) ON DELETE SET NULL,
+    application_email VARCHAR(255),
+    application_url VARCHAR(500),
+    posted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    is_active BOOLEAN DEFAULT TRUE,
+    search_vector tsvector"""
+
+COPIED_COLUMNS = """id, title, description, requirements, job_type, salary_min, salary_max, salary_currency,
+    skills_required, company_id, category_id, location_id, application_email, application_url,
+    posted_at, is_active, search_vector"""
+
+def copied_values(row):
+    """The jobs columns of row (a table alias, or NEW in a trigger), posted_at no longer nullable"""
+    return ', '.join(f"COALESCE({row}.posted_at, CURRENT_TIMESTAMP)" if column == 'posted_at' else f"{row}.{column}"
+                     for column in (name.strip() for name in COPIED_COLUMNS.split(',')))
+
+# Whether an earlier run got as far as the swap
+PARTITIONED = "(SELECT relkind FROM pg_class WHERE oid = 'jobs'::regclass) = 'p'"
+
+# Indexes of 0003 and 0006; each partition gets its own copy. Built under a
+# temporary name, as the ones on jobs keep theirs until the swap.
+INDEXES = {
+    'idx_jobs_active_posted_at': "(posted_at DESC, id DESC) WHERE is_active = TRUE",
+    'idx_jobs_search_vector': "USING GIN (search_vector)",
+    'idx_jobs_active_category': "(category_id) WHERE is_active = TRUE",
+    'idx_jobs_active_location': "(location_id) WHERE is_active = TRUE",
+    'idx_jobs_company': "(company_id)",
+    'idx_jobs_active_skills': "USING GIN (skills_required jsonb_path_ops) WHERE is_active = TRUE",
+}
+
+def temporary_name(name):
+    return name.replace('idx_jobs_', 'idx_jobs_partitioned_')
+
+CONSTRAINTS = ('pkey', 'company_id_fkey', 'category_id_fkey', 'location_id_fkey')
+
+statements = [
+    # Rows already in jobs_default for the month are moved into the new
+    # partition, which must be empty of other months before it is attached
+    """
+    CREATE OR REPLACE FUNCTION jobs_ensure_partition(for_month DATE) RETURNS BOOLEAN AS $$
+    DECLARE
+        first_day DATE := date_trunc('month', for_month);
+        next_day DATE := first_day + INTERVAL '1 month';
+        part_name TEXT := 'jobs_p' || to_char(first_day, 'YYYY_MM');
+    BEGIN
+        IF to_regclass(part_name) IS NOT NULL THEN
+            RETURN FALSE;
+        END IF;
+        EXECUTE 'CREATE TABLE ' || quote_ident(part_name) || ' (LIKE jobs INCLUDING DEFAULTS)';
+        EXECUTE 'WITH moved AS (DELETE FROM jobs_default WHERE posted_at >= ' || quote_literal(first_day)
+            || ' AND posted_at < ' || quote_literal(next_day) || ' RETURNING *) '
+            || 'INSERT INTO ' || quote_ident(part_name) || ' SELECT * FROM moved';
+        EXECUTE 'ALTER TABLE jobs ATTACH PARTITION ' || quote_ident(part_name)
+            || ' FOR VALUES FROM (' || quote_literal(first_day) || ') TO (' || quote_literal(next_day) || ')';
+        RETURN TRUE;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+
+    # The partitioned table, with a partition for every month from the oldest
+    # job to three months ahead, and its indexes while it is still empty
+    f"""
+    DO $$
+    DECLARE
+        month DATE;
+    BEGIN
+        IF {PARTITIONED} THEN
+            RETURN;
+        END IF;
+        CREATE TABLE IF NOT EXISTS jobs_partitioned ({JOB_COLUMNS},
+            PRIMARY KEY (id, posted_at)
+        ) PARTITION BY RANGE (posted_at);
+        CREATE TABLE IF NOT EXISTS jobs_default PARTITION OF jobs_partitioned DEFAULT;
+        FOR month IN SELECT generate_series(
+            date_trunc('month', COALESCE((SELECT MIN(posted_at) FROM jobs), CURRENT_TIMESTAMP)),
+            date_trunc('month', CURRENT_TIMESTAMP) + INTERVAL '3 months',
+            INTERVAL '1 month'
+        ) LOOP
+            EXECUTE 'CREATE TABLE IF NOT EXISTS ' || quote_ident('jobs_p' || to_char(month, 'YYYY_MM'))
+                || ' PARTITION OF jobs_partitioned FOR VALUES FROM (' || quote_literal(month)
+                || ') TO (' || quote_literal(month + INTERVAL '1 month') || ')';
+        END LOOP;
+        {' '.join(f"CREATE INDEX IF NOT EXISTS {temporary_name(name)} ON jobs_partitioned {definition};"
+                  for name, definition in INDEXES.items())}
+    END
+    $$
+    """,
+
+    # From here on every write to jobs is repeated on jobs_partitioned. A row
+    # is deleted and inserted again rather than updated in place, in case the
+    # update moved it to another month.
+    f"""
+    CREATE OR REPLACE FUNCTION jobs_mirror_to_partitioned() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            TRUNCATE jobs_partitioned;
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM jobs_partitioned WHERE id = OLD.id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO jobs_partitioned ({COPIED_COLUMNS})
+            VALUES ({copied_values('NEW')})
+            ON CONFLICT (id, posted_at) DO UPDATE SET
+                {', '.join(f"{name.strip()} = EXCLUDED.{name.strip()}" for name in COPIED_COLUMNS.split(',')[1:])};
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    DO $$
+    BEGIN
+        IF {PARTITIONED} THEN
+            RETURN;
+        END IF;
+        DROP TRIGGER IF EXISTS jobs_mirror_trigger ON jobs;
+        CREATE TRIGGER jobs_mirror_trigger AFTER INSERT OR UPDATE OR DELETE ON jobs
+        FOR EACH ROW EXECUTE FUNCTION jobs_mirror_to_partitioned();
+        DROP TRIGGER IF EXISTS jobs_mirror_truncate_trigger ON jobs;
+        CREATE TRIGGER jobs_mirror_truncate_trigger AFTER TRUNCATE ON jobs
+        FOR EACH STATEMENT EXECUTE FUNCTION jobs_mirror_to_partitioned();
+    END
+    $$
+    """,
+
+    # The rows jobs had before the trigger, a batch of ids per transaction.
+    # Rows the trigger copied already are skipped.
+    f"""
+    DO $$
+    DECLARE
+        last_id INTEGER := 0;
+        max_id INTEGER;
+    BEGIN
+        IF {PARTITIONED} THEN
+            RETURN;
+        END IF;
+        SELECT MAX(id) INTO max_id FROM jobs;
+        WHILE last_id < COALESCE(max_id, 0) LOOP
+            INSERT INTO jobs_partitioned ({COPIED_COLUMNS})
+            SELECT {copied_values('j')}
+            FROM jobs j
+            WHERE j.id > last_id AND j.id <= last_id + {BATCH_SIZE}
+            FOR SHARE
+            ON CONFLICT DO NOTHING;
+            COMMIT;
+            last_id := last_id + {BATCH_SIZE};
+        END LOOP;
+    END
+    $$
+    """,
+
+    # The swap: jobs_partitioned holds every row of jobs, so only DDL is left
+    f"""
+    DO $$
+    BEGIN
+        IF {PARTITIONED} THEN
+            RETURN;
+        END IF;
+        SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}';
+        LOCK TABLE jobs IN ACCESS EXCLUSIVE MODE;
+        ALTER TABLE job_applications DROP CONSTRAINT IF EXISTS job_applications_job_id_fkey;
+        -- The sequence would go with the old table otherwise
+        ALTER SEQUENCE jobs_id_seq OWNED BY NONE;
+        DROP TABLE jobs;
+        ALTER TABLE jobs_partitioned RENAME TO jobs;
+        ALTER SEQUENCE jobs_id_seq OWNED BY jobs.id;
+        {' '.join(f"ALTER INDEX {temporary_name(name)} RENAME TO {name};" for name in INDEXES)}
+        {' '.join(f"ALTER TABLE jobs RENAME CONSTRAINT jobs_partitioned_{name} TO jobs_{name};"
+                  for name in CONSTRAINTS)}
+
+        CREATE TRIGGER jobs_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF title, description, requirements, skills_required, company_id ON jobs
+        FOR EACH ROW EXECUTE FUNCTION jobs_search_vector_update();
+
+        CREATE TRIGGER jobs_stats_insert_trigger AFTER INSERT ON jobs
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION jobs_stats_update();
+
+        CREATE TRIGGER jobs_stats_update_trigger AFTER UPDATE ON jobs
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION jobs_stats_update();
+
+        CREATE TRIGGER jobs_stats_delete_trigger AFTER DELETE ON jobs
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION jobs_stats_update();
+
+        CREATE TRIGGER jobs_stats_truncate_trigger AFTER TRUNCATE ON jobs
+        FOR EACH STATEMENT EXECUTE FUNCTION jobs_stats_truncate();
+
+        CREATE TRIGGER jobs_data_version_trigger
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON jobs
+        FOR EACH STATEMENT EXECUTE FUNCTION jobs_data_version_bump();
+    END
+    $$
+    """,
+    "DROP FUNCTION IF EXISTS jobs_mirror_to_partitioned()",
+
+    # Archived months, attached as they are by `manage.py archive`
+    f"""
+    CREATE TABLE IF NOT EXISTS jobs_archive ({JOB_COLUMNS},
+        PRIMARY KEY (id, posted_at)
+    ) PARTITION BY RANGE (posted_at)
+    """,
+    "ALTER TABLE jobs_archive ALTER COLUMN id DROP DEFAULT",
+]
@@ -0,0 +1,58 @@
+"""Referential integrity between job_applications and the partitioned jobs.
+
+0007 had to drop the foreign key on job_applications.job_id, as jobs' key is
+now (id, posted_at). Triggers take its place: an application must name an
+existing job, which is key-share locked like a foreign key check would, and
+deleting or truncating jobs (directly or through the company cascade) deletes
+their applications. Applications of archived jobs are kept.
+"""
+
+transactional = True
+
+statements = [
+    """
+    CREATE OR REPLACE FUNCTION job_applications_check_job() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.job_id IS NOT NULL THEN
+            PERFORM 1 FROM jobs WHERE id = NEW.job_id FOR KEY SHARE;
+            IF NOT FOUND THEN
+                RAISE EXCEPTION 'insert or update on table "job_applications" violates foreign key constraint'
+                    USING ERRCODE = 'foreign_key_violation',
+                          DETAIL = 'Key (job_id)=(' || NEW.job_id || ') is not present in table "jobs".',
+                          TABLE = 'job_applications', COLUMN = 'job_id';
+            END IF;
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS job_applications_check_job_trigger ON job_applications",
+    """
+    CREATE TRIGGER job_applications_check_job_trigger
+    BEFORE INSERT OR UPDATE OF job_id ON job_applications
+    FOR EACH ROW EXECUTE FUNCTION job_applications_check_job()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION jobs_delete_applications() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            DELETE FROM job_applications;
+        ELSE
+            DELETE FROM job_applications WHERE job_id IN (SELECT id FROM old_rows);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS jobs_delete_applications_trigger ON jobs",
+    "DROP TRIGGER IF EXISTS jobs_truncate_applications_trigger ON jobs",
+    """
+    CREATE TRIGGER jobs_delete_applications_trigger AFTER DELETE ON jobs
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION jobs_delete_applications()
+    """,
+    """
+    CREATE TRIGGER jobs_truncate_applications_trigger AFTER TRUNCATE ON jobs
+    FOR EACH STATEMENT EXECUTE FUNCTION jobs_delete_applications()
+    """,
+]
@@ -0,0 +1,646 @@
+import base64
+import json
+import re
+from datetime import datetime, timedelta
+
+# SQL shared by the sync (db.py) and async (async_db.py) data layers
+
+# Explicit column list so the search_vector column is never shipped to the app
+JOB_TABLE_COLUMNS = """
+    j.id, j.title, j.description, j.requirements, j.job_type, j.salary_min, j.salary_max,
+    j.salary_currency, j.skills_required, j.company_id, j.category_id, j.location_id,
+    j.application_email, j.application_url, j.posted_at, j.is_active"""
+JOB_COLUMNS = JOB_TABLE_COLUMNS + """,
+    c.name as company, cat.name as category, l.city, l.country, l.remote
+    """
+
+def job_from(jobs='jobs', companies='companies', categories='job_categories', locations='job_locations'):
+    """FROM clause joining jobs to its dimensions; any of them may be a CTE name instead"""
+    return f"""
+    FROM {jobs} j
+    JOIN {companies} c ON j.company_id = c.id
+    LEFT JOIN {categories} cat ON j.category_id = cat.id
+    LEFT JOIN {locations} l ON j.location_id = l.id
+    """
+
+JOB_FROM = job_from()
+
+JOB_SELECT = "SELECT" + JOB_COLUMNS + JOB_FROM
+
+SEARCH_RANK = "ts_rank_cd(j.search_vector, to_tsquery('english', %s))"
+SEARCH_HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MinWords=15, MaxWords=35, MaxFragments=2"
+
+# Dimension upserts: one round trip, and safe when two requests add the same
+# name at once. The no-op DO UPDATE is what makes RETURNING yield existing ids.
+UPSERT_COMPANY = """
+    INSERT INTO companies (name) VALUES (%s)
+    ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+    RETURNING *
+    """
+UPSERT_LOCATION = """
+    INSERT INTO job_locations (city, country, remote) VALUES (%s, %s, %s)
+    ON CONFLICT (city, country) DO UPDATE SET city = EXCLUDED.city
+    RETURNING *
+    """
+UPSERT_CATEGORY = """
+    INSERT INTO job_categories (name, slug) VALUES (%s, %s)
+    ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+    RETURNING *
+    """
+
+# Job dimensions: (jobs column, job_from argument, upsert) for create/update
+JOB_DIMENSIONS = [
+    ('company_id', 'companies', UPSERT_COMPANY),
+    ('category_id', 'categories', UPSERT_CATEGORY),
+    ('location_id', 'locations', UPSERT_LOCATION),
+]
+
+# A cached dimension id is only used if it still names the same row: after a
+# reset or reseed the id may belong to another company, or to none. -1 never
+# exists, so a stale id fails the foreign key and the caller looks it up again.
+CACHED_DIMENSION_IDS = {
+    'company_id': "COALESCE((SELECT id FROM companies WHERE id = %s AND name = %s), -1)",
+    'category_id': "COALESCE((SELECT id FROM job_categories WHERE id = %s AND name = %s), -1)",
+    'location_id': "COALESCE((SELECT id FROM job_locations WHERE id = %s AND city = %s AND country = %s), -1)",
+}
+
+DELETE_JOB = "UPDATE jobs SET is_active = FALSE WHERE id = %s"
+BATCH_DELETE_JOB = DELETE_JOB + " RETURNING id"
+
+BATCH_OPERATIONS = ('create', 'update', 'delete')
+
+# Listing filters accepted by build_jobs_filter, besides the full-text search
+JOB_FILTERS = ('category', 'location', 'remote', 'job_type', 'salary_min', 'salary_max', 'tags')
+
+# Counters maintained by the job_stats triggers (migration 0004), so reading
+# them costs the same however many jobs there are. updated_at is when a
+# counter last changed; categories and locations with no jobs report 0.
+STATS_SNAPSHOT = """
+    SELECT s.scope, NULL as name, s.count, s.updated_at
+    FROM job_stats s WHERE s.scope IN ('total', 'active')
+    UNION ALL
+    SELECT 'category', cat.name, COALESCE(s.count, 0), s.updated_at
+    FROM job_categories cat
+    LEFT JOIN job_stats s ON s.scope = 'category' AND s.ref_id = cat.id
+    UNION ALL
+    SELECT 'location', CONCAT(l.city, ', ', l.country), COALESCE(s.count, 0), s.updated_at
+    FROM job_locations l
+    LEFT JOIN job_stats s ON s.scope = 'location' AND s.ref_id = l.id
+    """
+
+# Replica health: whether it is still a standby, how far it has replayed and
+# how far behind the primary that is. With nothing left to replay it is
+# caught up, however long ago the last transaction was.
+REPLICA_STATUS = """
+    SELECT pg_is_in_recovery() as in_recovery,
+           pg_last_wal_replay_lsn()::text as replay_lsn,
+           CASE WHEN pg_last_wal_receive_lsn() <= pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END as lag_seconds
+    """
+CURRENT_WAL_LSN = "SELECT pg_current_wal_lsn()::text as lsn"
+CONNECTION_LIMITS = """
+    SELECT current_setting('max_connections')::int as max_connections,
+           current_setting('superuser_reserved_connections')::int as superuser_reserved
+    """
+
+# Change counter for job payloads (migration 0005); drives ETag/Last-Modified
+DATA_VERSION = "SELECT version, updated_at FROM data_versions WHERE name = 'jobs'"
+
+# Distinct suggestion terms with their active job counts for jobs with id > %s.
+# The 'last_id' row reports the highest id covered, from the same snapshot.
+SUGGESTION_TERMS = """
+    WITH recent AS (
+        SELECT * FROM jobs WHERE is_active = TRUE AND id > %s
+    )
+    SELECT 'title' as type, j.title as label, COUNT(*) as count FROM recent j GROUP BY j.title
+    UNION ALL
+    SELECT 'company', c.name, COUNT(*) FROM recent j JOIN companies c ON j.company_id = c.id GROUP BY c.name
+    UNION ALL
+    SELECT 'location', l.city, COUNT(*) FROM recent j JOIN job_locations l ON j.location_id = l.id GROUP BY l.city
+    UNION ALL
+    SELECT 'skill', tag, COUNT(*)
+    FROM recent j, jsonb_array_elements_text(
+        CASE WHEN jsonb_typeof(j.skills_required) = 'array' THEN j.skills_required ELSE '[]'::jsonb END) tag
+    GROUP BY tag
+    UNION ALL
+    SELECT 'last_id', NULL, COALESCE(MAX(id), %s) FROM recent
+    """
+
+# Bulk import: rows are COPYed into a per-transaction staging table, then each
+# batch resolves its companies/locations/categories and is merged into jobs
+IMPORT_STAGING_COLUMNS = (
+    "line_no, title, description, requirements, job_type, salary_min, salary_max, salary_currency, "
+    "skills_required, company, city, country, remote, category, category_slug, application_email, "
+    "application_url, posted_at"
+)
+CREATE_IMPORT_STAGING = """
+    CREATE TEMP TABLE IF NOT EXISTS import_staging (
+        line_no INTEGER, title TEXT, description TEXT, requirements TEXT, job_type TEXT,
+        salary_min NUMERIC, salary_max NUMERIC, salary_currency TEXT, skills_required TEXT,
+        company TEXT, city TEXT, country TEXT, remote BOOLEAN, category TEXT, category_slug TEXT,
+        application_email TEXT, application_url TEXT, posted_at TIMESTAMP
+    ) ON COMMIT DROP
+    """
+COPY_IMPORT_STAGING = f"COPY import_staging ({IMPORT_STAGING_COLUMNS}) FROM STDIN"
+IMPORT_RESOLVE_DIMENSIONS = [
+    """
+    INSERT INTO companies (name)
+    SELECT DISTINCT company FROM import_staging
+    ON CONFLICT (name) DO NOTHING
+    """,
+    """
+    INSERT INTO job_locations (city, country, remote)
+    SELECT DISTINCT ON (city, country) city, country, remote FROM import_staging
+    ORDER BY city, country, remote
+    ON CONFLICT (city, country) DO NOTHING
+    """,
+    # No conflict target: a new name whose slug is taken joins the existing category by slug
+    """
+    INSERT INTO job_categories (name, slug)
+    SELECT DISTINCT ON (category_slug) category, category_slug FROM import_staging
+    ORDER BY category_slug, category
+    ON CONFLICT DO NOTHING
+    """,
+]
+IMPORT_MERGE_JOBS = """
+    INSERT INTO jobs (
+        title, description, requirements, job_type, salary_min, salary_max,
+        salary_currency, skills_required, company_id, category_id, location_id,
+        application_email, application_url, posted_at
+    )
+    SELECT s.title, s.description, s.requirements, s.job_type, s.salary_min, s.salary_max,
+           s.salary_currency, s.skills_required::jsonb, c.id, cat.id, l.id,
+           s.application_email, s.application_url, COALESCE(s.posted_at, CURRENT_TIMESTAMP)
+    FROM import_staging s
+    JOIN companies c ON c.name = s.company
+    JOIN job_locations l ON l.city = s.city AND l.country = s.country
+    LEFT JOIN job_categories cat ON cat.slug = s.category_slug
+    ORDER BY s.line_no
+    """
+
+# Synthetic seeding resolves its few dimensions up front, so jobs are COPYed straight in
+SEED_JOB_COLUMNS = (
+    "title, description, requirements, job_type, salary_min, salary_max, salary_currency, skills_required, "
+    "company_id, category_id, location_id, application_email, application_url, posted_at"
+)
+COPY_SEED_JOBS = f"COPY jobs ({SEED_JOB_COLUMNS}) FROM STDIN"
+
+# Monthly partitions of jobs (migration 0007), named jobs_pYYYY_MM. One that
+# is not attached was detached by an archive run that stopped before finishing.
+JOB_PARTITIONS = """
+    SELECT c.relname as name, to_date(substr(c.relname, 7), 'YYYY_MM') as month, c.relispartition as attached
+    FROM pg_class c
+    WHERE c.relkind = 'r' AND c.relname ~ '^jobs_p[0-9]{4}_[0-9]{2}$' AND pg_table_is_visible(c.oid)
+    ORDER BY month
+    """
+# Tables left over from archive runs (detached or unattached archive months) or an interrupted
+# partitioning migration; the attached partitions go with jobs and jobs_archive
+LEFTOVER_JOB_TABLES = """
+    SELECT c.relname as name
+    FROM pg_class c
+    WHERE c.relkind IN ('r', 'p') AND NOT c.relispartition AND pg_table_is_visible(c.oid)
+        AND c.relname ~ '^jobs_(partitioned|(detached_|archive_)?p[0-9]{4}_[0-9]{2})$'
+    ORDER BY name
+    """
+# First month kept by an archive run with a retention of %s days; only whole months older go
+ARCHIVE_CUTOFF = "SELECT date_trunc('month', CURRENT_TIMESTAMP - make_interval(days => %s))::date as cutoff"
+# Partitions for the months in a %s date array, for the next %s months and for
+# any month with rows waiting in jobs_default
+ENSURE_JOB_PARTITIONS = """
+    SELECT month, jobs_ensure_partition(month) as created FROM (
+        SELECT DISTINCT date_trunc('month', posted_at)::date as month FROM jobs_default
+        UNION
+        SELECT date_trunc('month', month)::date FROM unnest(%s::date[]) month
+        UNION
+        SELECT generate_series(date_trunc('month', CURRENT_TIMESTAMP),
+                               date_trunc('month', CURRENT_TIMESTAMP) + make_interval(months => %s),
+                               INTERVAL '1 month')::date
+    ) months
+    ORDER BY month
+    """
+SET_LOCK_TIMEOUT = "SELECT set_config('lock_timeout', %s, true)"
+# Held by whoever creates partitions until commit, so concurrent callers don't race on the same month
+LOCK_JOB_PARTITIONS = "SELECT pg_advisory_xact_lock(hashtext('jobs_ensure_partition'))"
+TABLE_EXISTS = "SELECT to_regclass(%s) IS NOT NULL as exists"
+BUMP_JOBS_DATA_VERSION = """
+    UPDATE data_versions SET version = version + 1, updated_at = clock_timestamp() WHERE name = 'jobs'
+    """
+
+def build_partition_counts(partition):
+    """Jobs and active jobs in a detached jobs partition"""
+    return f"SELECT COUNT(*) as jobs, COUNT(*) FILTER (WHERE is_active) as active FROM {partition}"
+
+def build_archived_stats_update(partition):
+    """Take the jobs of a detached partition off the job_stats counters, as deleting them would"""
+    return f"""
+    INSERT INTO job_stats AS s (scope, ref_id, count, updated_at)
+    SELECT scope, ref_id, -SUM(count), clock_timestamp() FROM (
+        SELECT 'total' as scope, 0 as ref_id, COUNT(*) as count FROM {partition}
+        UNION ALL SELECT 'active', 0, COUNT(*) FROM {partition} WHERE is_active
+        UNION ALL SELECT 'category', category_id, COUNT(*) FROM {partition}
+            WHERE is_active AND category_id IS NOT NULL GROUP BY category_id
+        UNION ALL SELECT 'location', location_id, COUNT(*) FROM {partition}
+            WHERE is_active AND location_id IS NOT NULL GROUP BY location_id
+    ) d
+    GROUP BY scope, ref_id
+    HAVING SUM(count) <> 0
+    ORDER BY scope, ref_id
+    ON CONFLICT (scope, ref_id) DO UPDATE
+    SET count = s.count + EXCLUDED.count, updated_at = EXCLUDED.updated_at
+    """
+
+def build_partition_archive(partition, target, month, exists, attach):
+    """Statements that move a detached jobs partition to target, a table for its month.
+
+    If target exists already (the month was archived before), the rows are
+    copied into it; otherwise the partition is renamed to target and, with
+    attach, attached to jobs_archive.
+    """
+    if exists:
+        return [f"INSERT INTO {target} SELECT * FROM {partition}", f"DROP TABLE {partition}"]
+    statements = [f"ALTER TABLE {partition} RENAME TO {target}"]
+    if attach:
+        next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        statements.append(f"ALTER TABLE jobs_archive ATTACH PARTITION {target} "
+                          f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')")
+    return statements
+
+UPDATABLE_JOB_FIELDS = ['title', 'description', 'requirements', 'job_type', 'salary_min', 'salary_max',
+                        'salary_currency', 'application_email', 'application_url']
+
+def parse_location(location_str):
+    """Parse location string to city, country, remote"""
+    parts = [p.strip() for p in location_str.split(',') if p.strip()]
+    if not parts:
+        return "Remote", "Kenya", True
+    city = parts[0]
+    country = parts[1] if len(parts) > 1 else "Kenya"
+    remote = city.lower() == 'remote'
+    return city, country, remote
+
+def category_slug(category_name):
+    """Slug for a category name"""
+    return category_name.lower().replace(' ', '-')
+
+def parse_tags(tags_str):
+    """Split a comma separated tag string into a list"""
+    return [tag.strip() for tag in (tags_str or '').split(',') if tag.strip()]
+
+def job_insert_values(job_data):
+    """Column values for a new job, apart from its company/location/category"""
+    return {
+        'title': job_data['title'],
+        'description': job_data['description'],
+        'requirements': job_data['requirements'],
+        'job_type': job_data.get('type', 'full-time'),
+        'salary_min': job_data.get('salary_min'),
+        'salary_max': job_data.get('salary_max'),
+        'salary_currency': job_data.get('salary_currency', 'KSh'),
+        'skills_required': json.dumps(parse_tags(job_data.get('tags', ''))),
+        'application_email': job_data.get('application_email', ''),
+        'application_url': job_data.get('application_url', ''),
+        'posted_at': datetime.now(),
+    }
+
+def job_dimension_keys(job_data):
+    """(jobs column, id cache key, upsert params) for each dimension set in job_data"""
+    dimensions = []
+    if 'company' in job_data:
+        dimensions.append(('company_id', ('company', job_data['company']), (job_data['company'],)))
+    if 'category' in job_data:
+        name = job_data['category']
+        dimensions.append(('category_id', ('category', name), (name, category_slug(name))))
+    if 'location' in job_data:
+        city, country, remote = parse_location(job_data['location'])
+        dimensions.append(('location_id', ('location', city, country), (city, country, remote)))
+    return dimensions
+
+def _job_write_query(write, write_params, upserts):
+    """Wrap a jobs INSERT/UPDATE ... RETURNING * so one statement writes and returns the joined row.
+
+    upserts maps a dimension column to the params of its upsert, which runs
+    in the same statement; the written row is joined to the upserted
+    dimension rows (not yet visible in the tables) and to the rest.
+    """
+    ctes, params, tables = [], [], {}
+    for column, table, upsert in JOB_DIMENSIONS:
+        if column in upserts:
+            ctes.append(f"{column}_upsert AS ({upsert})")
+            params.extend(upserts[column])
+            tables[table] = f"{column}_upsert"
+    ctes.append(f"written AS ({write})")
+    return "WITH " + ", ".join(ctes) + " SELECT" + JOB_COLUMNS + job_from('written', **tables), tuple(params + write_params)
+
+def _job_write_values(values, upserts, cached=None):
+    """(columns, value expressions, params) for values, checked cached ids and ids taken from the upserts
+
+    cached maps a dimension column to its cached id and the names it was cached under.
+    """
+    cached = cached or {}
+    columns = list(values) + list(cached) + [column for column, _, _ in JOB_DIMENSIONS if column in upserts]
+    expressions = (['%s'] * len(values) + [CACHED_DIMENSION_IDS[column] for column in cached]
+                   + [f"(SELECT id FROM {column}_upsert)" for column, _, _ in JOB_DIMENSIONS if column in upserts])
+    params = list(values.values()) + [param for checked in cached.values() for param in checked]
+    return columns, expressions, params
+
+def build_job_insert(values, upserts, cached=None):
+    """Statement and params that insert a job and return it joined, as get_job_by_id does"""
+    columns, expressions, params = _job_write_values(values, upserts, cached)
+    write = f"INSERT INTO jobs ({', '.join(columns)}) VALUES ({', '.join(expressions)}) RETURNING *"
+    return _job_write_query(write, params, upserts)
+
+def build_tsquery(search):
+    """Turn search input into to_tsquery syntax.
+
+    Quoted text becomes a phrase match and every other word a prefix match, so
+    'sen "python developer"' finds "Senior Python Developer". Returns '' when
+    the input has no searchable words.
+    """
+    parts = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', search or ''):
+        if phrase:
+            words = re.findall(r'\w+', phrase)
+            if words:
+                parts.append('(' + ' <-> '.join(words) + ')')
+        else:
+            parts.extend(f"{w}:*" for w in re.findall(r'\w+', word))
+    return ' & '.join(parts)
+
+def encode_cursor(job, direction):
+    """Opaque cursor pointing before ('prev') or after ('next') a listing row"""
+    payload = {"p": job['posted_at'].isoformat(), "i": job['id'], "d": direction}
+    if 'rank' in job:
+        payload["r"] = job['rank']
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor, raising ValueError if it is malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        direction = payload['d']
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return {
+            "posted_at": datetime.fromisoformat(payload['p']),
+            "id": int(payload['i']),
+            "rank": float(payload['r']) if 'r' in payload else None,
+            "direction": direction,
+        }
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def build_jobs_filter(search=None, filters=None):
+    """WHERE clause and params shared by the listing, its count, facets and the export.
+
+    filters may set any of JOB_FILTERS: category (name or slug), location
+    ("City" or "City, Country"), remote, job_type, salary_min/salary_max (a
+    range the advertised salary must overlap) and tags (all must be present).
+    Only columns of jobs are referenced, so the clause can be applied before
+    any join.
+    """
+    where = " WHERE j.is_active = TRUE"
+    params = []
+    tsquery = build_tsquery(search)
+    if tsquery:
+        where += " AND j.search_vector @@ to_tsquery('english', %s)"
+        params.append(tsquery)
+
+    filters = filters or {}
+    unknown = set(filters) - set(JOB_FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown filter: {', '.join(sorted(unknown))}")
+    if filters.get('category'):
+        where += " AND j.category_id IN (SELECT id FROM job_categories WHERE slug = %s)"
+        params.append(category_slug(filters['category']))
+    if filters.get('location'):
+        parts = [p.strip() for p in filters['location'].split(',') if p.strip()]
+        where += " AND j.location_id IN (SELECT id FROM job_locations WHERE lower(city) = lower(%s)"
+        params.append(parts[0] if parts else '')
+        if len(parts) > 1:
+            where += " AND lower(country) = lower(%s)"
+            params.append(parts[1])
+        where += ")"
+    if filters.get('remote') is not None:
+        where += " AND j.location_id IN (SELECT id FROM job_locations WHERE remote = %s)"
+        params.append(bool(filters['remote']))
+    if filters.get('job_type'):
+        where += " AND j.job_type = %s"
+        params.append(filters['job_type'])
+    if filters.get('salary_min') is not None:
+        where += " AND COALESCE(j.salary_max, j.salary_min) >= %s"
+        params.append(filters['salary_min'])
+    if filters.get('salary_max') is not None:
+        where += " AND COALESCE(j.salary_min, j.salary_max) <= %s"
+        params.append(filters['salary_max'])
+    if filters.get('tags'):
+        # Matches the jsonb_path_ops GIN index on skills_required
+        where += " AND j.skills_required @> %s::jsonb"
+        params.append(json.dumps(list(filters['tags'])))
+    return where, params
+
+def jobs_filter_key(search=None, filters=None):
+    """Hashable key for a listing filter, for caching its total"""
+    items = tuple(sorted((name, tuple(value) if isinstance(value, list) else value)
+                         for name, value in (filters or {}).items() if value is not None))
+    return (search or '', items)
+
+def build_jobs_count_query(search=None, cap=10000, filters=None):
+    """Exact count of the listing, stopping after cap + 1 matching rows"""
+    where, params = build_jobs_filter(search=search, filters=filters)
+    query = f"""
+    SELECT COUNT(*) as count FROM (
+        SELECT 1 FROM jobs j JOIN companies c ON j.company_id = c.id{where} LIMIT %s
+    ) capped
+    """
+    return query, tuple(params + [cap + 1])
+
+def build_jobs_estimate_query(search=None, filters=None):
+    """Planner row estimate for the listing filter, for when an exact count is too costly"""
+    where, params = build_jobs_filter(search=search, filters=filters)
+    return f"EXPLAIN (FORMAT JSON) SELECT 1 FROM jobs j JOIN companies c ON j.company_id = c.id{where}", tuple(params)
+
+def build_jobs_export_query(search=None, filters=None):
+    """Every job matching the listing filter, newest first, for the streaming export"""
+    where, params = build_jobs_filter(search=search, filters=filters)
+    return JOB_SELECT + where + " ORDER BY j.posted_at DESC, j.id DESC", tuple(params)
+
+def build_job_facets_query(search=None, filters=None, tag_limit=20):
+    """Per-category, location, type and tag counts for the listing filter, plus its exact total.
+
+    One pass over the matching jobs: GROUPING SETS produce the category,
+    location and type counts and the grand total, and the tag counts (the
+    top tag_limit) are unioned on from the same CTE. Rows are
+    (facet, value, count); see build_job_facets.
+    """
+    where, params = build_jobs_filter(search=search, filters=filters)
+    query = f"""
+    WITH matched AS (
+        SELECT j.category_id, j.location_id, j.job_type, j.skills_required
+        FROM jobs j JOIN companies c ON j.company_id = c.id{where}
+    ), grouped AS (
+        SELECT category_id, location_id, job_type, COUNT(*) as count,
+               GROUPING(category_id, location_id, job_type) as grouping
+        FROM matched
+        GROUP BY GROUPING SETS ((category_id), (location_id), (job_type), ())
+    )
+    SELECT CASE g.grouping WHEN 3 THEN 'category' WHEN 5 THEN 'location' WHEN 6 THEN 'type' ELSE 'total' END as facet,
+           CASE g.grouping WHEN 3 THEN cat.name WHEN 5 THEN l.city || ', ' || l.country WHEN 6 THEN g.job_type END as value,
+           g.count
+    FROM grouped g
+    LEFT JOIN job_categories cat ON g.grouping = 3 AND cat.id = g.category_id
+    LEFT JOIN job_locations l ON g.grouping = 5 AND l.id = g.location_id
+    UNION ALL (
+        SELECT 'tag', tag, COUNT(*)
+        FROM matched, jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(skills_required) = 'array' THEN skills_required ELSE '[]'::jsonb END) tag
+        GROUP BY tag
+        ORDER BY COUNT(*) DESC, tag
+        LIMIT %s
+    )
+    """
+    return query, tuple(params + [tag_limit])
+
+def build_job_facets(rows):
+    """Facet counts from build_job_facets_query rows, largest first, and the exact total"""
+    facets = {"categories": {}, "locations": {}, "types": {}, "tags": {}}
+    keys = {'category': 'categories', 'location': 'locations', 'type': 'types', 'tag': 'tags'}
+    total = 0
+    for row in sorted(rows, key=lambda r: (-r['count'], r['value'] or '')):
+        if row['facet'] == 'total':
+            total = row['count']
+        elif row['value'] is not None:
+            facets[keys[row['facet']]][row['value']] = row['count']
+    return facets, total
+
+def jobs_total(count_rows, cap, estimate_rows=None):
+    """Listing total from the capped count, falling back to the planner estimate"""
+    count = count_rows[0]['count']
+    if count <= cap:
+        return {"count": count, "exact": True}
+    plan = estimate_rows[0]['QUERY PLAN'] if estimate_rows else None
+    estimate = int(plan[0]['Plan']['Plan Rows']) if plan else 0
+    return {"count": max(estimate, count), "exact": False}
+
+def build_jobs_query(page=1, limit=10, search=None, cursor=None, filters=None):
+    """Listing query and params for get_jobs.
+
+    Plain listings are ordered newest first; searches by relevance, then
+    newest first, and carry a highlighted snippet of the description. With a
+    cursor the page is found by seeking on the sort key, otherwise by OFFSET.
+    One extra row is fetched so paginate_jobs can tell whether there is a
+    further page. Every value is a parameter, so the SQL text only depends
+    on the shape (search or not; OFFSET, next or prev cursor; which filters)
+    and each shape is one prepared statement per connection.
+
+    The page is cut from jobs alone and only then joined to its company,
+    category and location, so the planner can't trade the index-ordered
+    scan for a join over every match when its row estimate is off.
+    """
+    where, params = build_jobs_filter(search=search, filters=filters)
+    tsquery = build_tsquery(search)
+    seek = cursor and decode_cursor(cursor)
+    if seek and (seek['rank'] is None) == bool(tsquery):
+        raise ValueError("Invalid cursor")
+    descending = not seek or seek['direction'] == 'next'
+    order = 'DESC' if descending else 'ASC'
+
+    if tsquery:
+        page_query = "SELECT" + JOB_TABLE_COLUMNS + f", {SEARCH_RANK} as rank FROM jobs j"
+        params = [tsquery] + params
+        sort_key, sort_params = f"({SEARCH_RANK}, j.posted_at, j.id)", [tsquery]
+        order_by = f"rank {order}, posted_at {order}, id {order}"
+    else:
+        page_query = "SELECT" + JOB_TABLE_COLUMNS + " FROM jobs j"
+        sort_key, sort_params = "(j.posted_at, j.id)", []
+        order_by = f"posted_at {order}, id {order}"
+
+    page_query += where
+    if seek:
+        comparison = '<' if descending else '>'
+        key_values = ([seek['rank']] if tsquery else []) + [seek['posted_at'], seek['id']]
+        page_query += f" AND {sort_key} {comparison} ({', '.join(['%s'] * len(key_values))})"
+        params.extend(sort_params + key_values)
+        if not tsquery:
+            # Implied by the row comparison, but only a plain bound on posted_at
+            # lets the partitions on the far side of the cursor be pruned
+            page_query += f" AND j.posted_at {comparison}= %s"
+            params.append(seek['posted_at'])
+        page_query += f" ORDER BY {order_by} LIMIT %s"
+        params.append(limit + 1)
+    else:
+        page_query += f" ORDER BY {order_by} LIMIT %s OFFSET %s"
+        params.extend([limit + 1, (page - 1) * limit])
+
+    if tsquery:
+        # Headlines are costly, so only build them for the rows of this page
+        query = ("SELECT" + JOB_COLUMNS + ", j.rank, ts_headline('english', j.description, "
+                 "to_tsquery('english', %s), %s) as snippet")
+        params = [tsquery, SEARCH_HEADLINE_OPTIONS] + params
+    else:
+        query = "SELECT" + JOB_COLUMNS
+    query += job_from(f"({page_query})") + f" ORDER BY {order_by}"
+    return query, tuple(params)
+
+def paginate_jobs(rows, limit, page=1, cursor=None):
+    """Trim the extra row from build_jobs_query and work out the neighbouring cursors"""
+    direction = decode_cursor(cursor)['direction'] if cursor else None
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+    if not rows:
+        return {"jobs": rows, "next_cursor": None, "prev_cursor": None}
+    if direction == 'prev':
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, direction == 'next' or page > 1
+    return {
+        "jobs": rows,
+        "next_cursor": encode_cursor(rows[-1], 'next') if has_next else None,
+        "prev_cursor": encode_cursor(rows[0], 'prev') if has_prev else None,
+    }
+
+def build_job_by_id_query(job_id):
+    """Detail query and params for get_job_by_id"""
+    return JOB_SELECT + " WHERE j.id = %s AND j.is_active = TRUE", (job_id,)
+
+def job_update_fields(job_data):
+    """Column updates for update_job, excluding the company/location/category lookups"""
+    update_fields = {}
+    for key in UPDATABLE_JOB_FIELDS:
+        if key in job_data:
+            update_fields[key] = job_data[key]
+
+    if 'type' in job_data:
+        update_fields['job_type'] = job_data['type']
+
+    if 'tags' in job_data:
+        update_fields['skills_required'] = json.dumps(parse_tags(job_data['tags']))
+    return update_fields
+
+def build_job_update(job_id, update_fields, upserts=None, cached=None):
+    """Statement and params that update an active job and return it joined; no row if there is none"""
+    upserts = upserts or {}
+    columns, expressions, params = _job_write_values(update_fields, upserts, cached)
+    set_clause = ', '.join(f"{column} = {expression}" for column, expression in zip(columns, expressions))
+    write = f"UPDATE jobs SET {set_clause} WHERE id = %s AND is_active = TRUE RETURNING *"
+    return _job_write_query(write, params + [job_id], upserts)
+
+def build_job_stats(rows):
+    """Assemble get_job_stats output from STATS_SNAPSHOT rows"""
+    stats = {"total_jobs": 0, "active_jobs": 0, "categories": {}, "locations": {}, "updated_at": None}
+    for row in rows:
+        if row['scope'] == 'total':
+            stats["total_jobs"] = row['count']
+        elif row['scope'] == 'active':
+            stats["active_jobs"] = row['count']
+        elif row['scope'] == 'category':
+            stats["categories"][row['name']] = row['count']
+        else:
+            stats["locations"][row['name']] = row['count']
+        if row['updated_at'] and (stats["updated_at"] is None or row['updated_at'] > stats["updated_at"]):
+            stats["updated_at"] = row['updated_at']
+    if stats["updated_at"]:
+        stats["updated_at"] = stats["updated_at"].isoformat()
+    return stats
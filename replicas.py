@@ -0,0 +1,110 @@
+import itertools
+import time
+from contextvars import ContextVar
+
+# Read-replica bookkeeping shared by db.Database and async_db.AsyncDatabase.
+# Each replica has its own pool; periodic health checks record whether it is
+# reachable, how far behind the primary it is and how far it has replayed the
+# WAL. Reads are spread round robin over the replicas that are healthy and,
+# for read-your-writes, have replayed the client's last write.
+
+def parse_lsn(lsn):
+    """A pg_lsn such as '16/B374D848' as an int, so LSNs can be compared; None stays None"""
+    if not lsn:
+        return None
+    high, _, low = str(lsn).partition('/')
+    try:
+        return (int(high, 16) << 32) + int(low, 16)
+    except ValueError:
+        return None
+
+def format_lsn(value):
+    return f"{value >> 32:X}/{value & 0xFFFFFFFF:X}"
+
+class ReadSession:
+    """Read-your-writes state for one request or task.
+
+    min_lsn is the last write the client has seen (its LSN token); reads may
+    only use replicas that have replayed that far. Once the session itself
+    writes, its reads go to the primary, and written_lsn is set to the
+    primary's WAL position afterwards so it can be handed back as the token.
+
+    All reads of the session go to the server its first read chose, so a
+    response isn't put together from replicas at different points, such as
+    an ETag from one and a body from another that is further behind. If that
+    replica is evicted, the rest go to the primary, which is ahead of it.
+    """
+
+    def __init__(self, min_lsn=None):
+        self.min_lsn = min_lsn
+        self.wrote = False
+        self.written_lsn = None
+        self.replica = None    # where the session reads; None is the primary
+        self.chosen = False    # whether its first read chose already
+
+current_session = ContextVar('read_session', default=None)
+
+class Replica:
+    def __init__(self, name, conninfo):
+        self.name = name
+        self.conninfo = conninfo
+        self.pool = None
+        self.healthy = False  # until the first health check passes
+        self.error = "not checked yet"
+        self.lag_seconds = None
+        self.replay_lsn = None
+        self.checked_at = None
+
+class ReplicaSet:
+    """Health and lag state of the replicas, and the choice of one for each read"""
+
+    def __init__(self, conninfos, max_lag_seconds=5.0):
+        self.replicas = [Replica(f"replica{n}", conninfo) for n, conninfo in enumerate(conninfos, start=1)]
+        self.max_lag_seconds = max_lag_seconds
+        self._turn = itertools.count()
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def __iter__(self):
+        return iter(self.replicas)
+
+    def choose(self, min_lsn=None):
+        """A healthy replica that has replayed min_lsn, round robin; None means read from the primary"""
+        candidates = [r for r in self.replicas
+                      if r.healthy and (min_lsn is None or (r.replay_lsn or 0) >= min_lsn)]
+        if not candidates:
+            return None
+        return candidates[next(self._turn) % len(candidates)]
+
+    def record_check(self, replica, row):
+        """Update a replica from a REPLICA_STATUS row, evicting it if it was promoted or lags too far"""
+        replica.checked_at = time.monotonic()
+        replica.replay_lsn = parse_lsn(row['replay_lsn'])
+        replica.lag_seconds = float(row['lag_seconds'] or 0)
+        if not row['in_recovery']:
+            self._set_health(replica, "not in recovery (promoted?)")
+        elif replica.lag_seconds > self.max_lag_seconds:
+            self._set_health(replica, f"lagging {replica.lag_seconds:.1f}s behind the primary")
+        else:
+            self._set_health(replica, None)
+
+    def record_failure(self, replica, error):
+        replica.checked_at = time.monotonic()
+        self._set_health(replica, str(error).strip() or type(error).__name__)
+
+    def _set_health(self, replica, problem):
+        healthy = problem is None
+        if healthy != replica.healthy:
+            print(f"Replica {replica.name} {'is healthy' if healthy else 'evicted: ' + problem}")
+        replica.healthy, replica.error = healthy, problem
+
+    def stats(self):
+        """Per-replica health for /api/health"""
+        return [{
+            "name": r.name,
+            "healthy": r.healthy,
+            "error": r.error,
+            "lag_seconds": r.lag_seconds,
+            "replay_lsn": format_lsn(r.replay_lsn) if r.replay_lsn is not None else None,
+        } for r in self.replicas]
@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+import psycopg
+from psycopg_pool import PoolTimeout
+
+# Connection-loss handling shared by db.Database and async_db.AsyncDatabase:
+# telling a lost connection from a failed statement, jittered backoff for
+# retrying idempotent reads, and a circuit breaker that fails fast while the
+# primary is down instead of letting every request wait out the pool timeout.
+
+# SQLSTATEs meaning the server went away or is not accepting connections:
+# class 08 (connection exception), admin/crash shutdown and cannot connect now
+_CONNECTION_SQLSTATES = ('57P01', '57P02', '57P03')
+
+class DatabaseUnavailable(psycopg.OperationalError):
+    """Raised without touching the database while the circuit breaker is open"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"database unavailable, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+def is_connection_error(error):
+    """Whether error means the connection or the server was lost, so the statement can be run again elsewhere.
+
+    Statement errors, including timeouts and cancellations, are not: running
+    them again would fail the same way.
+    """
+    if isinstance(error, (DatabaseUnavailable, PoolTimeout)) or not isinstance(error, psycopg.OperationalError):
+        return False
+    sqlstate = error.sqlstate
+    return sqlstate is None or sqlstate.startswith('08') or sqlstate in _CONNECTION_SQLSTATES
+
+def retry_delay(settings, attempt):
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+    return random.uniform(0, min(settings['backoff'] * 2 ** (attempt - 1), settings['backoff_max']))
+
+class CircuitBreaker:
+    """Fails calls fast while the database is down.
+
+    Closed, calls go through, and `threshold` connection failures in a row
+    open it. Open, calls fail at once with DatabaseUnavailable for `cooldown`
+    seconds. After that it is half-open: one trial call goes through (another
+    one each cooldown, should a trial never finish), and the first success
+    closes it while a failure opens it again.
+    """
+
+    def __init__(self, threshold=5, cooldown=5.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_at = None
+        self.opens = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.cooldown else "half-open"
+
+    def before_call(self):
+        """Raise DatabaseUnavailable while open; in half-open, let the trial call through"""
+        if self.opened_at is None:
+            return
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = self.opened_at + self.cooldown - now
+            if remaining <= 0 and (self.trial_at is None or now - self.trial_at >= self.cooldown):
+                self.trial_at = now
+                return
+            self.rejected += 1
+            raise DatabaseUnavailable(max(remaining, 0) or self.cooldown)
+
+    def record_success(self):
+        if self.failures == 0 and self.opened_at is None:
+            return
+        with self._lock:
+            if self.opened_at is not None:
+                print("Database reachable again, circuit breaker closed")
+            self.failures, self.opened_at, self.trial_at = 0, None, None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_at is not None or (self.opened_at is None and self.failures >= self.threshold):
+                if self.opened_at is None:
+                    print(f"Database unreachable ({self.failures} connection failures), "
+                          f"circuit breaker open for {self.cooldown:.0f}s")
+                self.opened_at, self.trial_at = time.monotonic(), None
+                self.opens += 1
+
+    def trip(self):
+        """Open now, however many failures there were: every attempt to connect has failed"""
+        with self._lock:
+            if self.opened_at is None:
+                print(f"Database unreachable, circuit breaker open for {self.cooldown:.0f}s")
+            self.failures += 1
+            self.opened_at, self.trial_at = time.monotonic(), None
+            self.opens += 1
+
+    def stats(self):
+        return {"state": self.state, "failures": self.failures, "opens": self.opens, "rejected": self.rejected}
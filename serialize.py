@@ -0,0 +1,117 @@
+import csv
+import html
+import io
+import json
+import re
+from decimal import Decimal
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # fall back to the standard library encoder
+    orjson = None
+
+# Row -> response dict conversion for jobs, shared by the Pydantic JobResponse
+# path and the listing fast path, which skips model construction and encodes
+# straight to bytes.
+
+def format_snippet(snippet: str):
+    """HTML-escape a search snippet, keeping only the <mark> highlights added by Postgres"""
+    return ''.join(part if part in ('<mark>', '</mark>') else html.escape(part)
+                   for part in re.split(r'(</?mark>)', snippet))
+
+def _tags(skills):
+    if isinstance(skills, str):
+        try:
+            return json.loads(skills)
+        except json.JSONDecodeError:
+            return [tag.strip() for tag in skills.split(',') if tag.strip()]
+    return skills if isinstance(skills, list) else []
+
+def _amount(value):
+    return float(value) if value is not None else None
+
+def job_payload(job_data: dict):
+    """A job row as the response dict, in JobResponse field order"""
+    salary = None
+    salary_min, salary_max = job_data.get('salary_min'), job_data.get('salary_max')
+    if salary_min and salary_max:
+        if salary_min == salary_max:
+            salary = f"{job_data['salary_currency']} {salary_min:,.0f}"
+        else:
+            salary = f"{job_data['salary_currency']} {salary_min:,.0f}-{salary_max:,.0f}"
+
+    posted_at = job_data.get('posted_at')
+    application_url = job_data.get('application_url', '')
+    payload = {
+        "id": str(job_data['id']),
+        "title": job_data['title'],
+        "company": job_data['company'],
+        "location": f"{job_data.get('city', '')}, {job_data.get('country', '')}"
+                    if job_data.get('city') and not job_data.get('remote') else "Remote",
+        "type": job_data['job_type'],
+        "description": job_data['description'],
+        "requirements": job_data.get('requirements', ''),
+        "salary": salary,
+        "salary_min": _amount(salary_min),
+        "salary_max": _amount(salary_max),
+        "salary_currency": job_data.get('salary_currency', 'KSh'),
+        "tags": _tags(job_data.get('skills_required')),
+        "date_posted": posted_at.strftime('%Y-%m-%d %H:%M') if posted_at else None,
+        "application_email": job_data.get('application_email', ''),
+        "application_link": application_url,
+        "application_url": application_url,
+        "category": job_data.get('category', ''),
+        "city": job_data.get('city', ''),
+        "country": job_data.get('country', ''),
+        "remote": job_data.get('remote', False),
+    }
+    if job_data.get('snippet') is not None:
+        payload['snippet'] = format_snippet(job_data['snippet'])
+    return payload
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv; charset=utf-8'}
+EXPORT_CSV_FIELDS = [
+    'id', 'title', 'company', 'location', 'type', 'description', 'requirements', 'salary',
+    'salary_min', 'salary_max', 'salary_currency', 'tags', 'date_posted', 'application_email',
+    'application_url', 'category', 'city', 'country', 'remote',
+]
+
+def export_chunk(rows, fmt):
+    """Encode a chunk of job rows for the export: one JSON object per line, or CSV rows"""
+    if fmt == 'ndjson':
+        return b''.join(dumps(job_payload(row)) + b'\n' for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        payload = job_payload(row)
+        payload['tags'] = ', '.join(str(tag) for tag in payload['tags'])
+        writer.writerow([payload[field] for field in EXPORT_CSV_FIELDS])
+    return buffer.getvalue().encode('utf-8')
+
+def export_header(fmt):
+    """Bytes that open an export: the CSV header row, nothing for NDJSON"""
+    if fmt != 'csv':
+        return b''
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_CSV_FIELDS)
+    return buffer.getvalue().encode('utf-8')
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content):
+    """Encode a response body to JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse for content that is already plain dicts and lists; skips validation"""
+
+    def render(self, content):
+        return dumps(content)
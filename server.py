@@ -1,12 +1,23 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, ConfigDict, field_validator
-from typing import List, Optional
+from typing import List, Literal, Optional
+from contextlib import asynccontextmanager
+import asyncio
 import os
-import json
-from datetime import datetime
-from db import get_jobs, get_job_by_id, create_job, update_job, delete_job, get_job_stats, db
+import time
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from async_db import (
+    get_jobs_page, count_jobs, get_job_facets, get_job_by_id, create_job, update_job, delete_job, get_job_stats,
+    get_suggestion_terms, get_data_version, import_jobs, run_job_batch, stream_jobs, db
+)
+from importer import IMPORT_FORMATS, aiter_lines, aparse_records
+from suggest import SuggestIndex, SUGGESTION_TYPES
+from serialize import FastJSONResponse, job_payload, EXPORT_FORMATS, export_chunk, export_header
+from metrics import metrics, write_snapshot, combine_snapshots
+from resilience import DatabaseUnavailable
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -132,7 +143,56 @@ class JobResponse(BaseModel):
     country: Optional[str] = None
     remote: Optional[bool] = None
 
-app = FastAPI(title="Jobs Parlour API", version="1.0.0")
+class BatchOperation(BaseModel):
+    op: Literal['create', 'update', 'delete']
+    id: Optional[int] = None
+    data: Optional[dict] = None
+
+class JobBatch(BaseModel):
+    operations: List[BatchOperation]
+    atomic: bool = True
+
+JOBS_BATCH_MAX = int(os.getenv('JOBS_BATCH_MAX', 1000))
+
+def job_filters(category: Optional[str] = None, location: Optional[str] = None,
+                remote: Optional[bool] = None, job_type: Optional[str] = None,
+                salary_min: Optional[float] = None, salary_max: Optional[float] = None,
+                tag: Optional[str] = None):
+    """Listing filters from the query string; `tag` is a comma-separated list, all required"""
+    tags = [t.strip() for t in tag.split(',') if t.strip()] if tag else None
+    filters = {"category": category, "location": location, "remote": remote, "job_type": job_type,
+               "salary_min": salary_min, "salary_max": salary_max, "tags": tags}
+    return {name: value for name, value in filters.items() if value is not None}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connect in the background: the worker starts serving at once, /api/ready
+    # answers 503 until the pool is warm and queries wait for it
+    db.start()
+    saving = None
+    if db.metrics['enabled'] and db.metrics['multiproc_dir']:
+        os.makedirs(db.metrics['multiproc_dir'], exist_ok=True)
+        saving = asyncio.get_running_loop().create_task(save_metrics_forever())
+    yield
+    if saving:
+        saving.cancel()
+        await asyncio.to_thread(save_metrics)  # what this worker counted since the last save
+    await db.close()
+
+def save_metrics():
+    """Save this worker's metrics to METRICS_MULTIPROC_DIR, for whichever worker answers /api/metrics"""
+    write_snapshot(db.metrics['multiproc_dir'], metrics.snapshot(db.pool_stats() if db.pool else None,
+                                                                 db.breaker.stats()))
+
+async def save_metrics_forever():
+    while True:
+        try:
+            await asyncio.to_thread(save_metrics)
+        except OSError as e:
+            print(f"Error saving metrics: {e}")
+        await asyncio.sleep(db.metrics['flush_seconds'])
+
+app = FastAPI(title="Jobs Parlour API", version="1.0.0", lifespan=lifespan)
 
 # Configure CORS from .env
 cors_origins = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:5500,http://127.0.0.1:5500,https://emannuh254.github.io').split(',')
@@ -142,79 +202,189 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Read-After-LSN"],
+)
+
+READ_AFTER_HEADER = "X-Read-After-LSN"
+READ_AFTER_COOKIE = "jobs_lsn"
+
+suggest_index = SuggestIndex(
+    rebuild_seconds=float(os.getenv('SUGGEST_REBUILD_SECONDS', 600)),
+    catch_up_seconds=float(os.getenv('SUGGEST_CATCH_UP_SECONDS', 10))
 )
+_suggest_refresh = None
+
+async def refresh_suggestions():
+    """Rebuild the suggestion index, or top it up with jobs posted since the last refresh"""
+    # Runs as a background task, so it must not borrow the triggering request's connection
+    async with db.connection(fresh=True, read_only=True):
+        if suggest_index.needs_rebuild():
+            rows, last_id = await get_suggestion_terms()
+            suggest_index.rebuild(rows, last_id)
+        else:
+            rows, last_id = await get_suggestion_terms(after_id=suggest_index.last_id)
+            suggest_index.merge(rows, last_id)
+
+def schedule_suggestion_refresh():
+    """Start a refresh unless one is already running; returns the running task"""
+    global _suggest_refresh
+    if _suggest_refresh is None or _suggest_refresh.done():
+        _suggest_refresh = asyncio.create_task(refresh_suggestions())
+    return _suggest_refresh
+
+# Job reads may be cached by browsers and CDNs for a short while, then revalidated
+JOBS_CACHE_CONTROL = "public, max-age={}, stale-while-revalidate={}".format(
+    int(os.getenv('JOBS_CACHE_MAX_AGE', 10)), int(os.getenv('JOBS_CACHE_STALE_SECONDS', 60))
+)
+
+def cache_headers(version: dict):
+    """ETag, Last-Modified and Cache-Control for a response built from this data version"""
+    if not version:
+        return {"Cache-Control": "no-cache"}
+    return {
+        "ETag": f'W/"{version["version"]}"',
+        "Last-Modified": format_datetime(version["updated_at"].astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": JOBS_CACHE_CONTROL,
+    }
+
+def is_not_modified(request: Request, headers: dict):
+    """Whether the client's If-None-Match / If-Modified-Since still matches headers"""
+    if "ETag" not in headers:
+        return False
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = headers["ETag"].removeprefix("W/")
+        return any(tag.strip() == "*" or tag.strip().removeprefix("W/") == etag
+                   for tag in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@app.middleware("http")
+async def database_scope(request: Request, call_next):
+    """Give each API request its own pooled connections, checked out on its first query.
+
+    With read replicas, a client that wrote gets the primary's WAL position
+    back as an LSN token (X-Read-After-LSN header and cookie, kept for
+    DATABASE_READ_YOUR_WRITES_SECONDS); while it sends the token, its reads
+    only go to replicas that have replayed that far, so it reads its own writes.
+    """
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    lsn_token = request.headers.get(READ_AFTER_HEADER) or request.cookies.get(READ_AFTER_COOKIE)
+    async with db.request_scope():
+        async with db.read_session(lsn_token) as session:
+            response = await call_next(request)
+    if session.written_lsn:
+        response.headers[READ_AFTER_HEADER] = session.written_lsn
+        response.set_cookie(READ_AFTER_COOKIE, session.written_lsn, httponly=True, samesite="lax",
+                            max_age=int(db.replica_settings['read_your_writes_seconds']))
+    return response
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-route latency and status counts for /api/metrics, keyed by the route template"""
+    if not db.metrics['enabled']:
+        return await call_next(request)
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.observe_request(request.method, route.path if route else "unmatched", status_code,
+                                time.perf_counter() - started)
 
 def format_job(job_data: dict):
     """Format job data for response"""
     if not job_data:
         return None
-    
-    skills = job_data.get('skills_required')
-    if isinstance(skills, str):
-        try:
-            tags = json.loads(skills)
-        except json.JSONDecodeError:
-            tags = [tag.strip() for tag in skills.split(',') if tag.strip()]
-    else:
-        tags = skills if isinstance(skills, list) else []
-    
-    location = f"{job_data.get('city', '')}, {job_data.get('country', '')}" if job_data.get('city') and not job_data.get('remote') else "Remote"
-    
-    salary = None
-    if job_data.get('salary_min') and job_data.get('salary_max'):
-        if job_data['salary_min'] == job_data['salary_max']:
-            salary = f"{job_data['salary_currency']} {job_data['salary_min']:,.0f}"
-        else:
-            salary = f"{job_data['salary_currency']} {job_data['salary_min']:,.0f}-{job_data['salary_max']:,.0f}"
-    
-    return JobResponse(
-        id=str(job_data['id']),
-        title=job_data['title'],
-        company=job_data['company'],
-        location=location,
-        type=job_data['job_type'],
-        description=job_data['description'],
-        requirements=job_data.get('requirements', ''),
-        salary=salary,
-        salary_min=job_data.get('salary_min'),
-        salary_max=job_data.get('salary_max'),
-        salary_currency=job_data.get('salary_currency', 'KSh'),
-        tags=tags,
-        date_posted=job_data['posted_at'].strftime('%Y-%m-%d %H:%M') if job_data.get('posted_at') else None,
-        application_email=job_data.get('application_email', ''),
-        application_link=job_data.get('application_url', ''),
-        application_url=job_data.get('application_url', ''),
-        category=job_data.get('category', ''),
-        city=job_data.get('city', ''),
-        country=job_data.get('country', ''),
-        remote=job_data.get('remote', False)
-    )
+    return JobResponse(**job_payload(job_data))
 
 @app.get("/")
 async def root():
     return {"message": "Jobs Parlour API", "version": "1.0.0"}
 
 @app.get("/api/jobs/", response_model=dict)
-async def get_jobs_list(page: int = 1, limit: int = 10, search: Optional[str] = None):
+async def get_jobs_list(request: Request, page: int = 1, limit: int = 10,
+                        search: Optional[str] = None, cursor: Optional[str] = None,
+                        facets: bool = False, filters: dict = Depends(job_filters)):
+    """List active jobs, newest first or by relevance when searching.
+
+    Pass next_cursor/prev_cursor back as `cursor` to page; `page` is the legacy
+    OFFSET mode. `search` matches word prefixes and "quoted phrases".
+    category, location, remote, job_type, salary_min/salary_max and tag narrow
+    the listing; with `facets=true` the response also carries per-category,
+    location, type and tag counts for it, from the same query as the total.
+    Conditional requests get a 304 without running the listing queries.
+    """
     try:
-        jobs_data = get_jobs(page=page, limit=limit, search=search)
-        total = len(jobs_data)  # Consider using a COUNT query for efficiency
-        return {
-            "results": [format_job(job) for job in jobs_data],
+        headers = cache_headers(await get_data_version())
+        if is_not_modified(request, headers):
+            return Response(status_code=304, headers=headers)
+        if facets:
+            jobs_page, (facet_counts, count) = await asyncio.gather(
+                get_jobs_page(page=page, limit=limit, search=search, cursor=cursor, filters=filters),
+                get_job_facets(search=search, filters=filters)
+            )
+            total = {"count": count, "exact": True}
+        else:
+            jobs_page, total = await asyncio.gather(
+                get_jobs_page(page=page, limit=limit, search=search, cursor=cursor, filters=filters),
+                count_jobs(search=search, filters=filters)
+            )
+        content = {
+            "results": [job_payload(job) for job in jobs_page["jobs"]],
             "page": page,
             "limit": limit,
-            "total": total
+            "total": total["count"],
+            "total_exact": total["exact"],
+            "next_cursor": jobs_page["next_cursor"],
+            "prev_cursor": jobs_page["prev_cursor"]
         }
+        if facets:
+            content["facets"] = facet_counts
+        return FastJSONResponse(content, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+@app.get("/api/jobs/export")
+async def export_jobs(format: str = "ndjson", search: Optional[str] = None,
+                      filters: dict = Depends(job_filters)):
+    """Stream every job matching the listing filters as NDJSON or CSV, in constant memory"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    async def body():
+        yield export_header(format)
+        async for rows in stream_jobs(search=search, chunk_size=EXPORT_CHUNK_SIZE, filters=filters):
+            yield export_chunk(rows, format)
+
+    return StreamingResponse(body(), media_type=EXPORT_FORMATS[format], headers={
+        "Content-Disposition": f'attachment; filename="jobs.{format}"',
+        "Cache-Control": "no-store",
+    })
+
 @app.get("/api/jobs/{job_id}", response_model=JobResponse)
-async def get_job_detail(job_id: int):
+async def get_job_detail(job_id: int, request: Request):
     try:
-        job_data = get_job_by_id(job_id)
+        headers = cache_headers(await get_data_version())
+        if is_not_modified(request, headers):
+            return Response(status_code=304, headers=headers)
+        job_data = await get_job_by_id(job_id)
         if not job_data:
             raise HTTPException(status_code=404, detail="Job not found")
-        return format_job(job_data)
+        return FastJSONResponse(job_payload(job_data), headers=headers)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid job ID")
     except Exception as e:
@@ -225,24 +395,91 @@ async def get_job_detail(job_id: int):
 async def create_new_job(job: JobCreate):
     try:
         job_data = job.model_dump(exclude={'salary', 'application_link'})
-        result = create_job(job_data)
-        if not result or not result['id']:
+        created_job = await create_job(job_data)
+        if not created_job:
             raise ValueError("Failed to create job")
-        created_job = get_job_by_id(result['id'])
         return format_job(created_job)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/jobs/import")
+async def import_jobs_feed(request: Request, format: str = "ndjson"):
+    """Bulk import jobs from an NDJSON or CSV request body, streamed in constant memory.
+
+    Each batch commits on its own: rows that fail validation are reported
+    per line and skipped, anything else stops the import, keeping the
+    batches already loaded. The report is returned either way, with a 500
+    and its error set if the import stopped.
+    """
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+    report = await import_jobs(aparse_records(aiter_lines(request.stream()), format))
+    if report.error:
+        return JSONResponse(status_code=500, content=report.as_dict())
+    return report.as_dict()
+
+def batch_operation(operation: BatchOperation):
+    """Validate one batch operation like the single-job endpoints; returns the dict run_job_batch expects"""
+    if operation.op == 'create':
+        job = JobCreate(**(operation.data or {}))
+        return {"op": "create", "data": job.model_dump(exclude={'salary', 'application_link'})}
+    if operation.id is None:
+        raise ValueError(f"{operation.op} needs an id")
+    if operation.op == 'update':
+        job = JobUpdate(**(operation.data or {}))
+        return {"op": "update", "id": operation.id,
+                "data": job.model_dump(exclude_unset=True, exclude={'salary', 'application_link'})}
+    return {"op": "delete", "id": operation.id}
+
+@app.post("/api/jobs/batch")
+async def batch_jobs(batch: JobBatch):
+    """Run up to JOBS_BATCH_MAX create/update/delete operations in one pipelined round trip.
+
+    With atomic=true (the default) any failure rolls back the whole batch;
+    with atomic=false only the failing operations are skipped. Results are
+    returned in operation order.
+    """
+    if len(batch.operations) > JOBS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"A batch can have at most {JOBS_BATCH_MAX} operations")
+    operations, invalid = [], {}
+    for index, operation in enumerate(batch.operations):
+        try:
+            operations.append(batch_operation(operation))
+        except (ValueError, TypeError) as e:
+            invalid[index] = {"status": "error", "error": str(e)}
+    try:
+        if invalid and batch.atomic:
+            results = [invalid.get(index, {"status": "not_applied"}) for index in range(len(batch.operations))]
+        else:
+            ran = iter(await run_job_batch(operations, atomic=batch.atomic))
+            results = [invalid[index] if index in invalid else next(ran) for index in range(len(batch.operations))]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    for index, (operation, result) in enumerate(zip(batch.operations, results)):
+        result.update({"index": index, "op": operation.op})
+        if "job" in result:
+            result["job"] = job_payload(result["job"])
+            result["id"] = result["job"]["id"]
+        elif operation.id is not None:
+            result["id"] = str(operation.id)
+    applied = sum(result["status"] in ("created", "updated", "deleted") for result in results)
+    return FastJSONResponse({
+        "atomic": batch.atomic,
+        "applied": applied,
+        "failed": sum(result["status"] == "error" for result in results),
+        "results": results,
+    })
+
 @app.put("/api/jobs/{job_id}", response_model=JobResponse)
 async def update_job_detail(job_id: int, job: JobUpdate):
     try:
         job_data = job.model_dump(exclude_unset=True, exclude={'salary', 'application_link'})
-        success = update_job(job_id, job_data)
-        if not success:
+        updated_job = await update_job(job_id, job_data)
+        if not updated_job:
             raise HTTPException(status_code=404, detail="Job not found")
-        updated_job = get_job_by_id(job_id)
         return format_job(updated_job)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid job ID")
@@ -252,7 +489,7 @@ async def update_job_detail(job_id: int, job: JobUpdate):
 @app.delete("/api/jobs/{job_id}")
 async def delete_job_detail(job_id: int):
     try:
-        success = delete_job(job_id)
+        success = await delete_job(job_id)
         if not success:
             raise HTTPException(status_code=404, detail="Job not found")
         return {"message": "Job deleted successfully"}
@@ -261,25 +498,100 @@ async def delete_job_detail(job_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/suggest")
+async def suggest(q: str, types: Optional[str] = None, limit: int = 8):
+    """Typeahead suggestions for titles, companies, skills and locations starting with `q`"""
+    try:
+        requested = tuple(t.strip() for t in types.split(',')) if types else SUGGESTION_TYPES
+        unknown = [t for t in requested if t not in SUGGESTION_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown suggestion type: {', '.join(unknown)}")
+        if not suggest_index.loaded:
+            await schedule_suggestion_refresh()
+        elif suggest_index.needs_rebuild() or suggest_index.needs_catch_up():
+            schedule_suggestion_refresh()
+        return {"query": q, "suggestions": suggest_index.suggest(q, types=requested, limit=min(max(limit, 1), 20))}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/stats/")
 async def get_statistics():
     try:
-        return get_job_stats()
+        return await get_job_stats()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/health")
 async def health_check():
+    replicas = db.replicas.stats() if db.replicas else None
+    if not db.ready():
+        return {"status": "unhealthy", "database": "connecting", "error": db.connect_error, "pool": db.pool_stats(),
+                "replicas": replicas, "circuit_breaker": db.breaker.stats()}
     try:
-        db.execute_query("SELECT 1")
-        return {"status": "healthy", "database": "connected"}
+        async with db.connection(fresh=True):  # the primary, even when reads go to replicas
+            await db.execute_query("SELECT 1")
+        return {"status": "healthy", "database": "connected", "pool": db.pool_stats(), "replicas": replicas,
+                "circuit_breaker": db.breaker.stats()}
     except Exception as e:
-        return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
+        return {"status": "unhealthy", "database": "disconnected", "error": str(e), "pool": db.pool_stats(),
+                "replicas": replicas, "circuit_breaker": db.breaker.stats()}
+
+READINESS_TIMEOUT = float(os.getenv('READINESS_TIMEOUT', 2))
+
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the pool has warmed up and whenever the primary can't be reached quickly.
+
+    Unlike /api/health it never waits on a slow database, and the status
+    code is the answer, so load balancers can route around a worker.
+    """
+    if not db.ready():
+        if db.breaker.state != "open":
+            db.start()  # retry if the startup attempts were used up
+        return JSONResponse({"ready": False, "database": "connecting", "error": db.connect_error},
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    if db.breaker.state == "open":
+        return JSONResponse({"ready": False, "database": "unreachable", "error": "circuit breaker open"},
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    try:
+        await db.ping(timeout=READINESS_TIMEOUT)
+    except Exception as e:
+        return JSONResponse({"ready": False, "database": "unreachable", "error": str(e)},
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"ready": True}
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Statement, route and pool metrics in the Prometheus text format.
+
+    With METRICS_MULTIPROC_DIR, those of every worker: counts are summed,
+    pool and circuit breaker stats are labelled by worker pid.
+    """
+    if db.metrics['enabled'] and db.metrics['multiproc_dir']:
+        def merged():
+            save_metrics()
+            combined, workers = combine_snapshots(db.metrics['multiproc_dir'])
+            return combined.render(workers=workers)
+        text = await asyncio.to_thread(merged)
+    else:
+        text = metrics.render(db.pool_stats() if db.pool else None, db.breaker.stats())
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def unavailable_response(error: DatabaseUnavailable):
+    """The circuit breaker is open: a 503 with Retry-After rather than a 500"""
+    return JSONResponse(status_code=503, content={"detail": str(error)},
+                        headers={"Retry-After": str(max(1, round(error.retry_after)))})
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
+    if isinstance(exc.__context__, DatabaseUnavailable):
+        return unavailable_response(exc.__context__)
     return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
+    if isinstance(exc, DatabaseUnavailable):
+        return unavailable_response(exc)
     return JSONResponse(status_code=500, content={"detail": "Internal server error"})
\ No newline at end of file
@@ -0,0 +1,105 @@
+import bisect
+import re
+from itertools import islice
+import time
+from cache import LRUCache
+
+SUGGESTION_TYPES = ('title', 'company', 'skill', 'location')
+
+_WORD_SPLIT = re.compile(r"[\s/,()\-]+")
+
+def normalize(text):
+    """Lowercase and collapse separators so prefixes compare consistently"""
+    return ' '.join(w for w in _WORD_SPLIT.split((text or '').lower()) if w)
+
+class SuggestIndex:
+    """In-memory prefix index over job titles, companies, skills and locations.
+
+    Every word start of a term is a key in one sorted list, so "dev" finds
+    "Senior Python Developer". A lookup is a bisect plus a short scan. The
+    index is filled from the database by rebuild() and topped up with jobs
+    posted since then by merge(); deactivated jobs drop out on the next rebuild.
+    """
+
+    # Keys scanned per lookup; bounds the cost of one or two letter prefixes
+    MAX_SCAN = 20000
+
+    def __init__(self, rebuild_seconds=600, catch_up_seconds=10):
+        self.rebuild_seconds = rebuild_seconds
+        self.catch_up_seconds = catch_up_seconds
+        self.loaded = False
+        self.last_id = 0
+        self.rebuilt_at = 0.0
+        self.caught_up_at = 0.0
+        self._entries = []
+        self._counts = {}
+        self._results = LRUCache(maxsize=2048)
+
+    def needs_rebuild(self):
+        return not self.loaded or time.monotonic() - self.rebuilt_at > self.rebuild_seconds
+
+    def needs_catch_up(self):
+        return time.monotonic() - self.caught_up_at > self.catch_up_seconds
+
+    def rebuild(self, rows, last_id):
+        """Replace the index with aggregated (type, label, count) rows"""
+        counts = {}
+        for row in rows:
+            key = (row['type'], row['label'])
+            counts[key] = counts.get(key, 0) + row['count']
+        entries = sorted(entry for kind, label in counts for entry in self._keys(kind, label))
+        self._entries, self._counts = entries, counts
+        self.last_id = last_id
+        self.loaded = True
+        self.rebuilt_at = self.caught_up_at = time.monotonic()
+        self._results.clear()
+
+    def merge(self, rows, last_id):
+        """Add counts for jobs newer than the last rebuild or merge"""
+        for row in rows:
+            self.add(row['type'], row['label'], row['count'])
+        self.last_id = max(self.last_id, last_id)
+        self.caught_up_at = time.monotonic()
+
+    def add(self, kind, label, count=1):
+        if not label:
+            return
+        key = (kind, label)
+        if key not in self._counts:
+            self._counts[key] = 0
+            for entry in self._keys(kind, label):
+                bisect.insort(self._entries, entry)
+        self._counts[key] += count
+        self._results.clear()
+
+    def suggest(self, prefix, types=SUGGESTION_TYPES, limit=8):
+        """Top suggestions starting with prefix: whole-term matches first, then by job count"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        cache_key = (prefix, tuple(types), limit)
+        cached = self._results.get(cache_key)
+        if cached is not None:
+            return cached
+
+        matches = set()
+        start = bisect.bisect_left(self._entries, (prefix,))
+        for key, kind, label in islice(self._entries, start, start + self.MAX_SCAN):
+            if not key.startswith(prefix):
+                break
+            if kind in types:
+                matches.add((kind, label))
+
+        ranked = sorted(
+            matches,
+            key=lambda m: (not normalize(m[1]).startswith(prefix), -self._counts[m], len(m[1]), m[1])
+        )
+        result = [{"text": label, "type": kind, "count": self._counts[(kind, label)]}
+                  for kind, label in ranked[:limit]]
+        self._results.set(cache_key, result)
+        return result
+
+    @staticmethod
+    def _keys(kind, label):
+        words = normalize(label).split(' ')
+        return [(' '.join(words[i:]), kind, label) for i in range(len(words)) if words[i]]
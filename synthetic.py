@@ -0,0 +1,138 @@
+import bisect
+import itertools
+import random
+from datetime import datetime, timedelta
+
+# Deterministic synthetic job data for benchmarks and staging databases.
+# Records have the shape importer.staging_row accepts (the POST /api/jobs/
+# fields plus posted_at), so they can go through the regular import path;
+# db.seed_jobs COPYs them straight into jobs instead. The same seed and `now`
+# always produce the same jobs.
+
+CITIES = [
+    ("Nairobi", 40), ("Mombasa", 10), ("Kisumu", 6), ("Nakuru", 5), ("Eldoret", 4),
+    ("Thika", 3), ("Machakos", 2), ("Nyeri", 2), ("Kakamega", 1), ("Malindi", 1),
+    ("Remote", 15),
+]
+
+CATEGORIES = {
+    "Engineering": ["Python", "Django", "FastAPI", "PostgreSQL", "JavaScript", "React", "Go", "Docker", "AWS", "Kubernetes"],
+    "Data": ["Python", "SQL", "Pandas", "Spark", "Airflow", "Power BI", "Machine Learning", "Statistics"],
+    "Design": ["Figma", "UX Research", "Prototyping", "Illustrator", "Design Systems"],
+    "Marketing": ["SEO", "Content", "Google Ads", "Social Media", "Analytics", "Copywriting"],
+    "Sales": ["B2B Sales", "CRM", "Negotiation", "Salesforce", "Lead Generation"],
+    "Finance": ["Excel", "IFRS", "QuickBooks", "Audit", "Tax", "Financial Modelling"],
+    "Customer Support": ["Zendesk", "Communication", "Swahili", "Troubleshooting"],
+    "Operations": ["Logistics", "Procurement", "Excel", "Project Management", "Supply Chain"],
+    "Healthcare": ["Nursing", "Patient Care", "Pharmacy", "Clinical Research"],
+    "Education": ["Teaching", "Curriculum", "Mathematics", "Sciences", "Mentoring"],
+}
+CATEGORY_WEIGHTS = [30, 10, 6, 10, 10, 8, 8, 8, 5, 5]
+
+ROLES = {
+    "Engineering": ["Software Engineer", "Backend Developer", "Frontend Developer", "DevOps Engineer", "Mobile Developer"],
+    "Data": ["Data Analyst", "Data Engineer", "Data Scientist", "BI Developer"],
+    "Design": ["Product Designer", "UI/UX Designer", "Graphic Designer"],
+    "Marketing": ["Marketing Manager", "Digital Marketer", "Content Strategist"],
+    "Sales": ["Sales Executive", "Account Manager", "Business Development Officer"],
+    "Finance": ["Accountant", "Financial Analyst", "Auditor"],
+    "Customer Support": ["Customer Support Agent", "Call Centre Agent", "Support Lead"],
+    "Operations": ["Operations Manager", "Procurement Officer", "Logistics Coordinator"],
+    "Healthcare": ["Nurse", "Pharmacist", "Clinical Officer"],
+    "Education": ["Teacher", "Lecturer", "Tutor"],
+}
+LEVELS = [("Junior", 0.6, 25), ("", 1.0, 45), ("Senior", 1.7, 22), ("Lead", 2.4, 8)]
+JOB_TYPES = [("full-time", 70), ("contract", 12), ("part-time", 8), ("internship", 6), ("temporary", 4)]
+
+COMPANY_PREFIXES = ["Safari", "Savannah", "Kilima", "Jamii", "Tana", "Rift", "Baraka", "Amani", "Simba",
+                    "Mara", "Pwani", "Zuri", "Nyota", "Umoja", "Tembo", "Faraja"]
+COMPANY_SUFFIXES = ["Technologies", "Digital", "Solutions", "Systems", "Labs", "Holdings", "Group",
+                    "Africa", "Networks", "Logistics", "Health", "Capital", "Foods", "Energy"]
+
+def company_names(count, seed=42):
+    """count distinct company names, the same for a given seed"""
+    pairs = [f"{prefix} {suffix}" for prefix in COMPANY_PREFIXES for suffix in COMPANY_SUFFIXES]
+    random.Random(seed).shuffle(pairs)
+    return [pairs[i % len(pairs)] + (f" {i // len(pairs) + 1}" if i >= len(pairs) else '')
+            for i in range(count)]
+
+def company_weights(count):
+    """Zipf-like posting volume: a few large employers, a long tail of small ones"""
+    return [1 / (rank + 1) for rank in range(count)]
+
+def job_location(city):
+    """Location string for a synthetic city, as POST /api/jobs/ takes it"""
+    return "Remote" if city == "Remote" else f"{city}, Kenya"
+
+def _picker(rng, choices, weights):
+    """Weighted choice without random.choices' per-call overhead, which dominates at a million rows"""
+    cum_weights = list(itertools.accumulate(weights))
+    total, random_ = cum_weights[-1], rng.random
+    return lambda: choices[bisect.bisect(cum_weights, random_() * total)]
+
+SYNTHETIC_BLOCK_SIZE = 10000
+
+def synthetic_jobs(count, companies=500, seed=42, days=365, now=None, start=0, stop=None):
+    """Yield jobs start..stop of a deterministic count-job dataset spread over the `days` days up to now, oldest first.
+
+    now defaults to the current time; pass the same now (and seed) for the
+    same posting dates, e.g. when generating one dataset in several pieces.
+
+    The random generator is reseeded every SYNTHETIC_BLOCK_SIZE jobs, so any
+    slice comes out the same whether the dataset is generated in one go or
+    in parallel pieces.
+    """
+    rng = random.Random(seed)
+    random_ = rng.random
+    names = company_names(companies, seed)
+    # A fixed pool of 2-5 tag combinations per category, drawn from per job
+    tag_sets = {category: [rng.sample(skills, k=rng.randint(2, min(5, len(skills)))) for _ in range(64)]
+                for category, skills in CATEGORIES.items()}
+    pick_company = _picker(rng, names, company_weights(len(names)))
+    pick_category = _picker(rng, list(CATEGORIES), CATEGORY_WEIGHTS)
+    pick_level = _picker(rng, [(level, multiplier) for level, multiplier, _ in LEVELS], [w for _, _, w in LEVELS])
+    pick_city = _picker(rng, [city for city, _ in CITIES], [w for _, w in CITIES])
+    pick_type = _picker(rng, [job_type for job_type, _ in JOB_TYPES], [w for _, w in JOB_TYPES])
+    bases = [40000, 60000, 80000, 100000, 150000]
+    now = now or datetime.now().replace(microsecond=0)
+    first_posted = now - timedelta(days=days)
+    step = days * 86400 / max(count, 1)
+
+    def job(i):
+        category = pick_category()
+        level, multiplier = pick_level()
+        roles = ROLES[category]
+        title = f"{level} {roles[int(random_() * len(roles))]}".strip()
+        company = pick_company()
+        city = pick_city()
+        tags = tag_sets[category][int(random_() * 64)]
+        base = bases[int(random_() * len(bases))]
+        salary_min = round(base * multiplier, -3)
+        listed_salary = random_() < 0.7
+        return {
+            "title": title,
+            "company": company,
+            "location": job_location(city),
+            "type": pick_type(),
+            "category": category,
+            "description": (f"{company} is hiring a {title.lower()} to join its {category.lower()} team "
+                            f"{'remotely' if city == 'Remote' else 'in ' + city}. You will work with "
+                            f"{', '.join(tags[:-1])} and {tags[-1]} day to day, own your deliverables "
+                            "end to end and help grow the team."),
+            "requirements": f"{int(random_() * 9)}+ years of experience; strong {tags[0]} skills",
+            "salary_min": salary_min if listed_salary else None,
+            "salary_max": salary_min + round(base * (0.1 + random_() / 2), -3) if listed_salary else None,
+            "salary_currency": "KSh",
+            "tags": tags,
+            "application_email": f"jobs@{company.split()[0].lower()}.co.ke",
+            "posted_at": (first_posted + timedelta(seconds=int(step * i + random_() * 3600))).isoformat(),
+        }
+
+    stop = count if stop is None else min(stop, count)
+    for i in range(start, stop):
+        if i == start or i % SYNTHETIC_BLOCK_SIZE == 0:
+            block_start = i - i % SYNTHETIC_BLOCK_SIZE
+            rng.seed(f"{seed}:{block_start}")
+            for skipped in range(block_start, i):  # replay up to i within its block
+                job(skipped)
+        yield job(i)
@@ -0,0 +1,43 @@
+"""run_job_batch against a real database, which these tests write to: set
+TEST_DATABASE_DSN to a migrated scratch database to run them."""
+import asyncio
+import os
+
+import pytest
+
+import async_db
+from async_db import AsyncDatabase, run_job_batch
+
+pytestmark = pytest.mark.skipif(not os.getenv('TEST_DATABASE_DSN'), reason="TEST_DATABASE_DSN is not set")
+
+def job(title, **changes):
+    return {'title': title, 'description': 'd', 'requirements': 'r', 'company': 'Batch Test Co',
+            'location': 'Nairobi, Kenya', 'salary_min': 1000, 'salary_max': 2000, **changes}
+
+# Valid for run_job_batch, but too large for DECIMAL(10, 2), so only the database rejects it
+OVERFLOW = job('Overflow', salary_min=10 ** 9, salary_max=10 ** 9)
+
+def run(operations, atomic, monkeypatch):
+    async def batch():
+        monkeypatch.setattr(async_db, 'db', AsyncDatabase(primary=os.environ['TEST_DATABASE_DSN'], replicas=[]))
+        await async_db.db.connect()
+        try:
+            results = await run_job_batch(operations, atomic=atomic)
+            created = [result['job']['id'] for result in results if result['status'] == 'created']
+            if created:
+                await async_db.db.execute_update("DELETE FROM jobs WHERE id = ANY(%s)", (created,))
+            return results
+        finally:
+            await async_db.db.close()
+    return asyncio.run(batch())
+
+def test_failed_operation_is_skipped_when_not_atomic(monkeypatch):
+    results = run([{'op': 'create', 'data': job('First')}, {'op': 'create', 'data': OVERFLOW},
+                   {'op': 'create', 'data': job('Third')}], False, monkeypatch)
+    assert [result['status'] for result in results] == ['created', 'error', 'created']
+    assert 'numeric field overflow' in results[1]['error']
+
+def test_failed_operation_rolls_back_an_atomic_batch(monkeypatch):
+    results = run([{'op': 'create', 'data': job('First')}, {'op': 'create', 'data': job('Second')},
+                   {'op': 'create', 'data': OVERFLOW}], True, monkeypatch)
+    assert [result['status'] for result in results] == ['not_applied', 'not_applied', 'error']
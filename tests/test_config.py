@@ -0,0 +1,23 @@
+from config import connect_backoff, summarize_pool_stats
+
+def test_connect_backoff_doubles_up_to_max():
+    settings = {'backoff': 0.5, 'backoff_max': 3.0}
+    assert [connect_backoff(settings, attempt) for attempt in range(1, 6)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+def test_summarize_pool_stats():
+    stats = summarize_pool_stats({
+        'pool_min': 2, 'pool_max': 10, 'pool_size': 6, 'pool_available': 2, 'requests_waiting': 1,
+        'requests_num': 4, 'requests_wait_ms': 10, 'requests_errors': 1, 'connections_num': 7,
+    })
+    assert stats['in_use'] == 4
+    assert stats['available'] == 2
+    assert stats['waiting'] == 1
+    assert stats['wait_ms_avg'] == 2.5
+    assert stats['timeouts'] == 1
+    assert stats['connections_opened'] == 7
+    assert stats['connections_lost'] == 0
+
+def test_summarize_empty_pool_stats():
+    stats = summarize_pool_stats({})
+    assert stats['in_use'] == 0
+    assert stats['wait_ms_avg'] == 0
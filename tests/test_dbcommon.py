@@ -0,0 +1,29 @@
+from dbcommon import DimensionCache
+from queries import build_job_insert
+
+JOB = {'company': 'Acme', 'category': 'Engineering', 'location': 'Oslo, Norway'}
+
+def test_dimension_cache_misses_become_upserts():
+    upserts, cached = DimensionCache().resolve(JOB)
+    assert set(upserts) == {'company_id', 'category_id', 'location_id'}
+    assert cached == {}
+
+def test_cached_dimension_ids_are_checked_against_their_names():
+    dimensions = DimensionCache()
+    dimensions.remember(JOB, {'company_id': 7, 'category_id': 3, 'location_id': 12})
+    upserts, cached = dimensions.resolve(JOB)
+    assert upserts == {}
+    assert cached == {'company_id': (7, 'Acme'), 'category_id': (3, 'Engineering'),
+                      'location_id': (12, 'Oslo', 'Norway')}
+
+    query, params = build_job_insert({'title': 'Engineer'}, upserts, cached)
+    # A reused id that now names another row becomes -1, which fails the foreign key
+    assert "COALESCE((SELECT id FROM companies WHERE id = %s AND name = %s), -1)" in query
+    assert "_upsert" not in query
+    assert params == ('Engineer', 7, 'Acme', 3, 'Engineering', 12, 'Oslo', 'Norway')
+
+def test_clear_forgets_cached_ids():
+    dimensions = DimensionCache()
+    dimensions.remember(JOB, {'company_id': 7, 'category_id': 3, 'location_id': 12})
+    dimensions.clear()
+    assert dimensions.resolve(JOB)[1] == {}
@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from importer import CsvRecordAssembler, ImportReport, parse_records, staging_months, staging_row
+
+RECORD = {
+    'title': ' Python Developer ', 'company': 'Acme', 'location': 'Nairobi, Kenya',
+    'description': 'Build things', 'salary': 'KSh 80,000 - 120,000', 'tags': 'Python, Django',
+    'category': 'Software Engineering', 'posted_at': '2026-03-14T09:30:00',
+}
+
+def test_staging_row():
+    row = staging_row(7, RECORD)
+    assert row == (
+        7, 'Python Developer', 'Build things', '', 'full-time', 80000.0, 120000.0, 'KSh',
+        json.dumps(['Python', 'Django']), 'Acme', 'Nairobi', 'Kenya', False,
+        'Software Engineering', 'software-engineering', '', '', datetime(2026, 3, 14, 9, 30),
+    )
+
+def test_staging_row_defaults():
+    row = staging_row(1, {'title': 'Dev', 'company': 'Acme', 'location': 'Remote', 'description': 'd',
+                          'tags': ['Go', ' ', 'Rust']})
+    assert row[8] == json.dumps(['Go', 'Rust'])
+    assert row[10:13] == ('Remote', 'Kenya', True)
+    assert row[13:15] == ('General', 'general')
+    assert row[-1] is None
+
+@pytest.mark.parametrize("changes, message", [
+    ({'title': ''}, "Missing required field"),
+    ({'company': 'x' * 256}, "company is longer than 255"),
+    ({'job_type': 'x' * 51}, "job_type is longer than 50"),
+    ({'application_link': 'x' * 501}, "application_url is longer than 500"),
+    ({'salary_min': 5000, 'salary_max': 10}, "salary_max must be greater"),
+    ({'salary_min': -1}, "Salary out of range"),
+    ({'posted_at': 'yesterday'}, "Invalid isoformat"),
+])
+def test_staging_row_rejects(changes, message):
+    with pytest.raises(ValueError, match=message):
+        staging_row(1, {**RECORD, **changes})
+
+def test_staging_row_unreadable_record():
+    with pytest.raises(ValueError, match="Unreadable record"):
+        staging_row(1, ValueError("bad json"))
+
+def test_staging_row_stores_offsets_in_utc():
+    row = staging_row(1, {**RECORD, 'posted_at': '2026-03-14T09:30:00+03:00'})
+    assert row[-1] == datetime(2026, 3, 14, 6, 30)
+
+def test_csv_record_spanning_lines():
+    lines = ['title,description,company\n', 'Dev,"First line\n', 'second, with ""quotes""",Acme\n', 'Ops,Short,Acme\n']
+    records = list(parse_records(lines, 'csv'))
+    assert records == [
+        (3, {'title': 'Dev', 'description': 'First line\nsecond, with "quotes"', 'company': 'Acme'}),
+        (4, {'title': 'Ops', 'description': 'Short', 'company': 'Acme'}),
+    ]
+
+def test_csv_record_with_wrong_column_count():
+    assembler = CsvRecordAssembler()
+    assembler.feed('title,company\n')
+    with pytest.raises(ValueError, match="Expected 2 columns, got 3"):
+        assembler.feed('Dev,Acme,extra\n')
+
+def test_import_report_keeps_the_error_that_stopped_it():
+    report = ImportReport()
+    report.imported = 10
+    report.add_error(3, "Missing required field(s): title")
+    report.error = "connection lost"
+    summary = report.as_dict()
+    assert (summary['imported'], summary['failed'], summary['error']) == (10, 1, "connection lost")
+    assert summary['errors'] == [{"line": 3, "error": "Missing required field(s): title"}]
+
+def test_staging_months():
+    rows = [staging_row(1, RECORD), staging_row(2, {**RECORD, 'posted_at': '2026-03-01'}),
+            staging_row(3, {**RECORD, 'posted_at': '2025-12-31T23:59:59'}), staging_row(4, {**RECORD, 'posted_at': ''})]
+    assert staging_months(rows) == {datetime(2026, 3, 1).date(), datetime(2025, 12, 1).date()}
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from metrics import Metrics, combine_snapshots, fingerprint, is_read_only, write_snapshot
+from queries import ENSURE_JOB_PARTITIONS, JOB_PARTITIONS, LEFTOVER_JOB_TABLES, LOCK_JOB_PARTITIONS, SET_LOCK_TIMEOUT
+
+POOL = {"size": 2, "in_use": 1, "available": 1, "waiting": 0, "max_size": 4, "requests": 10, "timeouts": 0,
+        "connections_opened": 2, "connection_errors": 0, "connections_lost": 0}
+BREAKER = {"state": "closed", "failures": 0, "opens": 1, "rejected": 3}
+
+def test_fingerprint_normalizes_literals():
+    query_id, normalized = fingerprint("SELECT *  FROM jobs -- listing\nWHERE id IN (1, 2, 3) AND title = 'it''s' AND x = %s")
+    assert normalized == "SELECT * FROM jobs WHERE id IN (?) AND title = ? AND x = ?"
+    assert query_id == fingerprint("SELECT * FROM jobs WHERE id IN (4, 5) AND title = 'x' AND x = %s")[0]
+    assert len(query_id) == 12
+
+def test_fingerprint_tells_statements_apart():
+    assert fingerprint("SELECT id FROM jobs")[0] != fingerprint("SELECT id FROM companies")[0]
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT * FROM jobs WHERE id = %s", True),
+    ("WITH recent AS (SELECT id FROM jobs) SELECT * FROM recent", True),
+    ("UPDATE jobs SET is_active = FALSE", False),
+    ("WITH moved AS (DELETE FROM jobs RETURNING *) SELECT * FROM moved", False),
+    ("EXPLAIN DELETE FROM jobs", True),
+    ("EXPLAIN ANALYZE SELECT * FROM jobs", True),
+    ("EXPLAIN ANALYZE DELETE FROM jobs", False),
+    ("EXPLAIN (ANALYZE, BUFFERS) UPDATE jobs SET title = 'x'", False),
+    ("EXPLAIN (ANALYZE false) DELETE FROM jobs", True),
+    (JOB_PARTITIONS, True),
+    (LEFTOVER_JOB_TABLES, True),
+    (ENSURE_JOB_PARTITIONS, False),
+    (LOCK_JOB_PARTITIONS, False),
+    (SET_LOCK_TIMEOUT, False),
+])
+def test_is_read_only(query, expected):
+    assert is_read_only(fingerprint(query)[1]) is expected
+
+def worker_metrics():
+    worker = Metrics()
+    worker.observe_query("SELECT * FROM jobs WHERE id = %s", 0.003, rows=1)
+    worker.observe_request("GET", "/api/jobs/{job_id}", 200, 0.004)
+    worker.observe_read_retry()
+    return worker
+
+def test_snapshots_of_workers_add_up(tmp_path):
+    for pid in (4194305, 4194306):  # above any pid Linux hands out
+        write_snapshot(tmp_path, {**worker_metrics().snapshot(POOL, BREAKER), "pid": pid})
+    write_snapshot(tmp_path, worker_metrics().snapshot(POOL, BREAKER))  # this process, still running
+    combined, running = combine_snapshots(tmp_path)
+
+    query_id = fingerprint("SELECT * FROM jobs WHERE id = %s")[0]
+    assert combined.queries[query_id][1].count == 3
+    assert combined.responses[("GET", "/api/jobs/{job_id}", 200)] == 3
+    assert combined.read_retries == 3
+    # Exited workers count towards the sums, but only running ones report their pool
+    assert [snapshot['pid'] for snapshot in running] == [os.getpid()]
+    text = combined.render(workers=running)
+    assert f'jobs_db_pool_in_use{{worker="{os.getpid()}"}} 1' in text
+    assert f'jobs_db_circuit_rejected_total{{worker="{os.getpid()}"}} 3' in text
+    assert 'jobs_db_read_retries_total 3' in text
+
+def test_single_process_render_has_no_worker_label():
+    text = worker_metrics().render(POOL, BREAKER)
+    assert "jobs_db_pool_in_use 1" in text and "worker=" not in text
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from queries import (
+    build_job_facets, build_job_insert, build_job_update, build_jobs_count_query, build_jobs_query, build_tsquery,
+    decode_cursor, encode_cursor, job_update_fields, jobs_total, paginate_jobs
+)
+
+JOB = {'id': 42, 'posted_at': datetime(2026, 3, 14, 9, 30)}
+
+@pytest.mark.parametrize("search, expected", [
+    ('sen "python developer"', 'sen:* & (python <-> developer)'),
+    ('c++ back-end', 'c:* & back:* & end:*'),
+    ('"" !!', ''),
+    (None, ''),
+])
+def test_build_tsquery(search, expected):
+    assert build_tsquery(search) == expected
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(JOB, 'next')
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == {"posted_at": JOB['posted_at'], "id": 42, "rank": None, "direction": "next"}
+
+def test_cursor_bounds_posted_at_for_pruning():
+    query, params = build_jobs_query(limit=10, cursor=encode_cursor(JOB, 'next'))
+    assert "(j.posted_at, j.id) < (%s, %s) AND j.posted_at <= %s ORDER BY posted_at DESC, id DESC" in query
+    assert params[-4:] == (JOB['posted_at'], 42, JOB['posted_at'], 11)
+
+    query, _ = build_jobs_query(limit=10, cursor=encode_cursor(JOB, 'prev'))
+    assert "AND j.posted_at >= %s ORDER BY posted_at ASC" in query
+
+def test_cursor_keeps_search_rank():
+    assert decode_cursor(encode_cursor({**JOB, 'rank': 0.25}, 'prev'))['rank'] == 0.25
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", encode_cursor(JOB, 'sideways'), "eyJpIjoxfQ"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+def test_cursor_must_match_search():
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        build_jobs_query(search="python", cursor=encode_cursor(JOB, 'next'))
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        build_jobs_query(cursor=encode_cursor({**JOB, 'rank': 0.5}, 'next'))
+
+# 23 jobs, two to a posted_at so the id breaks ties, listed newest first
+JOBS = sorted(({'id': n, 'posted_at': datetime(2026, 1, 1) + timedelta(hours=n // 2)} for n in range(1, 24)),
+              key=lambda job: (job['posted_at'], job['id']), reverse=True)
+
+def fetch_page(limit, cursor=None):
+    """What build_jobs_query's keyset query returns for JOBS: limit + 1 rows past the cursor"""
+    if cursor is None:
+        return JOBS[:limit + 1]
+    seek = decode_cursor(cursor)
+    key = (seek['posted_at'], seek['id'])
+    if seek['direction'] == 'next':
+        return [job for job in JOBS if (job['posted_at'], job['id']) < key][:limit + 1]
+    return [job for job in reversed(JOBS) if (job['posted_at'], job['id']) > key][:limit + 1]
+
+def test_keyset_pages_walk_forward_and_back():
+    pages, cursor = [], None
+    while True:
+        page = paginate_jobs(fetch_page(5, cursor), 5, cursor=cursor)
+        pages.append(page)
+        if not page['next_cursor']:
+            break
+        cursor = page['next_cursor']
+    assert [job for page in pages for job in page['jobs']] == JOBS
+    assert [len(page['jobs']) for page in pages] == [5, 5, 5, 5, 3]
+    assert pages[0]['prev_cursor'] is None
+
+    for previous, page in zip(reversed(pages[:-1]), reversed(pages[1:])):
+        back = paginate_jobs(fetch_page(5, page['prev_cursor']), 5, cursor=page['prev_cursor'])
+        assert back['jobs'] == previous['jobs']
+        assert back['next_cursor'] is not None
+    first = paginate_jobs(fetch_page(5, pages[1]['prev_cursor']), 5, cursor=pages[1]['prev_cursor'])
+    assert first['prev_cursor'] is None
+
+def test_offset_page_links():
+    page = paginate_jobs(JOBS[5:11], 5, page=2)
+    assert page['jobs'] == JOBS[5:10]
+    assert decode_cursor(page['next_cursor'])['id'] == JOBS[9]['id']
+    assert decode_cursor(page['prev_cursor'])['direction'] == 'prev'
+    assert paginate_jobs([], 5, cursor=encode_cursor(JOB, 'next')) == {"jobs": [], "next_cursor": None, "prev_cursor": None}
+
+def estimate(rows):
+    return [{'QUERY PLAN': [{'Plan': {'Plan Rows': rows}}]}]
+
+def test_jobs_total_is_exact_up_to_the_cap():
+    assert jobs_total([{'count': 0}], cap=100) == {"count": 0, "exact": True}
+    assert jobs_total([{'count': 100}], cap=100, estimate_rows=estimate(5)) == {"count": 100, "exact": True}
+
+def test_jobs_total_falls_back_to_the_estimate():
+    assert jobs_total([{'count': 101}], cap=100, estimate_rows=estimate(25000)) == {"count": 25000, "exact": False}
+    # An estimate below what was already counted is not believed
+    assert jobs_total([{'count': 101}], cap=100, estimate_rows=estimate(40)) == {"count": 101, "exact": False}
+    assert jobs_total([{'count': 101}], cap=100) == {"count": 101, "exact": False}
+
+def test_count_query_stops_after_the_cap():
+    query, params = build_jobs_count_query(search="python", cap=100)
+    assert "LIMIT %s" in query
+    assert params == ("python:*", 101)
+
+def test_job_update_fields():
+    fields = job_update_fields({'title': 'Lead', 'type': 'contract', 'tags': 'Go, Rust', 'company': 'Acme'})
+    assert fields == {'title': 'Lead', 'job_type': 'contract', 'skills_required': '["Go", "Rust"]'}
+
+def test_job_update_upserts_and_returns_the_joined_row():
+    query, params = build_job_update(42, {'title': 'Lead'}, {'company_id': ('Acme',)})
+    # The upsert runs first in the same statement and the update reads its id
+    assert query.index("company_id_upsert AS (") < query.index("written AS (UPDATE jobs SET")
+    assert "company_id = (SELECT id FROM company_id_upsert)" in query
+    assert "FROM written j" in query and "JOIN company_id_upsert c ON" in query
+    assert "WHERE id = %s AND is_active = TRUE RETURNING *" in query
+    assert params == ('Acme', 'Lead', 42)
+    assert query.count('%s') == len(params)
+
+def test_job_insert_joins_the_tables_it_did_not_upsert():
+    query, params = build_job_insert({'title': 'Dev', 'description': 'd'}, {'category_id': ('Data', 'data')})
+    assert "INSERT INTO jobs (title, description, category_id) VALUES (%s, %s, (SELECT id FROM category_id_upsert))" in query
+    assert "JOIN companies c ON" in query and "LEFT JOIN category_id_upsert cat ON" in query
+    assert params == ('Data', 'data', 'Dev', 'd')
+
+def test_build_job_facets():
+    rows = [
+        {'facet': 'category', 'value': 'Design', 'count': 2},
+        {'facet': 'category', 'value': 'Engineering', 'count': 5},
+        {'facet': 'location', 'value': None, 'count': 3},
+        {'facet': 'type', 'value': 'full-time', 'count': 6},
+        {'facet': 'tag', 'value': 'Python', 'count': 4},
+        {'facet': 'tag', 'value': 'Django', 'count': 4},
+        {'facet': 'total', 'value': None, 'count': 7},
+    ]
+    facets, total = build_job_facets(rows)
+    assert total == 7
+    assert list(facets['categories'].items()) == [('Engineering', 5), ('Design', 2)]
+    assert facets['locations'] == {}
+    assert facets['types'] == {'full-time': 6}
+    assert list(facets['tags']) == ['Django', 'Python']
+
+def test_build_job_facets_without_rows():
+    assert build_job_facets([]) == ({"categories": {}, "locations": {}, "types": {}, "tags": {}}, 0)
@@ -0,0 +1,65 @@
+import pytest
+
+from dbcommon import BaseDatabase
+from replicas import ReadSession, ReplicaSet, current_session, format_lsn, parse_lsn
+
+@pytest.mark.parametrize("lsn, expected", [
+    ('0/0', 0),
+    ('16/B374D848', (0x16 << 32) + 0xB374D848),
+    ('', None),
+    (None, None),
+    ('not an lsn', None),
+])
+def test_parse_lsn(lsn, expected):
+    assert parse_lsn(lsn) == expected
+
+def test_lsns_compare_across_the_high_half():
+    assert parse_lsn('1/0') > parse_lsn('0/FFFFFFFF')
+    assert format_lsn(parse_lsn('16/B374D848')) == '16/B374D848'
+
+def replica_set(*replay_lsns):
+    replicas = ReplicaSet([f"host=replica{n}" for n in range(len(replay_lsns))])
+    for replica, replay_lsn in zip(replicas, replay_lsns):
+        replica.healthy, replica.replay_lsn = True, parse_lsn(replay_lsn)
+    return replicas
+
+def test_choose_round_robin():
+    replicas = replica_set('0/10', '0/10')
+    assert [replicas.choose().name for _ in range(4)] == ['replica1', 'replica2', 'replica1', 'replica2']
+
+def test_choose_only_replicas_that_replayed_min_lsn():
+    replicas = replica_set('0/10', '0/20')
+    assert {replicas.choose(parse_lsn('0/18')).name for _ in range(4)} == {'replica2'}
+    assert replicas.choose(parse_lsn('0/30')) is None
+
+def test_choose_skips_evicted_replicas():
+    replicas = replica_set('0/10', '0/10')
+    replicas.record_failure(replicas.replicas[0], OSError("connection refused"))
+    assert {replicas.choose().name for _ in range(4)} == {'replica2'}
+
+@pytest.fixture
+def session():
+    session = ReadSession()
+    token = current_session.set(session)
+    yield session
+    current_session.reset(token)
+
+def test_session_reads_stay_on_one_replica(session):
+    db = BaseDatabase(primary="host=primary", replicas=["host=replica1", "host=replica2"])
+    for replica in db.replicas:
+        replica.healthy = True
+    first = db._read_replica()
+    assert first is not None
+    assert all(db._read_replica() is first for _ in range(4))
+
+    # Evicted: the rest of the session reads from the primary, even once it is back
+    first.healthy = False
+    assert db._read_replica() is None
+    first.healthy = True
+    assert db._read_replica() is None
+
+def test_session_reads_from_the_primary_after_a_write(session):
+    db = BaseDatabase(primary="host=primary", replicas=["host=replica1"])
+    db.replicas.replicas[0].healthy = True
+    db.mark_written()
+    assert db._read_replica() is None
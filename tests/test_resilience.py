@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, DatabaseUnavailable
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_opens_after_threshold_failures(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=5)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.before_call()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(DatabaseUnavailable) as error:
+        breaker.before_call()
+    assert error.value.retry_after == 5
+    assert breaker.stats() == {"state": "open", "failures": 3, "opens": 1, "rejected": 1}
+
+def test_success_resets_failures(clock):
+    breaker = CircuitBreaker(threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=5)
+    breaker.record_failure()
+    clock[0] += 5
+    assert breaker.state == "half-open"
+    breaker.before_call()
+    with pytest.raises(DatabaseUnavailable):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+def test_failed_trial_opens_again(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=5)
+    breaker.record_failure()
+    clock[0] += 6
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opens == 2
+
+def test_stuck_trial_is_replaced_after_cooldown(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=5)
+    breaker.record_failure()
+    clock[0] += 5
+    breaker.before_call()
+    clock[0] += 5
+    breaker.before_call()
+
+def test_trip_opens_at_once(clock):
+    breaker = CircuitBreaker(threshold=5, cooldown=5)
+    breaker.trip()
+    assert breaker.state == "open"
+    with pytest.raises(DatabaseUnavailable):
+        breaker.before_call()
+
+@pytest.fixture
+def database_down(monkeypatch):
+    """The app's database replaced by one whose primary refuses connections"""
+    import async_db
+    import server
+    monkeypatch.setenv('DATABASE_CONNECT_TIMEOUT', '0.2')
+    monkeypatch.setenv('DATABASE_CONNECT_RETRIES', '2')
+    monkeypatch.setenv('DATABASE_CONNECT_BACKOFF', '0.1')
+    monkeypatch.setenv('DATABASE_BREAKER_COOLDOWN', '30')
+    down = async_db.AsyncDatabase(primary="host=127.0.0.1 port=9 connect_timeout=1", replicas=[])
+    monkeypatch.setattr(async_db, 'db', down)
+    monkeypatch.setattr(server, 'db', down)
+    return server.app
+
+def test_requests_fail_fast_with_503_while_the_database_is_down(database_down):
+    from fastapi.testclient import TestClient
+    with TestClient(database_down) as client:
+        # The first request waits for the connect attempts to run out, which opens the breaker
+        response = client.get("/api/jobs/1")
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+
+        started = time.monotonic()
+        for _ in range(3):
+            assert client.get("/api/jobs/").status_code == 503
+        assert time.monotonic() - started < 0.5  # no new connect attempts
+        assert client.get("/api/ready").status_code == 503
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from starlette.requests import Request
+
+from server import cache_headers, is_not_modified
+
+VERSION = {'version': 42, 'updated_at': datetime(2026, 3, 14, 9, 30, 15, 250000, tzinfo=timezone.utc)}
+
+def request(**headers):
+    return Request({'type': 'http', 'headers': [(name.replace('_', '-').encode(), value.encode())
+                                                for name, value in headers.items()]})
+
+def test_cache_headers():
+    headers = cache_headers(VERSION)
+    assert headers['ETag'] == 'W/"42"'
+    assert headers['Last-Modified'] == 'Sat, 14 Mar 2026 09:30:15 GMT'
+    assert 'Cache-Control' in headers
+
+def test_cache_headers_without_a_version():
+    assert cache_headers(None) == {"Cache-Control": "no-cache"}
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    ('W/"42"', True),
+    ('"42"', True),
+    ('"41", W/"42"', True),
+    ('*', True),
+    ('W/"41"', False),
+])
+def test_if_none_match(if_none_match, expected):
+    assert is_not_modified(request(if_none_match=if_none_match), cache_headers(VERSION)) is expected
+
+@pytest.mark.parametrize("if_modified_since, expected", [
+    ('Sat, 14 Mar 2026 09:30:15 GMT', True),  # Last-Modified drops the fraction of a second
+    ('Sat, 14 Mar 2026 09:30:14 GMT', False),
+    ('not a date', False),
+])
+def test_if_modified_since(if_modified_since, expected):
+    assert is_not_modified(request(if_modified_since=if_modified_since), cache_headers(VERSION)) is expected
+
+def test_if_none_match_takes_precedence():
+    later = (VERSION['updated_at'] + timedelta(days=1)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    assert not is_not_modified(request(if_none_match='W/"41"', if_modified_since=later), cache_headers(VERSION))
+
+def test_no_validators():
+    assert not is_not_modified(request(), cache_headers(VERSION))
+    assert not is_not_modified(request(if_none_match='*'), cache_headers(None))
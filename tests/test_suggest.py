@@ -0,0 +1,50 @@
+from suggest import SuggestIndex, normalize
+
+ROWS = [
+    {'type': 'title', 'label': 'Senior Python Developer', 'count': 3},
+    {'type': 'title', 'label': 'Python Developer', 'count': 1},
+    {'type': 'skill', 'label': 'Python', 'count': 5},
+    {'type': 'company', 'label': 'Devtools Ltd', 'count': 2},
+    {'type': 'location', 'label': 'Nairobi, Kenya', 'count': 4},
+]
+
+def index():
+    suggest = SuggestIndex()
+    suggest.rebuild(ROWS, last_id=10)
+    return suggest
+
+def test_normalize():
+    assert normalize("  Front-End / React (Senior) ") == "front end react senior"
+    assert normalize(None) == ""
+
+def test_matches_any_word_start_whole_terms_first():
+    assert [s['text'] for s in index().suggest("dev")] == ['Devtools Ltd', 'Senior Python Developer', 'Python Developer']
+
+def test_ranks_by_count():
+    assert index().suggest("pyth") == [
+        {"text": "Python", "type": "skill", "count": 5},
+        {"text": "Python Developer", "type": "title", "count": 1},
+        {"text": "Senior Python Developer", "type": "title", "count": 3},
+    ]
+
+def test_filters_types_and_limits():
+    suggest = index()
+    assert [s['text'] for s in suggest.suggest("python", types=('title',), limit=1)] == ['Python Developer']
+    assert suggest.suggest("kenya")[0]['type'] == 'location'
+    assert suggest.suggest("") == []
+    assert suggest.suggest("zzz") == []
+
+def test_merge_adds_new_terms_and_counts():
+    suggest = index()
+    assert suggest.suggest("go") == []
+    suggest.merge([{'type': 'skill', 'label': 'Go', 'count': 2}, {'type': 'skill', 'label': 'Python', 'count': 1}],
+                  last_id=12)
+    assert suggest.suggest("go") == [{"text": "Go", "type": "skill", "count": 2}]
+    assert suggest.suggest("python", types=('skill',))[0]['count'] == 6
+    assert suggest.last_id == 12
+
+def test_needs_rebuild():
+    suggest = SuggestIndex(rebuild_seconds=600)
+    assert suggest.needs_rebuild()
+    suggest.rebuild([], last_id=0)
+    assert not suggest.needs_rebuild()